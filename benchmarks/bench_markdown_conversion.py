@@ -0,0 +1,101 @@
+"""
+Markdown → Notion blocks 转换基准测试
+
+对比两种实现（输入为 paper_digest/outputs/ 下已有的论文整理）：
+- legacy: 按 <figure> 切分，每个文本段单独做一次 mistletoe 解析
+- single: 一次解析，<figure> 由 FigureBlock 自定义 token 原位渲染
+
+用法:
+    python benchmarks/bench_markdown_conversion.py [--repeat 20]
+"""
+
+import argparse
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.services.notion_markdown_converter import markdown_to_notion_blocks, render_markdown_blocks
+from src.services.notion_image_uploader import NotionImageUploader
+
+OUTPUTS_DIR = PROJECT_ROOT / "paper_digest" / "outputs"
+FIGURE_PATTERN = r'<figure>\s*<img[^>]*src="[^"]*?/([^/"]+)"[^>]*alt="([^"]*)"\s*[^>]*>\s*<figcaption>([\s\S]*?)</figcaption>\s*</figure>'
+
+
+def legacy_segmented_conversion(markdown_content: str, image_upload_map: dict) -> list:
+    """旧实现：按 <figure> 切分后逐段解析"""
+    blocks = []
+    last_end = 0
+
+    for match in re.finditer(FIGURE_PATTERN, markdown_content, re.IGNORECASE):
+        segment = markdown_content[last_end:match.start()]
+        if segment.strip():
+            blocks.extend(markdown_to_notion_blocks(segment))
+
+        file_upload_id = image_upload_map.get(match.group(1))
+        if file_upload_id:
+            blocks.append(NotionImageUploader.create_image_block(
+                file_upload_id=file_upload_id,
+                caption=(match.group(3) or "").strip(),
+                alt_text=match.group(2).strip()
+            ))
+        last_end = match.end()
+
+    segment = markdown_content[last_end:]
+    if segment.strip():
+        blocks.extend(markdown_to_notion_blocks(segment))
+
+    return blocks
+
+
+def time_it(func, repeat: int) -> float:
+    """返回多次运行的中位耗时（毫秒）"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Markdown → Notion blocks 转换基准测试")
+    parser.add_argument("--repeat", type=int, default=20, help="每个文件的重复次数")
+    args = parser.parse_args()
+
+    files = sorted(OUTPUTS_DIR.glob("*.md"))
+    if not files:
+        print(f"未找到输入文件: {OUTPUTS_DIR}")
+        return
+
+    print(f"{'文件':<52} {'图片':>4} {'legacy ms':>10} {'single ms':>10} {'加速':>6} {'blocks':>13}")
+    print("-" * 100)
+
+    total_legacy = total_single = 0.0
+    for path in files:
+        markdown = path.read_text(encoding="utf-8")
+        filenames = [m.group(1) for m in re.finditer(FIGURE_PATTERN, markdown, re.IGNORECASE)]
+        upload_map = {name: f"upload-{i}" for i, name in enumerate(filenames)}
+
+        legacy_ms = time_it(lambda: legacy_segmented_conversion(markdown, upload_map), args.repeat)
+        single_ms = time_it(lambda: render_markdown_blocks(markdown, upload_map), args.repeat)
+        legacy_count = len(legacy_segmented_conversion(markdown, upload_map))
+        single_count = len(render_markdown_blocks(markdown, upload_map))
+
+        total_legacy += legacy_ms
+        total_single += single_ms
+        print(
+            f"{path.name[:52]:<52} {len(filenames):>4} {legacy_ms:>10.2f} {single_ms:>10.2f} "
+            f"{legacy_ms / single_ms:>5.1f}x {legacy_count:>6}/{single_count:<6}"
+        )
+
+    print("-" * 100)
+    print(f"{'合计':<52} {'':>4} {total_legacy:>10.2f} {total_single:>10.2f} {total_legacy / total_single:>5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
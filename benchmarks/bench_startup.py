@@ -0,0 +1,82 @@
+"""
+冷启动导入耗时报告（基于 python -X importtime）
+
+对每个入口模块启动一个全新的解释器执行 `python -X importtime -c "import <module>"`，
+汇总总耗时、最慢的顶层依赖，并检查重量级依赖是否被提前导入。
+导入阶段不应构建模型或 Agent，因此无需配置 OPENAI_API_KEY。
+
+用法:
+    python benchmarks/bench_startup.py [--modules web_server paper_agents] [--top 15] [--repeat 3]
+
+记录的测量结果见 benchmarks/results/startup.md。
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+DEFAULT_MODULES = ["web_server", "paper_agents", "src.services.paper_digest"]
+# 应当延迟到首次使用时才导入的依赖
+DEFERRED_MODULES = ["fitz", "mistletoe", "notion_client", "bs4", "lxml", "PIL"]
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def run_importtime(module: str) -> list:
+    """返回 [(module, self_us, cumulative_us, depth)]"""
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    env.pop("OPENAI_API_KEY", None)
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败:\n{completed.stderr[-2000:]}")
+
+    rows = []
+    for line in completed.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((name, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="冷启动导入耗时报告")
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES, help="要测量的入口模块")
+    parser.add_argument("--top", type=int, default=15, help="列出最慢的前 N 个顶层依赖")
+    parser.add_argument("--repeat", type=int, default=3, help="每个模块重复测量次数（取中位数）")
+    args = parser.parse_args()
+
+    for module in args.modules:
+        runs = [run_importtime(module) for _ in range(args.repeat)]
+        totals = [rows[-1][2] for rows in runs if rows]
+        rows = runs[-1]
+        imported = {name for name, _, _, _ in rows}
+
+        print(f"\n== {module} ==")
+        print(f"总导入耗时（中位数）: {statistics.median(totals) / 1000:.1f} ms  （{len(rows)} 个模块）")
+
+        # 入口模块的直接依赖（depth == 1），按累计耗时排序
+        direct = sorted((row for row in rows if row[3] == 1), key=lambda row: row[2], reverse=True)
+        print(f"\n{'依赖':<48} {'self ms':>9} {'cumulative ms':>14}")
+        print("-" * 73)
+        for name, self_us, cumulative_us, _ in direct[:args.top]:
+            print(f"{name[:48]:<48} {self_us / 1000:>9.1f} {cumulative_us / 1000:>14.1f}")
+
+        eager = [name for name in DEFERRED_MODULES if name in imported]
+        print(f"\n应延迟的依赖被提前导入: {', '.join(eager) if eager else '无'}")
+
+
+if __name__ == "__main__":
+    main()
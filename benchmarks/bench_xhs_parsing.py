@@ -0,0 +1,105 @@
+"""
+小红书帖子页面解析基准测试
+
+对比两种实现（输入为 benchmarks/samples/ 下保存的帖子页面 *.html）：
+- legacy: 正则在整页中匹配 __INITIAL_STATE__；兜底路径构建完整 BeautifulSoup 树，
+          decompose 所有 script/style 节点后对整个文档 get_text
+- lxml:   子串定位状态脚本后只切出 JSON；兜底路径直接用 lxml 解析并在 C 层剔除
+          script/style/noscript 与注释
+
+同时记录峰值内存（tracemalloc，只统计 Python 对象；lxml 在 C 层的树不计入），
+并检查两种实现的输出一致。
+samples/xhs_note_synthetic.html 是按真实页面结构合成的样例（非真实帖子），
+可以把浏览器另存的帖子页面放进同一目录一起测量。
+
+用法:
+    python benchmarks/bench_xhs_parsing.py [--repeat 20]
+"""
+
+import argparse
+import json
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.services.xiaohongshu import _UNDEFINED_VALUE_PATTERN, _extract_page_text, _load_initial_state
+
+SAMPLES_DIR = Path(__file__).resolve().parent / "samples"
+LEGACY_STATE_PATTERN = re.compile(r"window\.__INITIAL_STATE__\s*=\s*(\{.*?\})\s*;?\s*</script>", re.DOTALL)
+
+
+def legacy_load_state(html: str):
+    """旧实现：正则匹配整页"""
+    match = LEGACY_STATE_PATTERN.search(html)
+    if not match:
+        return None
+    return json.loads(_UNDEFINED_VALUE_PATTERN.sub(r"\1null", match.group(1)))
+
+
+def legacy_page_text(html: str):
+    """旧实现：完整 BeautifulSoup 树 + decompose + get_text"""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "lxml")
+    for script in soup(["script", "style", "noscript"]):
+        script.decompose()
+    text = soup.get_text(separator="\n", strip=True)
+    images = [img["src"] for img in soup.select("img[src]") if img.get("src", "").startswith("http")]
+    return text, images
+
+
+def measure(func, html: str, repeat: int):
+    """返回 (中位耗时 ms, 峰值内存 MB, 最后一次结果)"""
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(html)
+        samples.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    func(html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(samples), peak / 1024 / 1024, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="小红书帖子页面解析基准测试")
+    parser.add_argument("--repeat", type=int, default=20, help="每个页面的重复次数")
+    args = parser.parse_args()
+
+    files = sorted(SAMPLES_DIR.glob("*.html"))
+    if not files:
+        print(f"未找到样例页面: {SAMPLES_DIR}")
+        return
+
+    cases = [
+        ("state", legacy_load_state, _load_initial_state),
+        ("fallback", legacy_page_text, _extract_page_text),
+    ]
+
+    print(f"{'页面':<32} {'KB':>6} {'路径':<9} {'legacy ms':>10} {'lxml ms':>9} {'加速':>6} {'legacy MB':>10} {'lxml MB':>8} {'一致':>4}")
+    print("-" * 104)
+
+    for path in files:
+        html = path.read_text(encoding="utf-8")
+        size_kb = len(html.encode("utf-8")) / 1024
+        for name, legacy, current in cases:
+            legacy_ms, legacy_mb, legacy_result = measure(legacy, html, args.repeat)
+            current_ms, current_mb, current_result = measure(current, html, args.repeat)
+            same = "✓" if legacy_result == current_result else "✗"
+            print(
+                f"{path.name[:32]:<32} {size_kb:>6.0f} {name:<9} {legacy_ms:>10.2f} {current_ms:>9.2f} "
+                f"{legacy_ms / current_ms:>5.1f}x {legacy_mb:>10.1f} {current_mb:>8.1f} {same:>4}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -28,8 +28,15 @@ from agents.mcp import MCPServerStdio
 from agents.tracing import set_tracing_disabled
 from mcp.types import CreateMessageResult, TextContent
 
-from paper_agents import paper_agent, init_paper_agents
+from paper_agents import get_paper_agent, init_paper_agents
 from init_model import init_models
+from src.services.notion_gateway import warm_up_notion_gateway, close_notion_gateway
+from src.services.notion_outbox import start_notion_outbox_worker, stop_notion_outbox_worker
+from src.services.xiaohongshu import close_xiaohongshu_clients
+from src.services.xhs_cookie_pool import close_cookie_pool
+from src.services.xhs_links import close_short_link_resolver
+from src.services.arxiv_client import close_arxiv_client
+from src.services.conversation_store import compact_input_items, summarize_history
 
 # 加载环境变量
 load_dotenv()
@@ -72,9 +79,13 @@ def create_sampling_callback(base_agent):
 
         try:
             # 使用基础 Agent 执行任务（不包含 MCP 工具，避免递归）
+            from src.services.paper_digest import DigestRunContext
+
+            # 每次定时任务使用独立的运行上下文，不与交互会话互相干扰
             result = await Runner.run(
                 starting_agent=base_agent,
                 input=agent_prompt,
+                context=DigestRunContext(),
                 max_turns=20  # 增加 turns，因为有 handoff
             )
 
@@ -115,6 +126,7 @@ class PaperChatBot:
         self.agent_with_mcp = None
         self.current_agent = None
         self.input_items = []
+        self.digest_context = None
 
     async def start(self):
         """启动对话机器人"""
@@ -138,8 +150,15 @@ class PaperChatBot:
         factory = init_models()
         openai_client = factory.get_client()
 
-        # 初始化 agents 全局变量
+        # 初始化 agents 全局变量（Agent 在模型初始化之后才构建，使用同一个客户端）
         init_paper_agents(openai_client)
+        paper_agent = get_paper_agent()
+
+        # 预热 Notion 连接（整个会话复用同一个连接池）
+        await warm_up_notion_gateway()
+
+        # 启动 Notion outbox 后台刷写（补写之前失败/排队的页面）
+        start_notion_outbox_worker()
 
         # 配置 schedule-task-mcp 环境变量
         schedule_env = {
@@ -170,7 +189,7 @@ class PaperChatBot:
         # 使用 async with 连接 MCP 服务器
         async with schedule_server as sched_srv:
             # 导入 digest_agent (从 src/services)
-            from src.services.paper_digest import digest_agent, _init_digest_globals
+            from src.services.paper_digest import _init_digest_globals, DigestRunContext
 
             # ⚠️ 重要：必须重新初始化 digest_agent 的全局变量
             _init_digest_globals(openai_client)
@@ -186,6 +205,7 @@ class PaperChatBot:
             )
             self.current_agent = self.agent_with_mcp
             self.input_items = []
+            self.digest_context = DigestRunContext()
 
             print(f"✅ 主 Agent 已创建: {self.agent_with_mcp.name}")
             print(f"✅ Sub-Agent 已注册: digest_agent (通过 handoff)")
@@ -243,6 +263,9 @@ class PaperChatBot:
     async def process_message(self, message: str):
         """处理用户消息"""
         try:
+            # 历史超出 token 预算时，较早的轮次滚动摘要为一条记忆
+            self.input_items = await summarize_history(self.input_items)
+
             # 添加本轮用户消息
             self.input_items.append({"role": "user", "content": message})
 
@@ -250,12 +273,14 @@ class PaperChatBot:
             result = await Runner.run(
                 starting_agent=self.current_agent,
                 input=self.input_items,
+                context=self.digest_context,
                 max_turns=20  # 增加 turns，支持 handoff
             )
 
             # 更新当前 Agent 和上下文
             self.current_agent = result.last_agent
-            self.input_items = result.to_input_list()
+            # 截断历史中过长的工具输出，控制每轮上下文大小
+            self.input_items = compact_input_items(result.to_input_list())
 
             # 提取响应
             response = result.final_output if hasattr(result, 'final_output') else str(result)
@@ -270,7 +295,15 @@ class PaperChatBot:
 async def main():
     """主函数"""
     bot = PaperChatBot()
-    await bot.start()
+    try:
+        await bot.start()
+    finally:
+        await stop_notion_outbox_worker()
+        await close_cookie_pool()
+        await close_xiaohongshu_clients()
+        await close_short_link_resolver()
+        await close_arxiv_client()
+        await close_notion_gateway()
 
 
 if __name__ == "__main__":
@@ -22,8 +22,10 @@ from agents import Agent, function_tool, handoff
 # 获取项目根目录
 PROJECT_ROOT = Path(__file__).resolve().parent
 
-# 导入 digest_agent (从 src/services)
-from src.services.paper_digest import digest_agent, _init_digest_globals
+# 导入 digest_agent (从 src/services)，Agent 在首次使用时才构建
+from src.services.paper_digest import get_digest_agent, _init_digest_globals
+from src.services.paper_catalog import get_paper_catalog
+from src.services.xhs_links import is_short_link, resolve_post_url
 
 # 导入模型
 from init_model import get_tool_model
@@ -46,6 +48,30 @@ async def identify_link_type(
     """
     url = url.strip()
 
+    # 小红书短链先解析为规范帖子链接（带缓存），目录查重按帖子 ID 命中
+    if is_short_link(url):
+        try:
+            url = await resolve_post_url(url)
+        except Exception:
+            pass  # 解析失败时按原链接继续，获取帖子时会再次尝试
+
+    # 优先查询本地论文目录：已处理过的论文直接返回，不再走网络和 LLM
+    known = get_paper_catalog().lookup_url(url)
+    if known:
+        notion_url = known.get("notion_url")
+        return json.dumps({
+            "type": "known",
+            "url": url,
+            "title": known.get("title"),
+            "notion_url": notion_url,
+            "digest_file": known.get("digest_file"),
+            "matched_by": known.get("matched_by"),
+            "message": (
+                f"这篇论文已经整理过，Notion 页面: {notion_url}" if notion_url
+                else "这篇论文已经整理过（Notion 同步排队中），无需重复处理。"
+            )
+        }, ensure_ascii=False, indent=2)
+
     # 识别小红书链接
     xhs_patterns = [
         r'xiaohongshu\.com',
@@ -94,12 +120,47 @@ async def identify_link_type(
     }, ensure_ascii=False, indent=2)
 
 
+@function_tool
+async def crawl_blogger_feed(
+    blogger_id: Annotated[str, "小红书博主的用户 ID（留空则使用 DEFAULT_BLOGGER_ID）"] = ""
+) -> str:
+    """
+    抓取博主自上次以来发布的新帖子，并整理其中的论文分享帖
+
+    参数:
+        blogger_id: 小红书博主用户 ID
+
+    返回:
+        JSON格式的抓取结果（新帖子数、已整理的论文帖、失败列表）
+    """
+    from src.services.digest_pipeline import run_digest_pipeline
+    from src.services.paper_digest import DigestRunContext
+    from src.services.xhs_feed_crawler import BloggerFeedCrawler
+    from src.services.xhs_cookie_pool import get_cookie_pool
+
+    blogger_id = blogger_id.strip() or os.getenv("DEFAULT_BLOGGER_ID", "")
+    if not blogger_id:
+        return json.dumps({"success": False, "error": "未提供博主 ID，且未配置 DEFAULT_BLOGGER_ID"}, ensure_ascii=False)
+
+    digests = []
+
+    async def digest_post(post):
+        result = await run_digest_pipeline(str(post.post_url), DigestRunContext())
+        digests.append(result)
+
+    try:
+        crawler = BloggerFeedCrawler(get_cookie_pool())
+        summary = await crawler.crawl(blogger_id, on_paper_post=digest_post)
+    except Exception as e:
+        return json.dumps({"success": False, "blogger_id": blogger_id, "error": str(e)}, ensure_ascii=False)
+
+    return json.dumps({"success": True, **summary, "digests": digests}, ensure_ascii=False, indent=2)
+
+
 # ============= Agent 定义 =============
 
 # 主 Paper Agent
-paper_agent = Agent(
-    name="paper_agent",
-    instructions="""你是一个专业的研究论文整理调度助手（Paper Agent）。
+PAPER_AGENT_INSTRUCTIONS = """你是一个专业的研究论文整理调度助手（Paper Agent）。
 
 你的职责是：
 
@@ -110,8 +171,14 @@ paper_agent = Agent(
 2. **识别链接类型**（立即任务）
    - 使用 identify_link_type 识别用户提供的链接类型
    - 支持的类型：小红书链接、PDF链接、arXiv链接
+   - 如果返回 type 为 "known"，说明这篇论文已经整理过：直接把 Notion 链接告诉用户，不要转交 digest_agent
+     （除非用户明确要求重新整理，此时照常转交，digest_agent 会增量更新已有页面）
+
+3. **抓取博主新帖子**
+   - 用户要求抓取/检查某个博主的新帖子（常见于定时任务，如"每天早上8点抓取博主 xxx 的新论文"）时，调用 crawl_blogger_feed
+   - 该工具只处理上次抓取之后的新帖子，并自动整理其中的论文分享帖，不需要再转交 digest_agent
 
-3. **转交给 Digest Agent 处理**（立即任务）
+4. **转交给 Digest Agent 处理**（立即任务）
    - 使用 transfer_to_digest_agent 将论文整理任务交给专业的 digest_agent
    - 传递必要的信息：链接类型、URL、任何额外的上下文
    - ⚡ **并行处理**：当用户提供多个链接时，你可以并行调用 transfer_to_digest_agent 处理每个链接，无需等待前一个完成
@@ -143,16 +210,9 @@ paper_agent = Agent(
   2. 告诉用户任务已创建，会在指定时间自动执行
 
 请保持对话友好、专业。
-""",
-    model=get_tool_model(),
-    tools=[
-        identify_link_type,
-    ],
-    handoffs=[
-        handoff(
-            agent=digest_agent,
-            tool_name_override="transfer_to_digest_agent",
-            tool_description_override="""将论文整理任务转交给 Digest Agent。
+"""
+
+TRANSFER_TO_DIGEST_DESCRIPTION = """将论文整理任务转交给 Digest Agent。
 
 当需要处理论文（下载PDF、提取信息、生成整理、保存到Notion）时使用此工具。
 
@@ -166,9 +226,44 @@ paper_agent = Agent(
 或
 "请处理这个PDF：https://arxiv.org/pdf/2505.10831.pdf，标题是：Creating General User Models from Computer Use"
 """
+
+_paper_agent = None
+
+
+def get_paper_agent() -> Agent:
+    """
+    获取主 Paper Agent
+
+    首次调用时才创建（连同 handoff 目标 digest_agent），导入本模块不触发任何模型构建
+    """
+    global _paper_agent
+
+    if _paper_agent is None:
+        _paper_agent = Agent(
+            name="paper_agent",
+            instructions=PAPER_AGENT_INSTRUCTIONS,
+            model=get_tool_model(),
+            tools=[
+                identify_link_type,
+                crawl_blogger_feed,
+            ],
+            handoffs=[
+                handoff(
+                    agent=get_digest_agent(),
+                    tool_name_override="transfer_to_digest_agent",
+                    tool_description_override=TRANSFER_TO_DIGEST_DESCRIPTION
+                )
+            ]
         )
-    ]
-)
+
+    return _paper_agent
+
+
+def __getattr__(name: str):
+    # 兼容 `from paper_agents import paper_agent`：首次访问时才构建
+    if name == "paper_agent":
+        return get_paper_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # 初始化函数（供 chat.py 调用）
@@ -1,7 +1,11 @@
 """Data models for the Paper Agent Scheduler."""
 
+from .job import Job, JobEvent, JobStatus
 from .post import Post
 
 __all__ = [
+    "Job",
+    "JobEvent",
+    "JobStatus",
     "Post",
 ]
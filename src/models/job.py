@@ -0,0 +1,88 @@
+"""Job entity model representing a queued digest or chat request."""
+
+from datetime import datetime
+from enum import Enum
+from typing import Any, Optional
+
+from pydantic import BaseModel, Field
+
+
+# Job fields returned by the jobs API
+PUBLIC_JOB_FIELDS = {"job_id", "kind", "status", "stage", "progress", "result"}
+
+
+class JobStatus(str, Enum):
+    """Lifecycle states of a job."""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class JobEvent(BaseModel):
+    """
+    A pipeline stage event reported while a job runs.
+
+    Attributes:
+        stage: Pipeline stage name (e.g. "fetch", "download", "digest", "save")
+        status: "start", "done" or "error"
+        info: Extra details reported with the event
+        at: When the event was recorded
+    """
+
+    stage: str
+    status: str
+    info: dict[str, Any] = Field(default_factory=dict)
+    at: datetime = Field(default_factory=datetime.now)
+
+
+class Job(BaseModel):
+    """
+    A unit of work submitted through the web API.
+
+    Attributes:
+        job_id: Unique job identifier
+        kind: Job type ("digest", "chat" or "crawl")
+        payload: Request payload (URL, message, session ID, ...)
+        status: Current lifecycle state
+        stage: Most recent pipeline stage
+        progress: Completion ratio between 0 and 1, derived from stage events
+        events: Stage events in the order they were reported
+        result: Handler result on success
+        error: Error message on failure
+        dedupe_key: Normalised source identifier used to coalesce duplicates
+        attached: Number of duplicate submissions coalesced into this job
+        created_at: When the job was submitted
+        started_at: When a worker picked the job up
+        finished_at: When the job finished
+    """
+
+    job_id: str
+    kind: str
+    payload: dict[str, Any] = Field(default_factory=dict)
+    status: JobStatus = JobStatus.QUEUED
+    stage: Optional[str] = None
+    progress: float = Field(0.0, ge=0.0, le=1.0)
+    events: list[JobEvent] = Field(default_factory=list)
+    result: Optional[dict[str, Any]] = None
+    error: Optional[str] = None
+    dedupe_key: Optional[str] = None
+    attached: int = 0
+    created_at: datetime = Field(default_factory=datetime.now)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    @property
+    def is_finished(self) -> bool:
+        """Whether the job has reached a terminal state."""
+        return self.status in (JobStatus.SUCCEEDED, JobStatus.FAILED)
+
+    def public_view(self) -> dict[str, Any]:
+        """
+        Fields safe to expose through the jobs API.
+
+        The payload is left out: it holds the submitters' session IDs (which
+        route WebSocket logs and results) and chat messages.
+        """
+        return self.model_dump(mode="json", include=PUBLIC_JOB_FIELDS)
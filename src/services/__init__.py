@@ -1,9 +1,22 @@
 """Services layer for external integrations."""
 
-from .xiaohongshu import XiaohongshuClient, RateLimiter, XiaohongshuError
+from .xiaohongshu import (
+    XiaohongshuClient,
+    RateLimiter,
+    SqliteRateLimiter,
+    XiaohongshuError,
+    get_xiaohongshu_client,
+    close_xiaohongshu_clients,
+)
+from .xhs_cookie_pool import CookiePool, get_cookie_pool
 
 __all__ = [
     "XiaohongshuClient",
+    "get_xiaohongshu_client",
+    "close_xiaohongshu_clients",
+    "CookiePool",
+    "get_cookie_pool",
     "RateLimiter",
+    "SqliteRateLimiter",
     "XiaohongshuError",
 ]
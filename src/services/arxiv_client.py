@@ -0,0 +1,368 @@
+"""
+arXiv API 客户端 - 共享连接 + 礼貌调度 + 磁盘缓存
+
+功能：
+1. 进程级共享 httpx 连接（支持 http_proxy）
+2. 礼貌调度：同一时间只有一个请求，相邻请求间隔不少于 ARXIV_MIN_INTERVAL 秒（arXiv 要求 ≥3 秒）
+3. 标题检索与 ID 查询结果缓存到 SQLite，带 TTL（ARXIV_CACHE_TTL）
+4. 批量 ID 查询：多个 ID 打包进一次 id_list 请求（回填历史数据时使用）
+5. 标题相似度：对检索候选打分排序，低于阈值（ARXIV_TITLE_MIN_SIMILARITY）的不采用
+
+存储：SQLite（路径由 ARXIV_CACHE_DB 配置）
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import xml.etree.ElementTree as ET
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import httpx
+
+from ..utils.logger import get_logger
+from ..utils.metrics import CACHE_HITS, count_rate_limited
+from ..utils.retry import exponential_backoff
+from .paper_catalog import extract_arxiv_id, normalize_title
+
+logger = get_logger(__name__)
+
+API_URL = "http://export.arxiv.org/api/query"
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+DEFAULT_CACHE_DB = PROJECT_ROOT / "data" / "arxiv_cache.db"
+
+_ATOM_NS = {"atom": "http://www.w3.org/2005/Atom"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS arxiv_cache (
+    cache_key TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    stored_at REAL NOT NULL
+);
+"""
+
+
+@dataclass
+class ArxivEntry:
+    """arXiv 检索结果中的一篇论文"""
+
+    arxiv_id: str  # 带版本号，例如 2410.04618v2
+    title: str
+    summary: str = ""
+    authors: List[str] = field(default_factory=list)
+    published: str = ""
+
+    @property
+    def base_id(self) -> str:
+        """不带版本号的 ID"""
+        return extract_arxiv_id(self.arxiv_id) or self.arxiv_id
+
+    @property
+    def pdf_url(self) -> str:
+        return f"https://arxiv.org/pdf/{self.arxiv_id}.pdf"
+
+    @property
+    def abs_url(self) -> str:
+        return f"https://arxiv.org/abs/{self.arxiv_id}"
+
+
+def parse_feed(content: bytes) -> List[ArxivEntry]:
+    """解析 arXiv API 返回的 Atom feed"""
+    root = ET.fromstring(content)
+    entries = []
+    for entry in root.findall("atom:entry", _ATOM_NS):
+        id_elem = entry.find("atom:id", _ATOM_NS)
+        if id_elem is None or not id_elem.text or "/abs/" not in id_elem.text:
+            # id_list 中不存在的 ID 会返回一条没有 abs 链接的错误条目
+            continue
+
+        def text(tag: str) -> str:
+            elem = entry.find(f"atom:{tag}", _ATOM_NS)
+            return " ".join(elem.text.split()) if elem is not None and elem.text else ""
+
+        entries.append(ArxivEntry(
+            arxiv_id=id_elem.text.split("/abs/")[-1],
+            title=text("title") or "Unknown",
+            summary=text("summary"),
+            authors=[
+                " ".join(name.text.split())
+                for name in entry.findall("atom:author/atom:name", _ATOM_NS)
+                if name.text
+            ],
+            published=text("published"),
+        ))
+    return entries
+
+
+# ============= 标题相似度 =============
+
+def _same_word(a: str, b: str) -> bool:
+    """同一个词：完全相同，或较长的词只有词形差异（model / models）"""
+    return a == b or (min(len(a), len(b)) >= 4 and SequenceMatcher(None, a, b).ratio() >= 0.85)
+
+
+def _containment(tokens: List[str], other: List[str]) -> float:
+    """tokens 中能在 other 里找到对应词的比例"""
+    if not tokens:
+        return 0.0
+    return sum(1 for token in tokens if any(_same_word(token, o) for o in other)) / len(tokens)
+
+
+def title_similarity(requested: str, candidate: str) -> float:
+    """
+    两个标题的相似度（0~1）
+
+    规范化后取词集合 Jaccard（单复数等词形差异视为同一个词）与 difflib 字符序列
+    相似度的平均：前者惩罚关键词不同（如 Probabilistic / Implicit），后者容忍连字符等细小差异。
+    结果不超过双向的词覆盖率：任一方多出或缺少的词都会拉低分数，
+    因此 “Attention Is Not All You Need” 不会被当作 “Attention is all you need”。
+    候选标题带副标题（冒号前后）时，主标题、副标题部分也分别参与比较，
+    因为帖子里常常只写其中之一。
+    """
+    requested_norm = normalize_title(requested)
+    if not requested_norm:
+        return 0.0
+
+    variants = [candidate]
+    if ":" in candidate:
+        variants.extend(candidate.split(":", 1))
+
+    best = 0.0
+    requested_tokens = list(dict.fromkeys(requested_norm.split()))
+    for variant in variants:
+        variant_norm = normalize_title(variant)
+        if not variant_norm:
+            continue
+        variant_tokens = list(dict.fromkeys(variant_norm.split()))
+        shared = sum(1 for token in requested_tokens if any(_same_word(token, o) for o in variant_tokens))
+        jaccard = shared / (len(requested_tokens) + len(variant_tokens) - shared)
+        ratio = SequenceMatcher(None, requested_norm, variant_norm).ratio()
+        containment = min(
+            shared / len(requested_tokens),
+            _containment(variant_tokens, requested_tokens),
+        )
+        best = max(best, min((jaccard + ratio) / 2, containment))
+    return round(best, 3)
+
+
+def rank_by_title(title: str, entries: List[ArxivEntry]) -> List[Tuple[float, ArxivEntry]]:
+    """按与目标标题的相似度从高到低排序候选（同分保持 arXiv 相关度顺序）"""
+    scored = [(title_similarity(title, entry.title), entry) for entry in entries]
+    return sorted(scored, key=lambda item: item[0], reverse=True)
+
+
+def min_title_similarity() -> float:
+    """采用检索结果所需的最低标题相似度（ARXIV_TITLE_MIN_SIMILARITY）"""
+    return float(os.getenv("ARXIV_TITLE_MIN_SIMILARITY", "0.9"))
+
+
+# ============= 磁盘缓存 =============
+
+class ArxivCache:
+    """SQLite 缓存：检索词 / ID → 结果（JSON），超过 TTL 视为未命中"""
+
+    def __init__(self, db_path: Optional[str] = None, ttl: Optional[float] = None):
+        """
+        Args:
+            db_path: SQLite 文件路径（默认读取 ARXIV_CACHE_DB）
+            ttl: 缓存有效期（秒，默认读取 ARXIV_CACHE_TTL）
+        """
+        self.db_path = Path(db_path or os.getenv("ARXIV_CACHE_DB", str(DEFAULT_CACHE_DB)))
+        self.ttl = ttl if ttl is not None else float(os.getenv("ARXIV_CACHE_TTL", str(7 * 24 * 3600)))
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def get(self, cache_key: str) -> Optional[list]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, stored_at FROM arxiv_cache WHERE cache_key = ?", (cache_key,)
+            ).fetchone()
+        if row is None or time.time() - row[1] >= self.ttl:
+            return None
+        return json.loads(row[0])
+
+    def put_many(self, items: Dict[str, list]) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO arxiv_cache (cache_key, payload, stored_at) VALUES (?, ?, ?)",
+                [(key, json.dumps(payload, ensure_ascii=False), now) for key, payload in items.items()],
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# ============= 礼貌调度 =============
+
+class PoliteScheduler:
+    """
+    同一时间只放行一个请求，且相邻请求的开始时间至少间隔 min_interval 秒
+
+    Example:
+        async with scheduler:
+            response = await client.get(url)
+    """
+
+    def __init__(self, min_interval: float = 3.0):
+        self.min_interval = min_interval
+        self._lock = asyncio.Lock()
+        self._last_start = float("-inf")
+
+    async def __aenter__(self) -> None:
+        await self._lock.acquire()
+        wait = self._last_start + self.min_interval - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        self._last_start = time.monotonic()
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self._lock.release()
+
+
+# ============= 客户端 =============
+
+class ArxivClient:
+    """arXiv API 客户端（检索 / ID 查询，带缓存）"""
+
+    def __init__(
+        self,
+        cache: Optional[ArxivCache] = None,
+        min_interval: Optional[float] = None,
+        batch_size: int = 100,
+        timeout: float = 30.0,
+    ):
+        """
+        Args:
+            cache: 磁盘缓存（默认按环境变量创建）
+            min_interval: 相邻请求的最小间隔（秒，默认读取 ARXIV_MIN_INTERVAL）
+            batch_size: 一次 id_list 请求最多包含的 ID 数
+            timeout: 请求超时（秒）
+        """
+        self.cache = cache or ArxivCache()
+        self.scheduler = PoliteScheduler(
+            min_interval if min_interval is not None else float(os.getenv("ARXIV_MIN_INTERVAL", "3"))
+        )
+        self.batch_size = batch_size
+
+        proxy = os.getenv("http_proxy")
+        mounts = None
+        if proxy:
+            mounts = {
+                "http://": httpx.AsyncHTTPTransport(proxy=proxy),
+                "https://": httpx.AsyncHTTPTransport(proxy=proxy),
+            }
+        self.client = httpx.AsyncClient(
+            timeout=timeout,
+            mounts=mounts,
+            event_hooks={"response": [count_rate_limited("arxiv")]},
+        )
+
+    @exponential_backoff(max_tries=3, exceptions=(httpx.HTTPError,), factor=3.0)
+    async def _query(self, params: Dict[str, str]) -> List[ArxivEntry]:
+        async with self.scheduler:
+            response = await self.client.get(API_URL, params=params)
+        response.raise_for_status()
+        return parse_feed(response.content)
+
+    async def search_title(self, title: str, max_results: int = 3) -> List[ArxivEntry]:
+        """
+        按标题检索（ti: 字段），结果缓存
+
+        Returns:
+            arXiv 返回的候选论文（按 arXiv 相关度排序）
+        """
+        cache_key = f"title:{max_results}:{normalize_title(title)}"
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            CACHE_HITS.inc(cache="arxiv")
+            return [ArxivEntry(**item) for item in cached]
+
+        entries = await self._query({"search_query": f"ti:{title}", "max_results": str(max_results)})
+        if not entries:
+            # 不缓存空结果：论文可能稍后才在 arXiv 上线
+            return entries
+        self.cache.put_many({
+            cache_key: [asdict(entry) for entry in entries],
+            # 检索结果顺便作为 ID 查询的缓存
+            **{f"id:{entry.base_id}": [asdict(entry)] for entry in entries},
+        })
+        return entries
+
+    async def get_by_ids(self, arxiv_ids: Iterable[str]) -> Dict[str, ArxivEntry]:
+        """
+        批量按 ID 查询；未缓存的 ID 每 batch_size 个打包成一次 id_list 请求
+
+        Args:
+            arxiv_ids: arXiv ID（可带版本号或为 arXiv 链接）
+
+        Returns:
+            {不带版本号的 ID: ArxivEntry}，不存在的 ID 不在结果中
+        """
+        base_ids = list(dict.fromkeys(extract_arxiv_id(item) for item in arxiv_ids if extract_arxiv_id(item)))
+        results: Dict[str, ArxivEntry] = {}
+        missing = []
+        for base_id in base_ids:
+            cached = self.cache.get(f"id:{base_id}")
+            if cached:
+                results[base_id] = ArxivEntry(**cached[0])
+            else:
+                missing.append(base_id)
+        if results:
+            CACHE_HITS.inc(len(results), cache="arxiv")
+
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            entries = await self._query({"id_list": ",".join(batch), "max_results": str(len(batch))})
+            fetched = {entry.base_id: entry for entry in entries}
+            self.cache.put_many({f"id:{base_id}": [asdict(entry)] for base_id, entry in fetched.items()})
+            results.update(fetched)
+            logger.info("arXiv 批量 ID 查询", requested=len(batch), found=len(fetched))
+
+        return results
+
+    async def get_by_id(self, arxiv_id: str) -> Optional[ArxivEntry]:
+        """按单个 ID 查询"""
+        return (await self.get_by_ids([arxiv_id])).get(extract_arxiv_id(arxiv_id))
+
+    @property
+    def is_closed(self) -> bool:
+        return self.client.is_closed
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+# 全局实例
+_arxiv_client: Optional[ArxivClient] = None
+
+
+def get_arxiv_client() -> ArxivClient:
+    """获取进程级 arXiv 客户端（首次调用时创建，退出时由 close_arxiv_client 关闭）"""
+    global _arxiv_client
+
+    if _arxiv_client is None or _arxiv_client.is_closed:
+        _arxiv_client = ArxivClient()
+
+    return _arxiv_client
+
+
+async def close_arxiv_client() -> None:
+    """关闭共享连接（应用退出时调用）"""
+    global _arxiv_client
+
+    if _arxiv_client is not None:
+        await _arxiv_client.close()
+        _arxiv_client.cache.close()
+        _arxiv_client = None
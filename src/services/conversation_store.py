@@ -0,0 +1,407 @@
+"""
+对话会话存储 - 有界 LRU + 空闲过期 + 历史压缩
+
+功能：
+1. 内存中最多保留 max_sessions 个会话，超出时淘汰最久未使用的会话
+2. 空闲超过 ttl_seconds 的会话落盘（data/sessions），下次访问时从磁盘恢复
+3. 每轮结束后压缩历史：截断过长的工具输出和工具参数（PDF 预览、整篇整理结果等），
+   使每轮发送给模型的上下文大小有上限
+4. 滚动摘要：历史超出 token 预算时，较早的轮次由工具模型总结为一条摘要，
+   Notion 链接、本地文件路径、arXiv ID 等产物引用原样保留
+"""
+
+import hashlib
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from ..utils.logger import get_logger
+from ..utils.metrics import LLM_CALL_SECONDS
+from .paper_digest import DigestRunContext
+
+logger = get_logger(__name__)
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+DEFAULT_SESSIONS_DIR = PROJECT_ROOT / "data" / "sessions"
+
+# 历史中单个工具输出 / 工具参数保留的最大字符数
+DEFAULT_TOOL_OUTPUT_MAX_CHARS = 4000
+# 历史 token 预算与摘要时原样保留的最近轮数
+DEFAULT_HISTORY_TOKEN_BUDGET = 12000
+DEFAULT_KEEP_RECENT_TURNS = 2
+# 送去摘要的历史文本上限（字符）
+SUMMARY_SOURCE_MAX_CHARS = 24000
+
+SUMMARY_PREFIX = "【此前对话摘要】"
+
+# 摘要中必须保留的产物引用
+_ARTIFACT_PATTERNS = [
+    re.compile(r"https://(?:www\.)?notion\.so/[^\s)\"'\]]+"),
+    re.compile(r"https?://(?:www\.)?(?:xiaohongshu\.com|xhslink\.com)/[^\s)\"'\]]+"),
+    re.compile(r"https?://(?:www\.)?arxiv\.org/(?:abs|pdf)/[^\s)\"'\]]+"),
+    re.compile(r"(?<![\w.])\d{4}\.\d{4,5}(?:v\d+)?(?![\w.])"),
+    re.compile(r"(?:[\w.\-]+/)*paper_digest/[^\s\"'\]]+?\.(?:md|pdf|png|jpg)"),
+]
+
+
+@dataclass
+class ConversationSession:
+    """单个对话会话"""
+    session_id: str
+    agent: Any
+    input_items: List[Dict[str, Any]] = field(default_factory=list)
+    digest_context: DigestRunContext = field(default_factory=DigestRunContext)
+    last_active: float = field(default_factory=time.time)
+
+
+# ============= 历史压缩 =============
+
+def _truncate_text(text: str, max_chars: int) -> str:
+    if len(text) <= max_chars:
+        return text
+    return f"{text[:max_chars]}\n…[已截断 {len(text) - max_chars} 字符]"
+
+
+def compact_input_items(items: List[Dict[str, Any]], max_chars: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    压缩对话历史：截断过长的工具输出（function_call_output.output）
+    和工具调用参数（function_call.arguments），其余条目原样保留
+
+    Args:
+        items: Runner 结果的 to_input_list()
+        max_chars: 单条保留的最大字符数（默认读取 CONVERSATION_TOOL_OUTPUT_MAX_CHARS）
+
+    Returns:
+        压缩后的新列表（不修改原列表）
+    """
+    if max_chars is None:
+        max_chars = int(os.getenv("CONVERSATION_TOOL_OUTPUT_MAX_CHARS", DEFAULT_TOOL_OUTPUT_MAX_CHARS))
+
+    compacted = []
+    for item in items:
+        if not isinstance(item, dict):
+            compacted.append(item)
+            continue
+
+        item_type = item.get("type")
+        if item_type == "function_call_output" and isinstance(item.get("output"), str) \
+                and len(item["output"]) > max_chars:
+            item = {**item, "output": _truncate_text(item["output"], max_chars)}
+        elif item_type == "function_call" and isinstance(item.get("arguments"), str) \
+                and len(item["arguments"]) > max_chars:
+            item = {**item, "arguments": _truncate_text(item["arguments"], max_chars)}
+        compacted.append(item)
+
+    return compacted
+
+
+def _history_chars(items: List[Dict[str, Any]]) -> int:
+    return len(json.dumps(items, ensure_ascii=False, default=str))
+
+
+# ============= 滚动摘要 =============
+
+def estimate_tokens(items: List[Dict[str, Any]]) -> int:
+    """粗略估算历史 token 数：ASCII 约 4 字符 1 token，中文等非 ASCII 字符约 1 字符 1 token"""
+    text = json.dumps(items, ensure_ascii=False, default=str)
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return (len(text) - non_ascii) // 4 + non_ascii
+
+
+def _item_text(item: Dict[str, Any]) -> str:
+    """将单个历史条目渲染为摘要输入文本"""
+    item_type = item.get("type")
+    if item_type == "function_call":
+        return f"[调用工具] {item.get('name')}({str(item.get('arguments', ''))[:500]})"
+    if item_type == "function_call_output":
+        return f"[工具结果] {str(item.get('output', ''))[:1500]}"
+
+    content = item.get("content")
+    if isinstance(content, list):
+        content = " ".join(
+            part.get("text", "") for part in content if isinstance(part, dict)
+        )
+    if not content:
+        return ""
+    return f"[{item.get('role', item_type or 'item')}] {content}"
+
+
+def extract_artifact_refs(items: List[Dict[str, Any]]) -> List[str]:
+    """提取历史中的产物引用（Notion 链接、帖子/论文链接、arXiv ID、本地文件路径），按出现顺序去重"""
+    text = json.dumps(items, ensure_ascii=False, default=str)
+    refs = []
+    for pattern in _ARTIFACT_PATTERNS:
+        refs.extend(match.rstrip(".,;，。；") for match in pattern.findall(text))
+    return list(dict.fromkeys(refs))
+
+
+def _is_summary(item: Any) -> bool:
+    """是否为 summarize_history 生成的摘要条目"""
+    return (
+        isinstance(item, dict)
+        and item.get("role") == "system"
+        and str(item.get("content") or "").startswith(SUMMARY_PREFIX)
+    )
+
+
+def _recent_turns_start(items: List[Dict[str, Any]], keep_turns: int) -> int:
+    """最近 keep_turns 轮的起始下标（以用户消息为轮次边界）"""
+    user_indexes = [
+        i for i, item in enumerate(items)
+        if isinstance(item, dict) and item.get("role") == "user" and item.get("type") in (None, "message")
+    ]
+    if len(user_indexes) <= keep_turns:
+        return 0
+    return user_indexes[-keep_turns]
+
+
+async def _summarize_items(items: List[Dict[str, Any]]) -> str:
+    """用工具模型总结历史条目"""
+    from agents import Agent, Runner
+    from init_model import get_tool_model
+    from .job_queue import stage_slot
+
+    source = "\n".join(text for text in (_item_text(item) for item in items) if text)
+    if len(source) > SUMMARY_SOURCE_MAX_CHARS:
+        # 保留最近的部分（更早的内容通常已在上一次摘要中）
+        source = source[-SUMMARY_SOURCE_MAX_CHARS:]
+
+    summary_agent = Agent(
+        name="conversation_summary_agent",
+        instructions=(
+            "你负责压缩论文整理助手的对话历史。请用简洁的中文总结用户的需求、已完成的操作和结论，"
+            "逐条列出处理过的论文（标题、来源链接、Notion 链接、本地文件路径），"
+            "所有链接、文件路径和 arXiv ID 必须原样保留，不要编造。总结控制在 500 字以内。"
+        ),
+        model=get_tool_model(),
+    )
+
+    async with stage_slot("llm"):
+        with LLM_CALL_SECONDS.time(call="summarize_history"):
+            result = await Runner.run(starting_agent=summary_agent, input=source, max_turns=1)
+    return str(result.final_output or "").strip()
+
+
+async def summarize_history(
+    items: List[Dict[str, Any]],
+    token_budget: Optional[int] = None,
+    keep_turns: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    滚动摘要：历史超出 token 预算时，将最近 keep_turns 轮之前的条目总结为一条摘要
+
+    摘要末尾附上从原始条目中提取的产物引用，即使模型遗漏也不会丢失。
+    模型调用失败时退化为仅保留产物引用和用户消息的摘要。
+
+    Args:
+        items: 对话历史
+        token_budget: token 预算（默认读取 CONVERSATION_TOKEN_BUDGET）
+        keep_turns: 原样保留的最近轮数（默认读取 CONVERSATION_KEEP_RECENT_TURNS）
+
+    Returns:
+        [摘要条目] + 最近几轮条目；未超预算时原样返回
+    """
+    if token_budget is None:
+        token_budget = int(os.getenv("CONVERSATION_TOKEN_BUDGET", DEFAULT_HISTORY_TOKEN_BUDGET))
+    if keep_turns is None:
+        keep_turns = int(os.getenv("CONVERSATION_KEEP_RECENT_TURNS", DEFAULT_KEEP_RECENT_TURNS))
+
+    before_tokens = estimate_tokens(items)
+    if before_tokens <= token_budget:
+        return items
+
+    keep_turns = max(1, keep_turns)
+    split = _recent_turns_start(items, keep_turns)
+    # 最近几轮本身就超出预算时减少保留轮数（至少保留最后一轮），
+    # 否则之后每一轮都会再调用一次模型，历史却压不下来
+    while keep_turns > 1 and estimate_tokens(items[split:]) > token_budget:
+        keep_turns -= 1
+        split = _recent_turns_start(items, keep_turns)
+
+    older, recent = items[:split], items[split:]
+    if not older or all(_is_summary(item) for item in older):
+        # 没有可摘要的内容（较早部分为空或只有上一次的摘要）
+        return items
+
+    refs = extract_artifact_refs(older)
+    start_time = time.time()
+    try:
+        summary = await _summarize_items(older)
+    except Exception as e:
+        logger.warning("⚠️ 对话摘要失败，仅保留产物引用", error=str(e))
+        user_messages = [
+            str(item.get("content"))[:200] for item in older
+            if isinstance(item, dict) and item.get("role") == "user" and isinstance(item.get("content"), str)
+        ]
+        summary = "用户此前的请求：\n" + "\n".join(f"- {message}" for message in user_messages[-10:])
+
+    content = f"{SUMMARY_PREFIX}\n{summary}"
+    if refs:
+        content += "\n\n相关产物（原样保留）：\n" + "\n".join(f"- {ref}" for ref in refs)
+
+    compacted = [{"role": "system", "content": content}] + recent
+    logger.info(
+        "🧾 对话历史已滚动摘要",
+        before_tokens=before_tokens,
+        after_tokens=estimate_tokens(compacted),
+        summarized_items=len(older),
+        kept_items=len(recent),
+        artifact_refs=len(refs),
+        elapsed_time=f"{time.time() - start_time:.2f}s",
+    )
+    return compacted
+
+
+# ============= 会话存储 =============
+
+class ConversationStore:
+    """有界对话会话存储"""
+
+    def __init__(
+        self,
+        default_agent: Any,
+        agents: Optional[Dict[str, Any]] = None,
+        max_sessions: int = 100,
+        ttl_seconds: float = 1800,
+        sessions_dir: Optional[str] = None,
+    ):
+        """
+        Args:
+            default_agent: 新会话的起始 Agent
+            agents: Agent 名称 -> Agent，用于从磁盘恢复会话的 last_agent
+            max_sessions: 内存中保留的会话上限（LRU 淘汰）
+            ttl_seconds: 空闲超过该时长的会话落盘并移出内存
+            sessions_dir: 会话落盘目录（默认 data/sessions）
+        """
+        self.default_agent = default_agent
+        self.agents = dict(agents or {})
+        self.agents.setdefault(default_agent.name, default_agent)
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.sessions_dir = Path(sessions_dir or DEFAULT_SESSIONS_DIR)
+        self.sessions_dir.mkdir(parents=True, exist_ok=True)
+
+        self._sessions: "OrderedDict[str, ConversationSession]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get(self, session_id: str = "default") -> ConversationSession:
+        """获取会话：内存 → 磁盘 → 新建"""
+        self._evict_idle()
+
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._load(session_id) or ConversationSession(session_id=session_id, agent=self.default_agent)
+            self._sessions[session_id] = session
+
+        self._sessions.move_to_end(session_id)
+        session.last_active = time.time()
+        self._evict_overflow()
+        return session
+
+    def save(self, session: ConversationSession, agent: Any, input_items: List[Dict[str, Any]]) -> None:
+        """
+        保存一轮对话结果（压缩历史后写回会话）
+
+        Args:
+            session: get() 返回的会话
+            agent: 本轮结束时的 Agent（result.last_agent）
+            input_items: 本轮完整历史（result.to_input_list()）
+        """
+        before = _history_chars(input_items)
+        session.agent = agent
+        session.input_items = compact_input_items(input_items)
+        session.last_active = time.time()
+
+        after = _history_chars(session.input_items)
+        if after < before:
+            logger.info("🗜️ 对话历史已压缩", session_id=session.session_id, before_chars=before, after_chars=after)
+
+        # 会话可能在本轮执行期间被淘汰，写回内存
+        self._sessions[session.session_id] = session
+        self._sessions.move_to_end(session.session_id)
+        self._evict_overflow()
+
+    def reset(self, session_id: str = "default") -> None:
+        """删除会话（内存与磁盘）"""
+        self._sessions.pop(session_id, None)
+        self._session_path(session_id).unlink(missing_ok=True)
+
+    def persist_all(self) -> None:
+        """将内存中的全部会话落盘（服务关闭时调用）"""
+        for session in list(self._sessions.values()):
+            self._persist(session)
+        logger.info("💾 对话会话已全部落盘", count=len(self._sessions))
+
+    # ----- 内部 -----
+
+    def _evict_idle(self) -> None:
+        now = time.time()
+        for session_id, session in list(self._sessions.items()):
+            if now - session.last_active > self.ttl_seconds:
+                self._persist(session)
+                del self._sessions[session_id]
+                logger.info("💤 空闲会话已落盘", session_id=session_id)
+
+    def _evict_overflow(self) -> None:
+        while len(self._sessions) > self.max_sessions:
+            session_id, session = self._sessions.popitem(last=False)
+            self._persist(session)
+            logger.info("📤 会话数超出上限，最久未使用的会话已落盘", session_id=session_id)
+
+    def _session_path(self, session_id: str) -> Path:
+        # 会话 ID 来自客户端，哈希后作为文件名
+        digest = hashlib.sha256(session_id.encode("utf-8")).hexdigest()[:32]
+        return self.sessions_dir / f"{digest}.json"
+
+    def _persist(self, session: ConversationSession) -> None:
+        data = {
+            "session_id": session.session_id,
+            "agent": getattr(session.agent, "name", None),
+            "input_items": session.input_items,
+            "paper": session.digest_context.paper,
+            "last_active": session.last_active,
+        }
+        path = self._session_path(session.session_id)
+        try:
+            tmp_path = path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(data, ensure_ascii=False, default=str), encoding="utf-8")
+            tmp_path.replace(path)
+        except Exception as e:
+            logger.warning("⚠️ 会话落盘失败", session_id=session.session_id, error=str(e))
+
+    def _load(self, session_id: str) -> Optional[ConversationSession]:
+        path = self._session_path(session_id)
+        if not path.exists():
+            return None
+
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except Exception as e:
+            logger.warning("⚠️ 会话文件读取失败，创建新会话", session_id=session_id, error=str(e))
+            return None
+
+        logger.info("📥 已从磁盘恢复会话", session_id=session_id, items=len(data.get("input_items", [])))
+        return ConversationSession(
+            session_id=session_id,
+            agent=self.agents.get(data.get("agent"), self.default_agent),
+            input_items=data.get("input_items", []),
+            digest_context=DigestRunContext(paper=data.get("paper") or {}),
+        )
+
+
+def create_conversation_store(default_agent: Any, agents: Optional[Dict[str, Any]] = None) -> ConversationStore:
+    """按环境变量创建会话存储（CONVERSATION_MAX_SESSIONS / CONVERSATION_TTL_SECONDS / CONVERSATION_DIR）"""
+    return ConversationStore(
+        default_agent=default_agent,
+        agents=agents,
+        max_sessions=int(os.getenv("CONVERSATION_MAX_SESSIONS", "100")),
+        ttl_seconds=float(os.getenv("CONVERSATION_TTL_SECONDS", "1800")),
+        sessions_dir=os.getenv("CONVERSATION_DIR") or None,
+    )
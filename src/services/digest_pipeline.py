@@ -0,0 +1,300 @@
+"""
+论文整理流水线 - 确定性的异步编排（/api/digest 使用）
+
+按固定顺序直接调用 digest_agent 的各个工具，不经过 Agent 的多轮工具选择：
+    classify → fetch（小红书）→ search（未附 arXiv 链接时）→ download
+    → extract → digest → upload → save
+
+每个工具仍经由 FunctionTool.on_invoke_tool 调用，阶段事件上报（_tracked_stage）、
+请求合并（_coalesced）与分阶段并发槽位都与 Agent 调用时一致；
+进度来自真实的阶段事件，而不是工作开始前预先推送的步骤消息。
+"""
+
+import json
+import re
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from agents import FunctionTool
+from agents.tool_context import ToolContext
+
+from ..utils.logger import get_logger
+from .paper_catalog import PLACEHOLDER_TITLE, extract_arxiv_id, get_paper_catalog
+from .xhs_links import resolve_post_url
+from .paper_digest import (
+    DigestRunContext,
+    download_pdf_from_url,
+    extract_paper_metadata,
+    fetch_xiaohongshu_post,
+    generate_paper_digest,
+    save_digest_to_notion,
+    search_arxiv_pdf,
+)
+
+logger = get_logger(__name__)
+
+# 帖子正文中明确指向 arXiv 的链接或编号（避免把普通数字误认成 arXiv ID）
+_ARXIV_REF_PATTERN = re.compile(r"arxiv(?:\.org/(?:abs|pdf)/|\s*[:：]?\s*)(\d{4}\.\d{4,5})", re.IGNORECASE)
+
+
+class DigestPipelineError(Exception):
+    """流水线某个阶段失败"""
+
+    def __init__(self, stage: str, message: str):
+        super().__init__(f"[{stage}] {message}")
+        self.stage = stage
+
+
+def classify_url(url: str) -> str:
+    """检测 URL 类型：xiaohongshu / arxiv / pdf / unknown"""
+    url_lower = url.lower()
+
+    if 'xiaohongshu.com' in url_lower or 'xhslink.com' in url_lower:
+        return "xiaohongshu"
+    elif 'arxiv.org' in url_lower:
+        return "arxiv"
+    elif url_lower.endswith('.pdf') or 'pdf' in url_lower:
+        return "pdf"
+    else:
+        return "unknown"
+
+
+def _as_text(value: Any) -> str:
+    """把 LLM 提取结果中的数组 / null 字段转为工具参数需要的字符串"""
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple)):
+        return "; ".join(str(item) for item in value if item)
+    return str(value)
+
+
+def _as_json_list(value: Any) -> str:
+    """作者、关键词字段统一转为 JSON 数组字符串"""
+    if isinstance(value, str):
+        value = [item.strip() for item in value.split(",") if item.strip()]
+    return json.dumps(list(value or []), ensure_ascii=False)
+
+
+async def _call_tool(tool: FunctionTool, run_context: DigestRunContext, stage: str, **arguments) -> Dict[str, Any]:
+    """
+    以工具调用的方式执行单个阶段
+
+    Returns:
+        工具返回的 JSON（success 为 true）
+
+    Raises:
+        DigestPipelineError: 工具返回失败或输出无法解析
+    """
+    payload = json.dumps(arguments, ensure_ascii=False)
+    tool_context = ToolContext(
+        context=run_context,
+        tool_name=tool.name,
+        tool_call_id=f"pipeline-{uuid.uuid4().hex[:12]}",
+        tool_arguments=payload,
+    )
+    output = await tool.on_invoke_tool(tool_context, payload)
+
+    try:
+        data = json.loads(output)
+    except (TypeError, ValueError):
+        raise DigestPipelineError(stage, str(output))
+
+    if not data.get("success"):
+        raise DigestPipelineError(stage, data.get("error") or "未知错误")
+    return data
+
+
+def _known_result(known: Dict[str, Any], fallback_title: str = "") -> Dict[str, Any]:
+    """论文目录命中时的结果"""
+    notion_url = known.get("notion_url") or known.get("page_url")
+    return {
+        "title": known.get("title") or fallback_title or "未命名笔记",
+        "notion_url": notion_url,
+        "digest_file": known.get("digest_file"),
+        "already_processed": True,
+        "queued": notion_url is None,
+    }
+
+
+async def run_digest_pipeline(
+    url: str,
+    run_context: DigestRunContext,
+    force_refresh: bool = False,
+) -> Dict[str, Any]:
+    """
+    整理单个链接（小红书帖子 / arXiv / PDF）并保存到 Notion
+
+    Args:
+        url: 用户提交的链接
+        run_context: 本次整理的运行上下文（阶段事件经 on_event 上报）
+        force_refresh: 忽略论文目录，强制重新整理
+
+    Returns:
+        {"title", "notion_url", "digest_file", "already_processed", "queued"}
+
+    Raises:
+        DigestPipelineError: 任一必需阶段失败
+    """
+    start_time = time.time()
+    paper = run_context.paper
+
+    # ----- classify：链接类型 + 论文目录 -----
+    run_context.emit("classify", "start", url=url)
+    url_type = classify_url(url)
+    if url_type == "unknown":
+        run_context.emit("classify", "error", error="无法识别的链接类型")
+        raise DigestPipelineError("classify", f"无法识别的链接类型: {url}")
+
+    if url_type == "xiaohongshu":
+        # 短链跟随一次跳转（结果带 TTL 缓存），查询参数不同的链接规范为同一帖子
+        try:
+            url = await resolve_post_url(url)
+        except Exception as e:
+            run_context.emit("classify", "error", error=f"短链解析失败: {e}")
+            raise DigestPipelineError("classify", f"短链解析失败: {e}")
+
+    known = None if force_refresh else get_paper_catalog().lookup_url(url)
+    run_context.emit(
+        "classify",
+        "done",
+        url_type=url_type,
+        url=url,
+        already_processed=bool(known),
+        page_url=(known or {}).get("notion_url"),
+    )
+    if known:
+        logger.info("✅ 论文目录命中，跳过整理", url=url)
+        return _known_result(known)
+
+    xiaohongshu_content = ""
+    source_url = ""
+    pdf_url = ""
+    arxiv_id = ""
+    metadata: Dict[str, Any] = {}
+
+    # ----- fetch / search：确定 PDF 链接 -----
+    if url_type == "xiaohongshu":
+        source_url = url
+        post = await _call_tool(
+            fetch_xiaohongshu_post, run_context, "fetch", post_url=url, force_refresh=force_refresh
+        )
+        if post.get("already_processed"):
+            return _known_result(post)
+        xiaohongshu_content = post.get("content") or ""
+
+        match = _ARXIV_REF_PATTERN.search(xiaohongshu_content)
+        if match:
+            arxiv_id = match.group(1)
+        else:
+            # 帖子未附 arXiv 链接：先从正文提取标题，再到 arXiv 搜索
+            metadata = await _call_tool(
+                extract_paper_metadata, run_context, "extract", xiaohongshu_content=xiaohongshu_content
+            )
+            if metadata.get("already_processed") and not force_refresh:
+                return _known_result(metadata["already_processed"], metadata.get("title"))
+            try:
+                found = await _call_tool(
+                    search_arxiv_pdf,
+                    run_context,
+                    "search",
+                    paper_title=metadata.get("title") or "",
+                    force_refresh=force_refresh,
+                )
+                if found.get("already_processed"):
+                    return _known_result(found, metadata.get("title"))
+                pdf_url = found.get("pdf_url") or ""
+                arxiv_id = found.get("arxiv_id") or ""
+            except DigestPipelineError as e:
+                logger.warning("⚠️ 未找到论文 PDF，仅根据帖子内容整理", error=str(e))
+
+        if arxiv_id and not pdf_url:
+            pdf_url = f"https://arxiv.org/pdf/{arxiv_id}"
+    elif url_type == "arxiv":
+        arxiv_id = extract_arxiv_id(url)
+        pdf_url = f"https://arxiv.org/pdf/{arxiv_id}" if arxiv_id else url
+    else:
+        pdf_url = url
+
+    # ----- download -----
+    if pdf_url:
+        downloaded = await _call_tool(
+            download_pdf_from_url,
+            run_context,
+            "download",
+            pdf_url=pdf_url,
+            paper_title=metadata.get("title") or arxiv_id or "paper",
+            force_refresh=force_refresh,
+        )
+        # 目录按 PDF 链接 / 内容哈希命中：PDF 未读取，不能继续整理（否则会用帖子内容覆盖已有页面）
+        if downloaded.get("already_processed"):
+            return _known_result(downloaded, metadata.get("title"))
+
+    # ----- extract：结合 PDF 全文提取完整元数据 -----
+    if paper.get("pdf_content") or not metadata:
+        metadata = await _call_tool(
+            extract_paper_metadata,
+            run_context,
+            "extract",
+            xiaohongshu_content=xiaohongshu_content,
+            pdf_content=paper.get("pdf_content") or "",
+            pdf_metadata=json.dumps(paper.get("pdf_metadata") or {}, ensure_ascii=False),
+        )
+    if metadata.get("already_processed") and not force_refresh:
+        return _known_result(metadata["already_processed"], metadata.get("title"))
+
+    title = metadata.get("title") or PLACEHOLDER_TITLE
+    arxiv_id = _as_text(metadata.get("arxiv_id")) or arxiv_id
+
+    # ----- digest -----
+    digest = await _call_tool(
+        generate_paper_digest,
+        run_context,
+        "digest",
+        xiaohongshu_content=xiaohongshu_content,
+        paper_title=title,
+        pdf_content=paper.get("pdf_content") or "",
+        authors=_as_json_list(metadata.get("authors")),
+        publication_date=_as_text(metadata.get("publication_date")),
+        venue=_as_text(metadata.get("venue")),
+        abstract=_as_text(metadata.get("abstract")),
+        affiliations=_as_text(metadata.get("affiliations")),
+        keywords=_as_json_list(metadata.get("keywords")),
+        project_page=_as_text(metadata.get("project_page")),
+        other_resources=_as_text(metadata.get("other_resources")),
+        pdf_path=paper.get("pdf_path") or "",
+    )
+
+    # ----- upload + save（图片上传在保存过程中上报 upload 阶段） -----
+    saved = await _call_tool(
+        save_digest_to_notion,
+        run_context,
+        "save",
+        paper_title=title,
+        digest_content=digest.get("digest_content") or "",
+        source_url=source_url,
+        pdf_url=pdf_url,
+        authors=_as_json_list(metadata.get("authors")),
+        affiliations=_as_text(metadata.get("affiliations")),
+        publication_date=_as_text(metadata.get("publication_date")),
+        venue=_as_text(metadata.get("venue")),
+        abstract=_as_text(metadata.get("abstract")),
+        keywords=_as_json_list(metadata.get("keywords")),
+        doi=_as_text(metadata.get("doi")),
+        arxiv_id=arxiv_id,
+        project_page=_as_text(metadata.get("project_page")),
+        other_resources=_as_text(metadata.get("other_resources")),
+    )
+
+    elapsed = time.time() - start_time
+    logger.info("✅ 整理流水线完成", title=title[:100], url_type=url_type, elapsed_time=f"{elapsed:.2f}s")
+
+    notion_url: Optional[str] = saved.get("page_url")
+    return {
+        "title": title,
+        "notion_url": notion_url,
+        "digest_file": digest.get("output_file"),
+        "already_processed": False,
+        # outbox 排队中：页面稍后由后台 worker 创建
+        "queued": notion_url is None,
+    }
@@ -0,0 +1,195 @@
+"""
+图片转码模块 - 上传 Notion 前压缩论文图片
+
+功能：
+1. 按最大宽度等比缩小（IMAGE_MAX_WIDTH）
+2. 根据图片内容选择格式：线稿 / 图表 → 无损优化 PNG（颜色少时用调色板），照片 → WebP/JPEG
+3. 单张图片不超过字节预算（IMAGE_MAX_BYTES）：依次降低质量、减少颜色、再缩小尺寸
+4. 转码结果写入图片目录下的 transcoded/ 子目录并复用（文件名带转码参数，
+   修改 IMAGE_MAX_WIDTH / IMAGE_MAX_BYTES / IMAGE_PHOTO_FORMAT 后重新转码），原图保留不动
+
+PDFFigures2（-i 300）与 PyMuPDF（zoom = 300/72）都按 300 DPI 渲染 PNG，
+单张常有数 MB，转码后通常缩小数倍。
+"""
+
+import hashlib
+import logging
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+try:
+    from PIL import Image
+    HAS_PIL = True
+except ImportError:
+    HAS_PIL = False
+
+logger = logging.getLogger(__name__)
+
+TRANSCODED_DIRNAME = "transcoded"
+
+# 缩略图中出现次数最多的若干种颜色覆盖了绝大部分像素 → 线稿 / 图表
+_LINE_ART_SAMPLE_SIZE = 256
+_LINE_ART_TOP_COLORS = 32
+_LINE_ART_COVERAGE = 0.85
+
+_LOSSY_QUALITIES = (85, 75, 65, 55, 45)
+_MAX_DOWNSCALE_STEPS = 4
+_DOWNSCALE_FACTOR = 0.8
+
+
+@dataclass
+class TranscodeSettings:
+    """转码参数"""
+
+    enabled: bool = True
+    max_width: int = 1600
+    max_bytes: int = 500_000
+    photo_format: str = "WEBP"  # WEBP 或 JPEG
+
+    @classmethod
+    def from_env(cls) -> "TranscodeSettings":
+        photo_format = os.getenv("IMAGE_PHOTO_FORMAT", "webp").upper()
+        if photo_format == "JPG":
+            photo_format = "JPEG"
+        return cls(
+            enabled=os.getenv("IMAGE_TRANSCODE", "true").lower() not in ("0", "false", "no"),
+            max_width=int(os.getenv("IMAGE_MAX_WIDTH", "1600")),
+            max_bytes=int(os.getenv("IMAGE_MAX_BYTES", "500000")),
+            photo_format=photo_format if photo_format in ("WEBP", "JPEG") else "WEBP",
+        )
+
+    @property
+    def photo_suffix(self) -> str:
+        return ".webp" if self.photo_format == "WEBP" else ".jpg"
+
+    def cache_tag(self) -> str:
+        """转码结果文件名中的参数标识：参数不同的结果互不复用"""
+        payload = f"{self.max_width}:{self.max_bytes}:{self.photo_format}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:8]
+
+
+def is_line_art(image: "Image.Image") -> bool:
+    """判断是否为线稿 / 图表（少量颜色覆盖绝大部分像素），否则视为照片"""
+    # 最近邻采样：不引入插值产生的中间色
+    scale = min(1.0, _LINE_ART_SAMPLE_SIZE / max(image.width, image.height))
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    sample = image.convert("RGB").resize(size, Image.Resampling.NEAREST)
+    colors = sample.getcolors(maxcolors=sample.width * sample.height)
+    if not colors:
+        return False
+    colors.sort(reverse=True)
+    covered = sum(count for count, _ in colors[:_LINE_ART_TOP_COLORS])
+    return covered / (sample.width * sample.height) >= _LINE_ART_COVERAGE
+
+
+def _has_alpha(image: "Image.Image") -> bool:
+    return image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+
+
+def _encode_png(image: "Image.Image", target: Path, max_bytes: int) -> int:
+    """无损优化 PNG；不透明且颜色不超过 256 种时转为调色板（仍无损），超出预算再量化到 256 色"""
+    alpha = _has_alpha(image)
+    image = image.convert("RGBA" if alpha else "RGB")
+    # 只有 FASTOCTREE 支持 RGBA；MEDIANCUT 在颜色数不超过 256 时得到精确调色板
+    method = Image.Quantize.FASTOCTREE if alpha else Image.Quantize.MEDIANCUT
+
+    lossless = image
+    if not alpha and image.getcolors(maxcolors=256) is not None:
+        lossless = image.quantize(colors=256, method=method)
+    lossless.save(target, "PNG", optimize=True)
+
+    if target.stat().st_size > max_bytes and lossless is image:
+        image.quantize(colors=256, method=method).save(target, "PNG", optimize=True)
+    return target.stat().st_size
+
+
+def _encode_lossy(image: "Image.Image", target: Path, max_bytes: int, photo_format: str) -> int:
+    """WebP / JPEG，从高到低尝试质量，直到满足预算"""
+    if photo_format == "JPEG" and _has_alpha(image):
+        # JPEG 不支持透明通道：铺白底
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.convert("RGBA").getchannel("A"))
+        image = background
+
+    for quality in _LOSSY_QUALITIES:
+        if photo_format == "WEBP":
+            image.save(target, "WEBP", quality=quality, method=6)
+        else:
+            image.save(target, "JPEG", quality=quality, optimize=True, progressive=True)
+        if target.stat().st_size <= max_bytes:
+            break
+    return target.stat().st_size
+
+
+def transcode_image(source: Path, settings: Optional[TranscodeSettings] = None) -> Path:
+    """
+    转码单张图片，返回应上传的文件路径
+
+    结果缓存在 source 同级的 transcoded/ 目录，文件名带参数标识
+    （同一参数下比原图新时直接复用）；
+    转码没有收益（更大、或原图本就在预算内且不超宽）或失败时返回原图。
+
+    Args:
+        source: 原图路径
+        settings: 转码参数（默认读取环境变量）
+
+    Returns:
+        转码后的图片路径，或原图路径
+    """
+    settings = settings or TranscodeSettings.from_env()
+    if not settings.enabled or not HAS_PIL:
+        return source
+
+    source = Path(source)
+    out_dir = source.parent / TRANSCODED_DIRNAME
+    cache_stem = f"{source.stem}.{settings.cache_tag()}"
+    source_mtime = source.stat().st_mtime
+    for suffix in (".png", settings.photo_suffix):
+        existing = out_dir / f"{cache_stem}{suffix}"
+        if existing.exists() and existing.stat().st_mtime >= source_mtime:
+            return existing
+
+    original_bytes = source.stat().st_size
+    try:
+        with Image.open(source) as opened:
+            # Image.open 只读取文件头：不需要转码时不解码像素
+            if original_bytes <= settings.max_bytes and opened.width <= settings.max_width:
+                return source
+            image = opened.convert("RGBA" if _has_alpha(opened) else "RGB")
+
+        line_art = is_line_art(image)
+        photo_format = settings.photo_format
+        suffix = ".png" if line_art else settings.photo_suffix
+        out_dir.mkdir(parents=True, exist_ok=True)
+        target = out_dir / f"{cache_stem}{suffix}"
+
+        if image.width > settings.max_width:
+            height = max(1, round(image.height * settings.max_width / image.width))
+            image = image.resize((settings.max_width, height), Image.Resampling.LANCZOS)
+
+        for _ in range(_MAX_DOWNSCALE_STEPS + 1):
+            if line_art:
+                size = _encode_png(image, target, settings.max_bytes)
+            else:
+                size = _encode_lossy(image, target, settings.max_bytes, photo_format)
+            if size <= settings.max_bytes:
+                break
+            width = max(1, round(image.width * _DOWNSCALE_FACTOR))
+            height = max(1, round(image.height * _DOWNSCALE_FACTOR))
+            image = image.resize((width, height), Image.Resampling.LANCZOS)
+
+        if size >= original_bytes:
+            target.unlink(missing_ok=True)
+            return source
+
+        logger.info(
+            f"🗜️ 图片转码: {source.name} {original_bytes} → {size} bytes "
+            f"({'PNG 线稿' if line_art else photo_format + ' 照片'}, {image.width}px)"
+        )
+        return target
+
+    except Exception as e:
+        logger.warning(f"⚠️ 图片转码失败，上传原图: {source.name}: {e}")
+        return source
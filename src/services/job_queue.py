@@ -0,0 +1,293 @@
+"""
+任务队列 - 有界 worker 池 + 分阶段并发限制
+
+功能：
+1. 为每个 /api/digest、/api/chat 请求分配任务 ID，可通过 /api/jobs 查询状态
+2. 固定数量的 worker 消费队列；队列满时拒绝提交（Web 层返回 429）
+3. 分阶段并发槽位（llm / pdf / notion），限制同时进行的 LLM 调用、
+   PDFFigures2（JVM）提取和 Notion 写入数量
+4. 根据工具上报的阶段事件计算任务进度
+5. 相同来源（dedupe_key）的重复提交合并到进行中的任务，共享同一个结果
+"""
+
+import asyncio
+import os
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from ..models.job import Job, JobEvent, JobStatus
+from ..utils.logger import get_logger
+from ..utils.metrics import JOB_QUEUE_DEPTH, JOBS_ACTIVE
+
+logger = get_logger(__name__)
+
+# 整理流水线的阶段顺序（用于计算进度）
+DIGEST_STAGES = ["classify", "fetch", "search", "download", "extract", "digest", "upload", "save"]
+
+# 分阶段并发限制：stage -> (环境变量, 默认值)
+STAGE_LIMITS = {
+    "llm": ("JOB_LLM_CONCURRENCY", 4),
+    "pdf": ("JOB_PDF_CONCURRENCY", 2),
+    "notion": ("JOB_NOTION_CONCURRENCY", 3),
+}
+
+JobHandler = Callable[[Job], Awaitable[Optional[Dict[str, Any]]]]
+JobListener = Callable[[Job, Optional[JobEvent]], None]
+
+
+class JobQueueFull(Exception):
+    """队列已满，拒绝提交"""
+    pass
+
+
+# ============= 分阶段并发槽位 =============
+
+_stage_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+
+def stage_slot(stage: str) -> asyncio.Semaphore:
+    """
+    获取阶段并发槽位
+
+    用法:
+        async with stage_slot("llm"):
+            result = await Runner.run(...)
+
+    不论是否经由任务队列（聊天、定时任务）调用，同一进程内的并发上限都生效。
+    """
+    if stage not in _stage_semaphores:
+        env_name, default = STAGE_LIMITS.get(stage, (None, 1))
+        limit = int(os.getenv(env_name, default)) if env_name else default
+        _stage_semaphores[stage] = asyncio.Semaphore(max(1, limit))
+    return _stage_semaphores[stage]
+
+
+# ============= 任务队列 =============
+
+class JobQueue:
+    """有界任务队列"""
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        max_queue: int = 20,
+        history_size: int = 200,
+        listener: Optional[JobListener] = None,
+    ):
+        """
+        Args:
+            max_workers: 并发执行的任务数
+            max_queue: 排队任务上限（超过后 submit 抛出 JobQueueFull）
+            history_size: 保留的已结束任务数量（供状态查询）
+            listener: 任务状态/阶段事件回调（同步调用，不能阻塞）
+        """
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.history_size = history_size
+        self.listener = listener
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._handlers: Dict[str, JobHandler] = {}
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._inflight: Dict[str, str] = {}  # dedupe_key -> 排队/执行中的 job_id
+        self._workers: List[asyncio.Task] = []
+
+    # ----- 生命周期 -----
+
+    def start(self) -> None:
+        """启动 worker（需在事件循环中调用）"""
+        if self._workers:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._workers = [
+            asyncio.create_task(self._worker(i), name=f"job-worker-{i}")
+            for i in range(self.max_workers)
+        ]
+        logger.info("🚀 任务队列已启动", max_workers=self.max_workers, max_queue=self.max_queue)
+
+    async def stop(self) -> None:
+        """停止 worker（正在执行的任务会被取消）"""
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        logger.info("🛑 任务队列已停止")
+
+    # ----- 提交与查询 -----
+
+    def submit(
+        self,
+        kind: str,
+        payload: Dict[str, Any],
+        handler: JobHandler,
+        dedupe_key: Optional[str] = None,
+    ) -> Job:
+        """
+        提交任务
+
+        Args:
+            kind: 任务类型（"digest" / "chat" / "crawl"）
+            payload: 任务参数
+            handler: 异步处理函数 `handler(job) -> result`
+            dedupe_key: 规范化来源标识；已有相同 key 的任务在排队或执行时，
+                直接返回该任务（attached + 1），不占用队列
+
+        Returns:
+            Job
+
+        Raises:
+            JobQueueFull: 队列已满
+        """
+        if self._queue is None:
+            raise RuntimeError("任务队列尚未启动")
+
+        if dedupe_key and dedupe_key in self._inflight:
+            job = self._jobs[self._inflight[dedupe_key]]
+            job.attached += 1
+            logger.info("🔗 重复提交已合并到进行中的任务", job_id=job.job_id, dedupe_key=dedupe_key, attached=job.attached)
+            self._notify(job)
+            return job
+
+        job = Job(job_id=uuid.uuid4().hex[:12], kind=kind, payload=payload, dedupe_key=dedupe_key)
+        try:
+            self._queue.put_nowait(job.job_id)
+        except asyncio.QueueFull:
+            logger.warning("⚠️ 任务队列已满，拒绝提交", kind=kind, depth=self._queue.qsize())
+            raise JobQueueFull(f"任务队列已满（{self.max_queue}），请稍后重试")
+
+        self._jobs[job.job_id] = job
+        self._handlers[job.job_id] = handler
+        if dedupe_key:
+            self._inflight[dedupe_key] = job.job_id
+        self._trim_history()
+        self._notify(job)
+
+        logger.info("📥 任务已入队", job_id=job.job_id, kind=kind, depth=self._queue.qsize())
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def list(self, status: Optional[str] = None, kind: Optional[str] = None, limit: int = 50) -> List[Job]:
+        """按提交时间倒序列出任务"""
+        jobs = [
+            job for job in reversed(self._jobs.values())
+            if (status is None or job.status == status) and (kind is None or job.kind == kind)
+        ]
+        return jobs[:limit]
+
+    @property
+    def depth(self) -> int:
+        """排队中的任务数"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    @property
+    def active(self) -> int:
+        """执行中的任务数"""
+        return sum(1 for job in self._jobs.values() if job.status == JobStatus.RUNNING)
+
+    # ----- 阶段事件 -----
+
+    def record_event(self, job: Job, stage: str, status: str, info: Optional[Dict[str, Any]] = None) -> None:
+        """记录阶段事件并更新进度（由 DigestRunContext.on_event 调用）"""
+        event = JobEvent(stage=stage, status=status, info=info or {})
+        job.events.append(event)
+        job.stage = stage
+
+        if status == "done" and stage in DIGEST_STAGES:
+            progress = (DIGEST_STAGES.index(stage) + 1) / len(DIGEST_STAGES)
+            # 已处理过的论文在早期阶段就会结束
+            if (info or {}).get("already_processed"):
+                progress = 1.0
+            job.progress = max(job.progress, round(progress, 2))
+
+        self._notify(job, event)
+
+    def event_callback(self, job: Job) -> Callable[[str, str, Dict[str, Any]], None]:
+        """生成绑定到指定任务的阶段事件回调"""
+        return lambda stage, status, info: self.record_event(job, stage, status, info)
+
+    # ----- 内部 -----
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            job_id = await self._queue.get()
+            job = self._jobs.get(job_id)
+            handler = self._handlers.pop(job_id, None)
+            try:
+                if job is None or handler is None:
+                    continue
+                await self._run(job, handler)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Job, handler: JobHandler) -> None:
+        job.status = JobStatus.RUNNING
+        job.started_at = datetime.now()
+        self._notify(job)
+
+        try:
+            job.result = await handler(job)
+            job.status = JobStatus.SUCCEEDED
+            job.progress = 1.0
+        except asyncio.CancelledError:
+            job.status = JobStatus.FAILED
+            job.error = "任务已取消"
+            # 只有 worker 自身被取消（服务关闭）才继续抛出；
+            # 处理函数内部的取消（例如合并的领头调用被取消）不能让 worker 退出
+            if asyncio.current_task().cancelling():
+                raise
+            logger.warning("⚠️ 任务被内部取消", job_id=job.job_id, kind=job.kind)
+        except Exception as e:
+            job.status = JobStatus.FAILED
+            job.error = str(e)
+            logger.error("❌ 任务执行失败", job_id=job.job_id, kind=job.kind, error=str(e))
+        finally:
+            job.finished_at = datetime.now()
+            if job.dedupe_key:
+                self._inflight.pop(job.dedupe_key, None)
+            self._notify(job)
+
+        elapsed = (job.finished_at - job.started_at).total_seconds()
+        logger.info(
+            "✅ 任务结束",
+            job_id=job.job_id,
+            kind=job.kind,
+            status=job.status.value,
+            elapsed_time=f"{elapsed:.2f}s",
+        )
+
+    def _trim_history(self) -> None:
+        """只保留最近 history_size 个已结束任务"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.is_finished]
+        for job_id in finished[:max(0, len(finished) - self.history_size)]:
+            del self._jobs[job_id]
+
+    def _notify(self, job: Job, event: Optional[JobEvent] = None) -> None:
+        if self.listener is None:
+            return
+        try:
+            self.listener(job, event)
+        except Exception as e:
+            logger.warning("⚠️ 任务事件回调失败", job_id=job.job_id, error=str(e))
+
+
+# 全局实例
+_job_queue: Optional[JobQueue] = None
+
+
+def get_job_queue() -> JobQueue:
+    """获取进程级任务队列（参数读取 JOB_MAX_WORKERS / JOB_MAX_QUEUE）"""
+    global _job_queue
+
+    if _job_queue is None:
+        _job_queue = JobQueue(
+            max_workers=int(os.getenv("JOB_MAX_WORKERS", "4")),
+            max_queue=int(os.getenv("JOB_MAX_QUEUE", "20")),
+        )
+        JOB_QUEUE_DEPTH.set_function(lambda: _job_queue.depth)
+        JOBS_ACTIVE.set_function(lambda: _job_queue.active)
+
+    return _job_queue
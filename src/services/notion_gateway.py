@@ -0,0 +1,131 @@
+"""
+Notion 网关 - 进程级共享的 Notion 客户端
+
+功能：
+1. 持有一个长连接的 httpx.AsyncClient（HTTP/1.1 keep-alive 连接池）
+2. 基于该连接池构建 notion_client.AsyncClient，供页面创建等 API 调用
+3. 图片上传（NotionImageUploader）复用同一个连接池
+4. 启动时预热（建立 TLS 连接并校验 token），退出时统一关闭
+
+连接建立只在进程生命周期内发生一次，不再出现在每篇论文的关键路径上。
+"""
+
+import os
+from typing import Optional
+
+import httpx
+
+from ..utils.logger import get_logger
+from ..utils.metrics import count_rate_limited
+
+logger = get_logger(__name__)
+
+NOTION_API_BASE = "https://api.notion.com"
+
+
+class NotionGateway:
+    """Notion API 网关（单个连接池，进程内共享）"""
+
+    def __init__(
+        self,
+        notion_token: Optional[str] = None,
+        max_connections: int = 10,
+        keepalive_expiry: float = 120.0,
+        timeout: float = 60.0,
+    ):
+        """
+        初始化网关（不会立即建立连接）
+
+        Args:
+            notion_token: Notion API token（默认读取 NOTION_TOKEN）
+            max_connections: 连接池最大连接数
+            keepalive_expiry: 空闲连接保活时间（秒）
+            timeout: 请求超时（秒）
+        """
+        self.notion_token = notion_token or os.getenv("NOTION_TOKEN")
+        self.max_connections = max_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.timeout = timeout
+
+        self._http: Optional[httpx.AsyncClient] = None
+        self._client = None
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """共享的 httpx 连接池（HTTP/1.1 keep-alive）"""
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                http2=False,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=self.keepalive_expiry,
+                ),
+                event_hooks={"response": [count_rate_limited("notion")]},
+            )
+            self._client = None
+        return self._http
+
+    @property
+    def client(self):
+        """基于共享连接池的 notion_client.AsyncClient"""
+        if self._client is None or self._http is None or self._http.is_closed:
+            from notion_client import AsyncClient
+
+            self._client = AsyncClient(auth=self.notion_token, client=self.http)
+        return self._client
+
+    async def warm_up(self) -> bool:
+        """
+        预热连接：建立到 api.notion.com 的 TLS 连接并校验 token
+
+        Returns:
+            预热是否成功（失败不影响后续使用，只记录警告）
+        """
+        if not self.notion_token:
+            logger.warning("未配置 NOTION_TOKEN，跳过 Notion 连接预热")
+            return False
+
+        try:
+            await self.client.users.me()
+            logger.info("✅ Notion 连接预热完成")
+            return True
+        except Exception as e:
+            logger.warning("⚠️ Notion 连接预热失败", error=str(e))
+            return False
+
+    async def aclose(self) -> None:
+        """关闭连接池"""
+        if self._http is not None and not self._http.is_closed:
+            await self._http.aclose()
+        self._http = None
+        self._client = None
+
+
+# 全局网关实例
+_gateway: Optional[NotionGateway] = None
+
+
+def get_notion_gateway() -> NotionGateway:
+    """获取进程级 Notion 网关（首次调用时创建）"""
+    global _gateway
+
+    if _gateway is None:
+        _gateway = NotionGateway()
+
+    return _gateway
+
+
+async def warm_up_notion_gateway() -> bool:
+    """启动时预热 Notion 网关"""
+    return await get_notion_gateway().warm_up()
+
+
+async def close_notion_gateway() -> None:
+    """退出时关闭 Notion 网关"""
+    global _gateway
+
+    if _gateway is not None:
+        await _gateway.aclose()
+        _gateway = None
@@ -7,6 +7,7 @@ Notion 图片上传模块
 3. 处理图片引用和转换
 """
 
+import asyncio
 import os
 import json
 from pathlib import Path
@@ -14,20 +15,25 @@ from typing import Dict, List, Optional, Tuple
 import logging
 import httpx
 
+from ..utils.metrics import STAGE_SECONDS
+from .image_transcoder import transcode_image
+
 logger = logging.getLogger(__name__)
 
 
 class NotionImageUploader:
     """Notion 图片上传器"""
 
-    def __init__(self, notion_token: str):
+    def __init__(self, notion_token: str, client: Optional[httpx.AsyncClient] = None):
         """
         初始化上传器
 
         Args:
             notion_token: Notion API token
+            client: 共享的 httpx 连接池（为 None 时每次上传临时创建）
         """
         self.notion_token = notion_token
+        self.client = client
         self.base_url = "https://api.notion.com/v1"
         self.headers = {
             "Authorization": f"Bearer {notion_token}",
@@ -43,6 +49,9 @@ class NotionImageUploader:
         """
         上传单张图片到 Notion
 
+        上传前先转码（缩小尺寸、按内容选择 PNG / WebP / JPEG、控制字节预算），
+        实际上传 transcoded/ 下的文件，原图保留不动。
+
         Args:
             image_path: 本地图片路径
             image_filename: 图片文件名（如果为 None 则使用原文件名）
@@ -51,7 +60,8 @@ class NotionImageUploader:
             {
                 "file_upload_id": "...",
                 "status": "uploaded",
-                "filename": "..."
+                "filename": "...",          # 原图文件名（upload_map 的键）
+                "uploaded_filename": "..."  # 实际上传的文件名
             }
         """
         image_path = Path(image_path)
@@ -62,6 +72,13 @@ class NotionImageUploader:
         if image_filename is None:
             image_filename = image_path.name
 
+        original_filename = image_filename
+        with STAGE_SECONDS.time(stage="image_transcode"):
+            transcoded_path = await asyncio.to_thread(transcode_image, image_path)
+        if transcoded_path != image_path:
+            image_path = transcoded_path
+            image_filename = f"{Path(original_filename).stem}{transcoded_path.suffix}"
+
         # 确定 content_type
         ext_to_mime = {
             ".png": "image/png",
@@ -83,63 +100,84 @@ class NotionImageUploader:
         logger.info(f"📤 开始上传图片: {image_filename} ({file_size} bytes)")
 
         try:
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                # Step 1: 创建 file upload 对象
-                logger.debug("Step 1: 创建 file upload 对象")
-                create_response = await client.post(
-                    f"{self.base_url}/file_uploads",
-                    headers=self.headers,
-                    json={
-                        "filename": image_filename,
-                        "content_type": content_type,
-                    }
-                )
-                create_response.raise_for_status()
-                upload_data = create_response.json()
-
-                file_upload_id = upload_data.get("id")
-                if not file_upload_id:
-                    raise ValueError("创建 file upload 失败：未获得 ID")
-
-                logger.debug(f"File upload ID: {file_upload_id}")
-
-                # Step 2: 上传文件内容
-                logger.debug("Step 2: 上传文件内容")
-                with open(image_path, "rb") as f:
-                    send_response = await client.post(
-                        f"{self.base_url}/file_uploads/{file_upload_id}/send",
-                        headers={
-                            "Authorization": f"Bearer {self.notion_token}",
-                            "Notion-Version": "2022-06-28",
-                        },
-                        files={"file": (image_filename, f, content_type)}
+            with STAGE_SECONDS.time(stage="image_upload"):
+                if self.client is not None:
+                    result = await self._upload_with_client(
+                        self.client, image_path, image_filename, content_type
                     )
-                    send_response.raise_for_status()
-
-                logger.debug("文件内容上传成功")
-
-                # Step 3: 获取最终状态
-                logger.debug("Step 3: 获取最终状态")
-                status_response = await client.get(
-                    f"{self.base_url}/file_uploads/{file_upload_id}",
-                    headers=self.headers
-                )
-                status_response.raise_for_status()
-                final_data = status_response.json()
-
-                status = final_data.get("status", "unknown")
-                logger.info(f"✅ 图片上传成功: {image_filename} (ID: {file_upload_id}, status: {status})")
+                else:
+                    async with httpx.AsyncClient(timeout=60.0) as client:
+                        result = await self._upload_with_client(
+                            client, image_path, image_filename, content_type
+                        )
 
-                return {
-                    "file_upload_id": file_upload_id,
-                    "status": status,
-                    "filename": image_filename,
-                }
+            # 映射仍以原图文件名为键，Markdown 中的图片引用无需改动
+            return {**result, "filename": original_filename, "uploaded_filename": image_filename}
 
         except Exception as e:
             logger.error(f"❌ 图片上传失败: {e}")
             raise
 
+    async def _upload_with_client(
+        self,
+        client: httpx.AsyncClient,
+        image_path: Path,
+        image_filename: str,
+        content_type: str
+    ) -> Dict[str, str]:
+        """使用给定的 httpx 客户端完成三步上传流程"""
+        # Step 1: 创建 file upload 对象
+        logger.debug("Step 1: 创建 file upload 对象")
+        create_response = await client.post(
+            f"{self.base_url}/file_uploads",
+            headers=self.headers,
+            json={
+                "filename": image_filename,
+                "content_type": content_type,
+            }
+        )
+        create_response.raise_for_status()
+        upload_data = create_response.json()
+
+        file_upload_id = upload_data.get("id")
+        if not file_upload_id:
+            raise ValueError("创建 file upload 失败：未获得 ID")
+
+        logger.debug(f"File upload ID: {file_upload_id}")
+
+        # Step 2: 上传文件内容
+        logger.debug("Step 2: 上传文件内容")
+        with open(image_path, "rb") as f:
+            send_response = await client.post(
+                f"{self.base_url}/file_uploads/{file_upload_id}/send",
+                headers={
+                    "Authorization": f"Bearer {self.notion_token}",
+                    "Notion-Version": "2022-06-28",
+                },
+                files={"file": (image_filename, f, content_type)}
+            )
+            send_response.raise_for_status()
+
+        logger.debug("文件内容上传成功")
+
+        # Step 3: 获取最终状态
+        logger.debug("Step 3: 获取最终状态")
+        status_response = await client.get(
+            f"{self.base_url}/file_uploads/{file_upload_id}",
+            headers=self.headers
+        )
+        status_response.raise_for_status()
+        final_data = status_response.json()
+
+        status = final_data.get("status", "unknown")
+        logger.info(f"✅ 图片上传成功: {image_filename} (ID: {file_upload_id}, status: {status})")
+
+        return {
+            "file_upload_id": file_upload_id,
+            "status": status,
+            "filename": image_filename,
+        }
+
     async def upload_images_batch(
         self,
         image_paths: List[str]
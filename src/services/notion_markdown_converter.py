@@ -2,15 +2,72 @@
 Markdown to Notion Blocks Converter
 
 使用 mistletoe 解析 Markdown 并转换为 Notion API blocks
-支持：加粗、斜体、删除线、内联代码、嵌套列表等
+支持：加粗、斜体、删除线、内联代码、嵌套列表、<figure> 图片等
 """
 
-from typing import List, Dict, Any
+import logging
+import re
+from typing import List, Dict, Any, Optional
 from mistletoe import Document
 from mistletoe.base_renderer import BaseRenderer
 import mistletoe.block_token as block_token
 import mistletoe.span_token as span_token
 
+logger = logging.getLogger(__name__)
+
+
+class FigureBlock(block_token.BlockToken):
+    """
+    HTML 图片块：<figure><img src=... alt=...><figcaption>...</figcaption></figure>
+
+    作为自定义 block token 注册在 HtmlBlock 之前，与其余 Markdown 在同一次解析中处理，
+    跨图片的列表、表格不会被切断。
+    """
+
+    _src_pattern = re.compile(r'<img[^>]*\ssrc="([^"]*)"', re.IGNORECASE)
+    _alt_pattern = re.compile(r'<img[^>]*\salt="([^"]*)"', re.IGNORECASE)
+    _caption_pattern = re.compile(r'<figcaption>([\s\S]*?)</figcaption>', re.IGNORECASE)
+    _max_lines = 20
+
+    def __init__(self, lines):
+        content = ''.join(lines)
+        src = self._src_pattern.search(content)
+        alt = self._alt_pattern.search(content)
+        caption = self._caption_pattern.search(content)
+
+        self.src = src.group(1) if src else ""
+        self.filename = self.src.rsplit('/', 1)[-1]
+        self.alt_text = alt.group(1).strip() if alt else ""
+        self.caption = caption.group(1).strip() if caption else ""
+        self.children = []
+
+    @classmethod
+    def start(cls, line: str) -> bool:
+        stripped = line.lstrip()
+        return len(line) - len(stripped) < 4 and stripped[:7].lower() == '<figure'
+
+    @classmethod
+    def check_interrupts_paragraph(cls, lines) -> bool:
+        return cls.start(lines.peek())
+
+    @classmethod
+    def read(cls, lines) -> Optional[List[str]]:
+        # 读到 </figure> 为止（可能与 <figure> 在同一行）；
+        # 遇到空行或超过 _max_lines 行仍未闭合时放弃，回退位置交给 HtmlBlock / 段落处理，
+        # 避免缺少 </figure> 时吞掉后面的全部内容
+        start = lines.get_pos()
+        line_buffer = []
+        for line in lines:
+            if line_buffer and not line.strip():
+                break
+            line_buffer.append(line)
+            if '</figure>' in line.lower():
+                return line_buffer
+            if len(line_buffer) >= cls._max_lines:
+                break
+        lines.set_pos(start)
+        return None
+
 
 class NotionRenderer(BaseRenderer):
     """
@@ -19,9 +76,15 @@ class NotionRenderer(BaseRenderer):
     将 Markdown AST 转换为 Notion API blocks
     """
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, image_upload_map: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            image_upload_map: {filename: file_upload_id}，用于渲染 <figure> 图片；
+                为 None 时忽略图片
+        """
+        super().__init__(FigureBlock)
         self.blocks = []
+        self.image_upload_map = image_upload_map
 
     def render(self, token) -> List[Dict[str, Any]]:
         """渲染入口"""
@@ -49,6 +112,8 @@ class NotionRenderer(BaseRenderer):
             self.render_thematic_break(token)
         elif isinstance(token, block_token.Table):
             self.render_table(token)
+        elif isinstance(token, FigureBlock):
+            self.render_figure_block(token)
         # 其他类型忽略或记录警告
         return None
 
@@ -156,6 +221,13 @@ class NotionRenderer(BaseRenderer):
                 self.render_list(child)
                 nested_blocks.extend(self.blocks)
                 self.blocks = old_blocks
+            elif isinstance(child, FigureBlock):
+                # 列表项中的图片 - 作为子 block
+                old_blocks = self.blocks
+                self.blocks = []
+                self.render_figure_block(child)
+                nested_blocks.extend(self.blocks)
+                self.blocks = old_blocks
             elif isinstance(child, block_token.Paragraph):
                 # 段落内容
                 main_content.extend(self._render_inline_tokens(child.children))
@@ -226,6 +298,24 @@ class NotionRenderer(BaseRenderer):
             }
         })
 
+    def render_figure_block(self, token: FigureBlock) -> None:
+        """渲染 <figure> 图片（只插入已上传的图片，Notion 不支持本地路径）"""
+        if self.image_upload_map is None:
+            return
+
+        file_upload_id = self.image_upload_map.get(token.filename)
+        if not file_upload_id:
+            logger.warning(f"⚠️  图片未上传，已跳过: {token.filename}")
+            return
+
+        from .notion_image_uploader import NotionImageUploader
+
+        self.blocks.append(NotionImageUploader.create_image_block(
+            file_upload_id=file_upload_id,
+            caption=token.caption,
+            alt_text=token.alt_text
+        ))
+
     # ============= Inline tokens (span) =============
 
     def _render_inline_tokens(self, tokens) -> List[Dict[str, Any]]:
@@ -377,12 +467,35 @@ class NotionRenderer(BaseRenderer):
         return lang_map.get(lang_lower, lang_lower)
 
 
-def markdown_to_notion_blocks(markdown_text: str) -> List[Dict[str, Any]]:
+def render_markdown_blocks(
+    markdown_text: str,
+    image_upload_map: Optional[Dict[str, str]] = None
+) -> List[Dict[str, Any]]:
+    """
+    一次解析将 Markdown（含 <figure> 图片）转换为全部 Notion blocks（不截断）
+
+    Args:
+        markdown_text: Markdown 文本
+        image_upload_map: {filename: file_upload_id}，为 None 时忽略图片
+
+    Returns:
+        Notion API blocks 列表
+    """
+    with NotionRenderer(image_upload_map) as renderer:
+        doc = Document(markdown_text)
+        return renderer.render(doc)
+
+
+def markdown_to_notion_blocks(
+    markdown_text: str,
+    image_upload_map: Optional[Dict[str, str]] = None
+) -> List[Dict[str, Any]]:
     """
     将 Markdown 文本转换为 Notion API blocks
 
     Args:
         markdown_text: Markdown 文本
+        image_upload_map: {filename: file_upload_id}，为 None 时忽略 <figure> 图片
 
     Returns:
         Notion API blocks 列表
@@ -392,9 +505,7 @@ def markdown_to_notion_blocks(markdown_text: str) -> List[Dict[str, Any]]:
         >>> print(len(blocks))
         2
     """
-    with NotionRenderer() as renderer:
-        doc = Document(markdown_text)
-        blocks = renderer.render(doc)
+    blocks = render_markdown_blocks(markdown_text, image_upload_map)
 
     # Notion API 限制：单次创建页面最多 100 个 children blocks
     return blocks[:100]
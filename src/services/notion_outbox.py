@@ -0,0 +1,593 @@
+"""
+Notion 写入 Outbox - 基于 SQLite 的持久化队列 + 后台批量刷写
+
+功能：
+1. 将待写入 Notion 的页面（properties、blocks、图片列表）持久化到 SQLite
+2. 后台 worker 按批次刷写到 Notion，失败时指数退避重试
+3. 使用幂等键（idempotency key）避免同一篇整理被重复入队
+4. 领取记录带租约（NOTION_OUTBOX_LEASE_SECONDS）：只有租约过期的 processing 记录
+   （进程崩溃遗留）才会被重新领取，不会抢走其他进程正在处理的记录
+5. 建页后先记下 page_id 再标记完成；崩溃后重新领取时复用已记下的页面，
+   或先在数据库中查找已有页面，避免重复建页。直接写入失败转入的记录带
+   maybe_created 标记（pages.create 超时 / 断连时页面可能已经建好），同样先查找
+6. 页面建成后才登记论文目录（入队时不登记，失败的记录不会被当作“已处理”）
+
+当 Notion 缓慢或不可用时，LLM 生成的内容不会丢失，
+整理流程可以在内容生成后立即返回，Notion 延迟不再出现在用户可见路径上。
+
+图片处理：
+入队时图片 block 中的 file_upload id 使用占位符 `pending:{filename}`，
+真正上传在 worker 刷写时进行（Notion 的 file upload 有有效期，不能提前上传）。
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import aiosqlite
+
+from ..utils.logger import get_logger
+from ..utils.metrics import RETRIES, STAGE_SECONDS
+
+logger = get_logger(__name__)
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+DEFAULT_OUTBOX_DB = PROJECT_ROOT / "data" / "notion_outbox.db"
+
+# 图片 block 占位符前缀（worker 上传后替换为真实 file_upload id）
+PENDING_IMAGE_PREFIX = "pending:"
+
+# Notion API 限制：单次创建页面最多 100 个 children blocks
+MAX_CHILDREN_PER_REQUEST = 100
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS notion_outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    paper_title TEXT NOT NULL,
+    parent TEXT NOT NULL,
+    properties TEXT NOT NULL,
+    blocks TEXT NOT NULL,
+    images TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    page_id TEXT,
+    page_url TEXT,
+    catalog TEXT,
+    maybe_created INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_notion_outbox_due
+    ON notion_outbox (status, next_attempt_at);
+"""
+
+# 旧版本创建的表缺少的列
+_MIGRATIONS = {
+    "catalog": "ALTER TABLE notion_outbox ADD COLUMN catalog TEXT",
+    "maybe_created": "ALTER TABLE notion_outbox ADD COLUMN maybe_created INTEGER NOT NULL DEFAULT 0",
+}
+
+
+def make_idempotency_key(parent: Dict, properties: Dict, blocks: List[Dict]) -> str:
+    """根据目标数据库、属性和内容生成幂等键"""
+    payload = json.dumps(
+        {"parent": parent, "properties": properties, "blocks": blocks},
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def pending_image_map(filenames: List[str]) -> Dict[str, str]:
+    """为图片文件名生成占位符 upload map（用于入队前构建 blocks）"""
+    return {filename: f"{PENDING_IMAGE_PREFIX}{filename}" for filename in filenames}
+
+
+def pending_image_filenames(blocks: List[Dict]) -> List[str]:
+    """收集 blocks（含嵌套 children）中仍为占位符的图片文件名"""
+    filenames = []
+
+    for block in blocks:
+        block_type = block.get("type")
+        if block_type == "image":
+            upload_id = block.get("image", {}).get("file_upload", {}).get("id", "")
+            if upload_id.startswith(PENDING_IMAGE_PREFIX):
+                filenames.append(upload_id[len(PENDING_IMAGE_PREFIX):])
+        children = block.get(block_type, {}).get("children") if block_type else None
+        if children:
+            filenames.extend(pending_image_filenames(children))
+
+    return filenames
+
+
+def resolve_pending_images(blocks: List[Dict], upload_map: Dict[str, str]) -> List[Dict]:
+    """
+    将 blocks 中的图片占位符替换为真实的 file_upload id
+
+    不在 upload_map 中的图片 block 会被移除（outbox 会先重试上传失败的图片）。
+
+    Args:
+        blocks: 含占位符的 Notion blocks
+        upload_map: {filename: file_upload_id}
+
+    Returns:
+        可直接提交给 Notion 的 blocks
+    """
+    resolved = []
+
+    for block in blocks:
+        if block.get("type") == "image":
+            file_upload = block.get("image", {}).get("file_upload", {})
+            upload_id = file_upload.get("id", "")
+            if upload_id.startswith(PENDING_IMAGE_PREFIX):
+                filename = upload_id[len(PENDING_IMAGE_PREFIX):]
+                real_id = upload_map.get(filename)
+                if not real_id:
+                    logger.warning("⚠️ 图片未上传，已跳过", filename=filename)
+                    continue
+                block = json.loads(json.dumps(block))
+                block["image"]["file_upload"]["id"] = real_id
+
+        block_type = block.get("type")
+        children = block.get(block_type, {}).get("children") if block_type else None
+        if children:
+            block = dict(block)
+            block[block_type] = dict(block[block_type])
+            block[block_type]["children"] = resolve_pending_images(children, upload_map)
+
+        resolved.append(block)
+
+    return resolved
+
+
+class NotionOutbox:
+    """SQLite 持久化的 Notion 写入队列"""
+
+    def __init__(self, db_path: Optional[str] = None):
+        """
+        Args:
+            db_path: SQLite 文件路径（默认读取 NOTION_OUTBOX_DB）
+        """
+        self.db_path = Path(db_path or os.getenv("NOTION_OUTBOX_DB", str(DEFAULT_OUTBOX_DB)))
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._initialized = False
+        self._wakeup = asyncio.Event()
+
+    async def _connect(self) -> aiosqlite.Connection:
+        db = await aiosqlite.connect(str(self.db_path))
+        db.row_factory = aiosqlite.Row
+        if not self._initialized:
+            await db.executescript(_SCHEMA)
+            async with db.execute("PRAGMA table_info(notion_outbox)") as cur:
+                columns = {row["name"] for row in await cur.fetchall()}
+            for column, statement in _MIGRATIONS.items():
+                if column not in columns:
+                    await db.execute(statement)
+            await db.commit()
+            self._initialized = True
+        return db
+
+    async def enqueue(
+        self,
+        paper_title: str,
+        parent: Dict,
+        properties: Dict,
+        blocks: List[Dict],
+        images: List[Dict],
+        catalog: Optional[Dict] = None,
+        maybe_created: bool = False,
+    ) -> Dict:
+        """
+        入队一个待创建的 Notion 页面
+
+        Args:
+            paper_title: 论文标题（仅用于日志/排查）
+            parent: Notion parent，例如 {"database_id": "..."}
+            properties: 页面属性
+            blocks: 页面内容 blocks（图片可使用占位符）
+            images: 待上传图片列表 [{"filename": ..., "path": ...}]
+            catalog: 建页后登记论文目录所需的信息 {"keys": [[key_type, key_value], ...], "digest_file": ...}
+            maybe_created: 页面可能已经建好（直接写入时 pages.create 失败），刷写前先查找已有页面
+
+        Returns:
+            {"id", "idempotency_key", "status", "page_url", "duplicate"}
+        """
+        key = make_idempotency_key(parent, properties, blocks)
+        now = time.time()
+
+        db = await self._connect()
+        try:
+            cursor = await db.execute(
+                """
+                INSERT OR IGNORE INTO notion_outbox
+                    (idempotency_key, paper_title, parent, properties, blocks, images, catalog,
+                     maybe_created, status, attempts, next_attempt_at, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'pending', 0, ?, ?, ?)
+                """,
+                (
+                    key,
+                    paper_title,
+                    json.dumps(parent, ensure_ascii=False),
+                    json.dumps(properties, ensure_ascii=False),
+                    json.dumps(blocks, ensure_ascii=False),
+                    json.dumps(images, ensure_ascii=False),
+                    json.dumps(catalog, ensure_ascii=False) if catalog else None,
+                    int(maybe_created),
+                    now, now, now,
+                ),
+            )
+            duplicate = cursor.rowcount == 0
+            if duplicate and maybe_created:
+                await db.execute(
+                    "UPDATE notion_outbox SET maybe_created = 1 WHERE idempotency_key = ?",
+                    (key,),
+                )
+            await db.commit()
+
+            async with db.execute(
+                "SELECT id, status, page_url FROM notion_outbox WHERE idempotency_key = ?",
+                (key,),
+            ) as cur:
+                row = await cur.fetchone()
+        finally:
+            await db.close()
+
+        self._wakeup.set()
+
+        logger.info(
+            "📮 Notion 写入已入队" if not duplicate else "📮 Notion 写入已存在（幂等键命中）",
+            outbox_id=row["id"],
+            paper_title=paper_title[:100],
+            status=row["status"],
+        )
+
+        return {
+            "id": row["id"],
+            "idempotency_key": key,
+            "status": row["status"],
+            "page_url": row["page_url"],
+            "duplicate": duplicate,
+        }
+
+    async def claim_batch(self, limit: int, lease_seconds: float = 600.0) -> List[Dict]:
+        """
+        领取一批到期的待刷写记录（标记为 processing，租约为 lease_seconds）
+
+        租约过期仍停留在 processing 的记录（持有它的进程已崩溃）会被重新领取，
+        这类记录带 recovered=True：上次可能已经建好页面。
+        """
+        now = time.time()
+        db = await self._connect()
+        try:
+            await db.execute("BEGIN IMMEDIATE")
+            async with db.execute(
+                """
+                SELECT * FROM notion_outbox
+                WHERE (status = 'pending' AND next_attempt_at <= ?)
+                   OR (status = 'processing' AND updated_at < ?)
+                ORDER BY next_attempt_at
+                LIMIT ?
+                """,
+                (now, now - lease_seconds, limit),
+            ) as cur:
+                rows = [dict(row) for row in await cur.fetchall()]
+            for row in rows:
+                row["recovered"] = row["status"] == "processing"
+
+            if rows:
+                await db.executemany(
+                    "UPDATE notion_outbox SET status = 'processing', updated_at = ? WHERE id = ?",
+                    [(now, row["id"]) for row in rows],
+                )
+            await db.commit()
+        finally:
+            await db.close()
+
+        return rows
+
+    async def record_page(self, entry_id: int, page_id: str, page_url: str) -> None:
+        """页面建好后立即记下 page_id（仍为 processing），崩溃后重新领取时不再建页"""
+        db = await self._connect()
+        try:
+            await db.execute(
+                "UPDATE notion_outbox SET page_id = ?, page_url = ?, updated_at = ? WHERE id = ?",
+                (page_id, page_url, time.time(), entry_id),
+            )
+            await db.commit()
+        finally:
+            await db.close()
+
+    async def mark_done(self, entry_id: int, page_id: str, page_url: str) -> None:
+        db = await self._connect()
+        try:
+            await db.execute(
+                """
+                UPDATE notion_outbox
+                SET status = 'done', page_id = ?, page_url = ?, last_error = NULL, updated_at = ?
+                WHERE id = ?
+                """,
+                (page_id, page_url, time.time(), entry_id),
+            )
+            await db.commit()
+        finally:
+            await db.close()
+
+    async def mark_retry(
+        self,
+        entry_id: int,
+        attempts: int,
+        error: str,
+        max_attempts: int,
+        base_delay: float,
+        max_delay: float,
+    ) -> str:
+        """记录失败；未超过最大次数则按指数退避重新排期"""
+        status = "failed" if attempts >= max_attempts else "pending"
+        delay = min(max_delay, base_delay * (2 ** max(attempts - 1, 0)))
+        db = await self._connect()
+        try:
+            await db.execute(
+                """
+                UPDATE notion_outbox
+                SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ?, updated_at = ?
+                WHERE id = ?
+                """,
+                (status, attempts, time.time() + delay, error[:2000], time.time(), entry_id),
+            )
+            await db.commit()
+        finally:
+            await db.close()
+        return status
+
+    async def get(self, entry_id: int) -> Optional[Dict]:
+        db = await self._connect()
+        try:
+            async with db.execute(
+                "SELECT id, paper_title, status, attempts, page_id, page_url, last_error "
+                "FROM notion_outbox WHERE id = ?",
+                (entry_id,),
+            ) as cur:
+                row = await cur.fetchone()
+        finally:
+            await db.close()
+        return dict(row) if row else None
+
+    async def wait_for_work(self, timeout: float) -> None:
+        """等待新记录入队或超时"""
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+
+class NotionOutboxWorker:
+    """后台刷写 worker：批量领取 outbox 记录并写入 Notion"""
+
+    def __init__(
+        self,
+        outbox: NotionOutbox,
+        batch_size: int = 5,
+        poll_interval: float = 5.0,
+        max_attempts: int = 8,
+        base_delay: float = 10.0,
+        max_delay: float = 1800.0,
+        lease_seconds: float = 600.0,
+    ):
+        self.outbox = outbox
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lease_seconds = lease_seconds
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def start(self) -> None:
+        """在当前事件循环中启动后台刷写任务"""
+        if self._task is None or self._task.done():
+            self._stopping = False
+            self._task = asyncio.create_task(self._run(), name="notion-outbox-worker")
+            logger.info("✅ Notion outbox worker 已启动", db_path=str(self.outbox.db_path))
+
+    async def stop(self) -> None:
+        """停止后台任务（正在刷写的批次会被取消，下次启动时重新领取）"""
+        self._stopping = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info("Notion outbox worker 已停止")
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                flushed = await self.flush_once()
+            except Exception as e:
+                logger.error("❌ Notion outbox 刷写异常", error=str(e))
+                flushed = 0
+
+            if flushed < self.batch_size:
+                await self.outbox.wait_for_work(self.poll_interval)
+
+    async def flush_once(self) -> int:
+        """领取并刷写一批记录，返回处理的记录数"""
+        entries = await self.outbox.claim_batch(self.batch_size, self.lease_seconds)
+        if not entries:
+            return 0
+
+        logger.info("📤 开始刷写 Notion outbox", batch_size=len(entries))
+        await asyncio.gather(*(self._flush_entry(entry) for entry in entries))
+        return len(entries)
+
+    async def _flush_entry(self, entry: Dict) -> None:
+        start_time = time.time()
+        attempts = entry["attempts"] + 1
+
+        try:
+            page_id = entry["page_id"]
+            if not page_id and (entry["recovered"] or entry["attempts"] or entry["maybe_created"]):
+                # 之前可能在 pages.create 成功后、记下 page_id 前中断（崩溃 / 响应丢失）
+                page_id = await _find_created_page(entry)
+            if page_id:
+                logger.info("🔁 Notion outbox 记录的页面已存在，不再重复建页", outbox_id=entry["id"], page_id=page_id)
+            else:
+                page_id = await self._create_page(entry, attempts)
+
+            page_url = f"https://notion.so/{page_id.replace('-', '')}"
+            await self.outbox.record_page(entry["id"], page_id, page_url)
+            _record_catalog_page(entry, page_id, page_url)
+            await self.outbox.mark_done(entry["id"], page_id, page_url)
+
+            logger.info(
+                "✅ Notion outbox 记录已写入",
+                outbox_id=entry["id"],
+                paper_title=entry["paper_title"][:100],
+                page_url=page_url,
+                attempts=attempts,
+                elapsed_time=f"{time.time() - start_time:.2f}s",
+            )
+
+        except Exception as e:
+            RETRIES.inc(operation="notion_outbox")
+            status = await self.outbox.mark_retry(
+                entry["id"],
+                attempts,
+                str(e),
+                self.max_attempts,
+                self.base_delay,
+                self.max_delay,
+            )
+            logger.warning(
+                "⚠️ Notion outbox 记录写入失败",
+                outbox_id=entry["id"],
+                attempts=attempts,
+                status=status,
+                error=str(e),
+            )
+
+    async def _create_page(self, entry: Dict, attempts: int) -> str:
+        """上传图片并创建页面，返回 page_id"""
+        from .notion_gateway import get_notion_gateway
+        from .notion_image_uploader import NotionImageUploader
+
+        gateway = get_notion_gateway()
+        blocks = json.loads(entry["blocks"])
+        images = json.loads(entry["images"])
+
+        upload_map = {}
+        existing = [img["path"] for img in images if Path(img["path"]).exists()]
+        if len(existing) < len(images):
+            logger.warning("⚠️ 图片文件不存在，已跳过", outbox_id=entry["id"], missing=len(images) - len(existing))
+        if existing:
+            uploader = NotionImageUploader(gateway.notion_token, client=gateway.http)
+            upload_map, failed = await uploader.upload_images_batch(existing)
+            # 上传失败的图片随整条记录重试；最后一次尝试时不带这些图片建页，避免整篇丢失
+            if failed and attempts < self.max_attempts:
+                raise RuntimeError(f"{len(failed)} 张图片上传失败，稍后重试")
+
+        blocks = resolve_pending_images(blocks, upload_map)[:MAX_CHILDREN_PER_REQUEST]
+
+        with STAGE_SECONDS.time(stage="notion_page_create"):
+            response = await gateway.client.pages.create(
+                parent=json.loads(entry["parent"]),
+                properties=json.loads(entry["properties"]),
+                children=blocks,
+            )
+        return response["id"]
+
+
+async def _find_created_page(entry: Dict) -> Optional[str]:
+    """在目标数据库中查找该记录此前可能已创建的页面（按 arXiv ID / 标题）"""
+    from .notion_gateway import get_notion_gateway
+    from .notion_page_sync import find_existing_page
+
+    database_id = json.loads(entry["parent"]).get("database_id")
+    if not database_id:
+        return None
+
+    properties = json.loads(entry["properties"])
+
+    def plain_text(prop: str, kind: str) -> str:
+        return "".join(
+            item.get("text", {}).get("content", "")
+            for item in (properties.get(prop) or {}).get(kind, [])
+        )
+
+    page = await find_existing_page(
+        get_notion_gateway().client,
+        database_id,
+        arxiv_id=plain_text("ArXiv ID", "rich_text"),
+        title=plain_text("Name", "title") or entry["paper_title"],
+    )
+    return page["id"] if page else None
+
+
+def _record_catalog_page(entry: Dict, page_id: str, page_url: str) -> None:
+    """页面建好后登记论文目录（入队时记录的查重标识；旧记录没有时按标题登记）"""
+    from .paper_catalog import get_paper_catalog, paper_keys
+
+    catalog = json.loads(entry.get("catalog") or "null") or {}
+    keys = [tuple(key) for key in catalog.get("keys") or []] or paper_keys(title=entry["paper_title"])
+
+    try:
+        get_paper_catalog().record(
+            keys,
+            title=entry["paper_title"],
+            notion_page_id=page_id,
+            notion_url=page_url,
+            digest_file=catalog.get("digest_file") or "",
+        )
+    except Exception as e:
+        logger.warning("⚠️ 登记论文目录失败", paper_title=entry["paper_title"][:100], error=str(e))
+
+
+# 全局实例
+_outbox: Optional[NotionOutbox] = None
+_worker: Optional[NotionOutboxWorker] = None
+
+
+def get_notion_outbox() -> NotionOutbox:
+    """获取进程级 outbox 实例"""
+    global _outbox
+
+    if _outbox is None:
+        _outbox = NotionOutbox()
+
+    return _outbox
+
+
+def start_notion_outbox_worker() -> NotionOutboxWorker:
+    """启动后台刷写 worker（需在事件循环中调用）"""
+    global _worker
+
+    if _worker is None:
+        _worker = NotionOutboxWorker(
+            get_notion_outbox(),
+            batch_size=int(os.getenv("NOTION_OUTBOX_BATCH_SIZE", "5")),
+            poll_interval=float(os.getenv("NOTION_OUTBOX_POLL_INTERVAL", "5")),
+            max_attempts=int(os.getenv("NOTION_OUTBOX_MAX_ATTEMPTS", "8")),
+            lease_seconds=float(os.getenv("NOTION_OUTBOX_LEASE_SECONDS", "600")),
+        )
+    _worker.start()
+    return _worker
+
+
+async def stop_notion_outbox_worker() -> None:
+    """停止后台刷写 worker"""
+    global _worker
+
+    if _worker is not None:
+        await _worker.stop()
+        _worker = None
@@ -0,0 +1,398 @@
+"""
+Notion 页面增量更新 - 对比已有页面的 block 树，只提交最小变更
+
+功能：
+1. 按 arXiv ID / DOI / 标题在数据库中查找已存在的论文页面
+2. 拉取已有页面的 block 树（含嵌套 children）
+3. 与新生成的 markdown_to_notion_blocks 结果做序列 diff
+4. 只发出必要的 update / delete / append 调用
+
+重新整理同一篇论文时，不再新建页面、重新上传全部图片，
+大型整理的 API 调用从数百次降到个位数。
+"""
+
+import difflib
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from ..utils.logger import get_logger
+from ..utils.metrics import CACHE_HITS
+from .paper_catalog import is_placeholder_title
+
+logger = get_logger(__name__)
+
+# Notion API 限制：单次 append 最多 100 个 children
+MAX_APPEND_CHILDREN = 100
+
+# 支持原地 update 的文本类 block
+_TEXT_BLOCK_TYPES = {
+    "paragraph",
+    "heading_1",
+    "heading_2",
+    "heading_3",
+    "bulleted_list_item",
+    "numbered_list_item",
+    "quote",
+    "code",
+    "callout",
+    "toggle",
+    "to_do",
+}
+
+# 需要拉取嵌套 children 才能比较内容的 block（表格的内容都在 table_row 中）
+_NESTED_BLOCK_TYPES = _TEXT_BLOCK_TYPES | {"table"}
+
+# 数据库 schema 缓存：database_id -> (data_source_id, {property_name: property_type})
+_schema_cache: Dict[str, Tuple[Optional[str], Dict[str, str]]] = {}
+
+
+# ============= 查找已有页面 =============
+
+async def _get_database_schema(client, database_id: str) -> Tuple[Optional[str], Dict[str, str]]:
+    """
+    获取数据库的属性类型（带缓存）
+
+    兼容两种 API 版本：
+    - 新版（2025-09-03+）：属性在 data source 上，需要先取 data_source_id
+    - 旧版：属性直接在 database 上
+    """
+    if database_id in _schema_cache:
+        CACHE_HITS.inc(cache="notion_schema")
+        return _schema_cache[database_id]
+
+    database = await client.databases.retrieve(database_id=database_id)
+    data_source_id = None
+    properties = database.get("properties")
+
+    if properties is None and database.get("data_sources"):
+        data_source_id = database["data_sources"][0]["id"]
+        data_source = await client.data_sources.retrieve(data_source_id=data_source_id)
+        properties = data_source.get("properties", {})
+
+    schema = {name: prop.get("type") for name, prop in (properties or {}).items()}
+    _schema_cache[database_id] = (data_source_id, schema)
+    return data_source_id, schema
+
+
+async def _query_database(client, database_id: str, query_filter: Dict) -> List[Dict]:
+    """按过滤条件查询数据库页面"""
+    data_source_id, _ = await _get_database_schema(client, database_id)
+
+    if data_source_id:
+        response = await client.data_sources.query(
+            data_source_id=data_source_id,
+            filter=query_filter,
+            page_size=5,
+        )
+    else:
+        # notion-client 3.x 已移除 databases.query，旧版 API 直接请求端点
+        response = await client.request(
+            path=f"databases/{database_id}/query",
+            method="POST",
+            body={"filter": query_filter, "page_size": 5},
+        )
+
+    return response.get("results", [])
+
+
+def _build_lookup_filters(
+    schema: Dict[str, str],
+    arxiv_id: str = "",
+    doi: str = "",
+    title: str = "",
+) -> List[Tuple[str, Dict]]:
+    """根据数据库中实际存在的属性构建查找条件（按优先级排序）"""
+    filters = []
+
+    for prop_name, value in (("ArXiv ID", arxiv_id), ("DOI", doi)):
+        prop_type = schema.get(prop_name)
+        if value and prop_type in ("rich_text", "url"):
+            filters.append((prop_name, {"property": prop_name, prop_type: {"equals": value.strip()}}))
+
+    if not is_placeholder_title(title):
+        title_prop = next((name for name, t in schema.items() if t == "title"), "Name")
+        filters.append((title_prop, {"property": title_prop, "title": {"equals": title.strip()[:2000]}}))
+
+    return filters
+
+
+async def find_existing_page(
+    client,
+    database_id: str,
+    arxiv_id: str = "",
+    doi: str = "",
+    title: str = "",
+) -> Optional[Dict]:
+    """
+    在数据库中查找同一篇论文的已有页面
+
+    查找顺序：arXiv ID → DOI → 标题（精确匹配）
+
+    Returns:
+        Notion page 对象，未找到返回 None
+    """
+    _, schema = await _get_database_schema(client, database_id)
+
+    for prop_name, query_filter in _build_lookup_filters(schema, arxiv_id, doi, title):
+        results = [page for page in await _query_database(client, database_id, query_filter)
+                   if not page.get("archived") and not page.get("in_trash")]
+        if results:
+            logger.info("🔁 找到已有 Notion 页面", matched_by=prop_name, page_id=results[0]["id"])
+            return results[0]
+
+    return None
+
+
+# ============= 拉取 block 树 =============
+
+async def fetch_block_tree(client, block_id: str) -> List[Dict]:
+    """拉取 block 的全部 children（分页 + 递归展开嵌套 children）"""
+    blocks = []
+    cursor = None
+
+    while True:
+        kwargs = {"block_id": block_id, "page_size": 100}
+        if cursor:
+            kwargs["start_cursor"] = cursor
+        response = await client.blocks.children.list(**kwargs)
+        blocks.extend(response.get("results", []))
+        if not response.get("has_more"):
+            break
+        cursor = response.get("next_cursor")
+
+    for block in blocks:
+        if block.get("has_children") and block.get("type") in _NESTED_BLOCK_TYPES:
+            block[block["type"]]["children"] = await fetch_block_tree(client, block["id"])
+
+    return blocks
+
+
+# ============= 签名与 diff =============
+
+def _rich_text_signature(rich_text: List[Dict]) -> Tuple:
+    """规范化 rich_text（忽略 Notion 返回的 plain_text/href 等派生字段）"""
+    parts = []
+    for item in rich_text or []:
+        text = item.get("text") or {}
+        content = text.get("content", item.get("plain_text", ""))
+        link = (text.get("link") or {}).get("url") if text.get("link") else None
+        annotations = item.get("annotations") or {}
+        parts.append((
+            content,
+            bool(annotations.get("bold")),
+            bool(annotations.get("italic")),
+            bool(annotations.get("strikethrough")),
+            bool(annotations.get("code")),
+            link,
+        ))
+    return tuple(parts)
+
+
+def block_signature(block: Dict) -> Tuple:
+    """
+    计算 block 的内容签名，用于判断新旧 block 是否相同
+
+    图片以 caption 比较（新 block 的 file_upload id 与页面上的不同，不能参与比较）。
+    """
+    block_type = block.get("type")
+    payload = block.get(block_type, {}) or {}
+
+    if block_type == "image":
+        return ("image", _rich_text_signature(payload.get("caption", [])))
+
+    if block_type == "divider":
+        return ("divider",)
+
+    if block_type == "table_row":
+        return ("table_row", tuple(_rich_text_signature(cell) for cell in payload.get("cells", [])))
+
+    if block_type == "table":
+        return (
+            "table",
+            payload.get("table_width"),
+            bool(payload.get("has_column_header")),
+            bool(payload.get("has_row_header")),
+            tuple(block_signature(child) for child in payload.get("children") or []),
+        )
+
+    signature = [block_type, _rich_text_signature(payload.get("rich_text", []))]
+    if block_type == "code":
+        signature.append(payload.get("language"))
+    children = payload.get("children") or []
+    signature.append(tuple(block_signature(child) for child in children))
+    return tuple(signature)
+
+
+def _has_children(block: Dict) -> bool:
+    block_type = block.get("type")
+    return bool((block.get(block_type, {}) or {}).get("children"))
+
+
+def _can_update_in_place(old: Dict, new: Dict) -> bool:
+    """同类型文本 block 且双方都没有嵌套 children 时可原地更新"""
+    return (
+        old.get("type") == new.get("type")
+        and new.get("type") in _TEXT_BLOCK_TYPES
+        and not _has_children(old)
+        and not _has_children(new)
+    )
+
+
+def plan_block_diff(old_blocks: List[Dict], new_blocks: List[Dict]) -> List[Dict]:
+    """
+    计算从旧 block 列表到新 block 列表的最小操作序列
+
+    Returns:
+        操作列表，每个操作为以下之一：
+        - {"op": "update", "block_id": ..., "block": new_block}
+        - {"op": "delete", "block_id": ...}
+        - {"op": "append", "after": anchor_block_id 或 None, "blocks": [...]}
+          （after 为 None 表示插入到页面开头）
+    """
+    old_sigs = [block_signature(b) for b in old_blocks]
+    new_sigs = [block_signature(b) for b in new_blocks]
+    matcher = difflib.SequenceMatcher(None, old_sigs, new_sigs, autojunk=False)
+
+    ops: List[Dict] = []
+    anchor: Optional[str] = None  # 页面上最后一个保留下来的 block
+
+    def append(blocks: List[Dict]) -> None:
+        if not blocks:
+            return
+        if ops and ops[-1]["op"] == "append" and ops[-1]["after"] == anchor:
+            ops[-1]["blocks"].extend(blocks)
+        else:
+            ops.append({"op": "append", "after": anchor, "blocks": list(blocks)})
+
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            anchor = old_blocks[i2 - 1]["id"]
+            continue
+
+        old_slice = old_blocks[i1:i2]
+        new_slice = new_blocks[j1:j2]
+        pending_inserts: List[Dict] = []
+
+        # 逐一配对：同类型文本块原地更新，其余删除后重新插入
+        for k in range(max(len(old_slice), len(new_slice))):
+            old = old_slice[k] if k < len(old_slice) else None
+            new = new_slice[k] if k < len(new_slice) else None
+
+            if old is not None and new is not None and _can_update_in_place(old, new):
+                append(pending_inserts)
+                pending_inserts = []
+                ops.append({"op": "update", "block_id": old["id"], "block": new})
+                anchor = old["id"]
+                continue
+
+            if old is not None:
+                ops.append({"op": "delete", "block_id": old["id"]})
+            if new is not None:
+                pending_inserts.append(new)
+
+        append(pending_inserts)
+
+    return ops
+
+
+def _strip_for_update(block: Dict) -> Dict:
+    """生成 blocks.update 的请求体（不能包含 children）"""
+    block_type = block["type"]
+    payload = {k: v for k, v in block[block_type].items() if k != "children"}
+    return {block_type: payload}
+
+
+# ============= 执行 =============
+
+async def apply_block_diff(client, page_id: str, ops: List[Dict]) -> Dict[str, int]:
+    """
+    执行 diff 操作
+
+    Returns:
+        各类操作的 API 调用次数统计
+    """
+    stats = {"update": 0, "delete": 0, "append": 0}
+
+    for op in ops:
+        if op["op"] == "update":
+            await client.blocks.update(block_id=op["block_id"], **_strip_for_update(op["block"]))
+            stats["update"] += 1
+
+        elif op["op"] == "delete":
+            await client.blocks.delete(block_id=op["block_id"])
+            stats["delete"] += 1
+
+        elif op["op"] == "append":
+            blocks = op["blocks"]
+            after = op["after"]
+            for start in range(0, len(blocks), MAX_APPEND_CHILDREN):
+                chunk = blocks[start:start + MAX_APPEND_CHILDREN]
+                kwargs: Dict[str, Any] = {"block_id": page_id, "children": chunk}
+                if after:
+                    kwargs["after"] = after
+                else:
+                    kwargs["position"] = {"type": "start"}
+                response = await client.blocks.children.append(**kwargs)
+                stats["append"] += 1
+                # 后续分片接在本次插入的最后一个 block 之后
+                results = response.get("results", []) if isinstance(response, dict) else []
+                if results:
+                    after = results[-1]["id"]
+
+    return stats
+
+
+def blocks_to_write(ops: List[Dict]) -> List[Dict]:
+    """返回 diff 中需要写入（append/update）的 blocks"""
+    blocks = []
+    for op in ops:
+        if op["op"] == "append":
+            blocks.extend(op["blocks"])
+        elif op["op"] == "update":
+            blocks.append(op["block"])
+    return blocks
+
+
+async def sync_page_blocks(
+    client,
+    page_id: str,
+    new_blocks: List[Dict],
+    upload_images: Optional[Callable[[List[str]], Awaitable[Dict[str, str]]]] = None,
+) -> Dict[str, int]:
+    """
+    将页面内容增量同步为 new_blocks
+
+    Args:
+        client: notion_client.AsyncClient
+        page_id: 页面 ID
+        new_blocks: 新的 block 列表（图片使用 outbox 占位符 `pending:{filename}`）
+        upload_images: 异步回调 `(filenames) -> {filename: file_upload_id}`，
+            只会收到真正需要新插入的图片（页面上已有的图片不会重新上传）
+
+    Returns:
+        API 调用统计
+    """
+    from .notion_outbox import pending_image_filenames, resolve_pending_images
+
+    old_blocks = await fetch_block_tree(client, page_id)
+    ops = plan_block_diff(old_blocks, new_blocks)
+
+    filenames = pending_image_filenames(blocks_to_write(ops))
+    upload_map = await upload_images(filenames) if (filenames and upload_images) else {}
+
+    for op in ops:
+        if op["op"] == "append":
+            op["blocks"] = resolve_pending_images(op["blocks"], upload_map)
+    ops = [op for op in ops if op["op"] != "append" or op["blocks"]]
+
+    stats = await apply_block_diff(client, page_id, ops)
+
+    logger.info(
+        "✅ Notion 页面增量更新完成",
+        page_id=page_id,
+        old_blocks=len(old_blocks),
+        new_blocks=len(new_blocks),
+        uploaded_images=len(upload_map),
+        **stats,
+    )
+
+    return stats
@@ -0,0 +1,347 @@
+"""
+本地论文目录（Paper Catalog）- 处理记录与重复检测
+
+功能：
+1. 记录已处理的论文：帖子 ID、来源 URL、arXiv ID、DOI、PDF 哈希、规范化标题
+2. 将上述任意一个标识映射到 Notion 页面 ID / 链接和本地整理文件
+3. 在任何网络请求或 LLM 调用之前查询，已知论文毫秒级短路
+
+存储：SQLite（路径由 PROCESSING_RECORDS_DB 配置）
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+from ..utils.logger import get_logger
+from .xhs_links import extract_post_id
+
+logger = get_logger(__name__)
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+DEFAULT_CATALOG_DB = PROJECT_ROOT / "data" / "processing_records.db"
+
+# 标识类型
+KEY_XHS_POST = "xhs_post"
+KEY_SOURCE_URL = "source_url"
+KEY_ARXIV = "arxiv"
+KEY_DOI = "doi"
+KEY_PDF_SHA256 = "pdf_sha256"
+KEY_TITLE = "title"
+
+# 元数据提取失败时填入的占位标题：不代表任何一篇论文，不能作为查重标识
+PLACEHOLDER_TITLE = "Unknown Paper"
+_PLACEHOLDER_TITLES = {"unknown paper", "unknown", "untitled"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS papers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT,
+    notion_page_id TEXT,
+    notion_url TEXT,
+    digest_file TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS paper_keys (
+    key_type TEXT NOT NULL,
+    key_value TEXT NOT NULL,
+    paper_id INTEGER NOT NULL REFERENCES papers(id),
+    PRIMARY KEY (key_type, key_value)
+);
+"""
+
+_ARXIV_ID_PATTERN = re.compile(r"(\d{4}\.\d{4,5})(?:v\d+)?")
+
+# 不影响链接指向内容的跟踪 / 分享参数（规范化 URL 时去掉）
+_TRACKING_PARAMS = {"ref", "ref_src", "source", "from", "spm", "fbclid", "gclid", "mc_cid", "mc_eid", "si"}
+_TRACKING_PARAM_PREFIXES = ("utm_", "share", "xsec_")
+_XHS_HOSTS = ("xiaohongshu.com", "xhslink.com")
+
+
+# ============= 标识规范化 =============
+
+def normalize_title(title: str) -> str:
+    """规范化标题：NFKC、小写、去除标点与多余空白"""
+    if not title:
+        return ""
+    title = unicodedata.normalize("NFKC", title).lower()
+    title = re.sub(r"[^\w\s]", " ", title)
+    return " ".join(title.split())
+
+
+def is_placeholder_title(title: str) -> bool:
+    """标题为空或是占位标题（如 "Unknown Paper"）"""
+    normalized = normalize_title(title)
+    return not normalized or normalized in _PLACEHOLDER_TITLES
+
+
+def _is_tracking_param(name: str) -> bool:
+    name = name.lower()
+    return name in _TRACKING_PARAMS or name.startswith(_TRACKING_PARAM_PREFIXES)
+
+
+def normalize_url(url: str) -> str:
+    """
+    规范化 URL：小写 host、去掉 www、fragment、末尾斜杠与跟踪参数
+
+    其余查询参数按名称排序后保留：openreview.net/pdf?id=... 这类链接靠查询参数区分论文。
+    小红书链接的查询参数只有分享 / 鉴权信息，整个去掉（帖子由 xhs_post 标识区分）。
+    """
+    if not url:
+        return ""
+    parsed = urlparse(url.strip())
+    host = (parsed.netloc or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    path = parsed.path.rstrip("/")
+    if not host:
+        return url.strip()
+
+    query = ""
+    if not host.endswith(_XHS_HOSTS):
+        params = sorted(
+            (name, value)
+            for name, value in parse_qsl(parsed.query, keep_blank_values=True)
+            if not _is_tracking_param(name)
+        )
+        query = urlencode(params)
+    return f"{host}{path}?{query}" if query else f"{host}{path}"
+
+
+def normalize_doi(doi: str) -> str:
+    """规范化 DOI：小写并去除 doi.org 前缀"""
+    if not doi:
+        return ""
+    doi = doi.strip().lower()
+    doi = re.sub(r"^(https?://)?(dx\.)?doi\.org/", "", doi)
+    return doi.removeprefix("doi:").strip()
+
+
+def extract_arxiv_id(text: str) -> str:
+    """从 arXiv URL 或 ID 字符串中提取不带版本号的 arXiv ID"""
+    if not text:
+        return ""
+    match = _ARXIV_ID_PATTERN.search(text)
+    return match.group(1) if match else ""
+
+
+def extract_xhs_post_id(url: str) -> str:
+    """从小红书 URL 中提取规范帖子 ID（不同查询参数得到同一 ID；短链仅查已解析的缓存）"""
+    return extract_post_id(url)
+
+
+def source_keys_from_url(url: str) -> List[Tuple[str, str]]:
+    """从用户提供的链接推导所有可用于查重的标识"""
+    keys = []
+    if not url:
+        return keys
+
+    post_id = extract_xhs_post_id(url)
+    if post_id:
+        keys.append((KEY_XHS_POST, post_id))
+
+    if "arxiv.org" in url.lower():
+        arxiv_id = extract_arxiv_id(url)
+        if arxiv_id:
+            keys.append((KEY_ARXIV, arxiv_id))
+
+    if "doi.org/" in url.lower():
+        keys.append((KEY_DOI, normalize_doi(url)))
+
+    normalized = normalize_url(url)
+    if normalized:
+        keys.append((KEY_SOURCE_URL, normalized))
+
+    return keys
+
+
+def canonical_source_key(url: str) -> str:
+    """
+    将用户提供的链接规范化为单一来源标识（用于合并并发的重复请求）
+
+    优先级：小红书帖子 ID → arXiv ID → DOI → 规范化 URL
+    例如 arxiv.org/abs/2505.10831 与 arxiv.org/pdf/2505.10831v2.pdf 得到同一个 "arxiv:2505.10831"；
+    openreview.net/pdf?id=abc 与 ?id=xyz 是不同的论文，得到不同的标识（不会被合并为同一个任务）
+    """
+    keys = dict(source_keys_from_url(url))
+    for key_type in (KEY_XHS_POST, KEY_ARXIV, KEY_DOI, KEY_SOURCE_URL):
+        if keys.get(key_type):
+            return f"{key_type}:{keys[key_type]}"
+    return ""
+
+
+def paper_keys(
+    post_id: str = "",
+    urls: Iterable[str] = (),
+    arxiv_id: str = "",
+    doi: str = "",
+    pdf_sha256: str = "",
+    title: str = "",
+) -> List[Tuple[str, str]]:
+    """根据论文信息构建查重标识列表（自动规范化、去重）"""
+    keys: List[Tuple[str, str]] = []
+
+    if post_id:
+        keys.append((KEY_XHS_POST, post_id))
+    for url in urls:
+        keys.extend(source_keys_from_url(url))
+    if arxiv_id and extract_arxiv_id(arxiv_id):
+        keys.append((KEY_ARXIV, extract_arxiv_id(arxiv_id)))
+    if doi and normalize_doi(doi):
+        keys.append((KEY_DOI, normalize_doi(doi)))
+    if pdf_sha256:
+        keys.append((KEY_PDF_SHA256, pdf_sha256))
+    if not is_placeholder_title(title):
+        keys.append((KEY_TITLE, normalize_title(title)))
+
+    return list(dict.fromkeys(keys))
+
+
+def file_sha256(path: str) -> str:
+    """计算文件的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# ============= 目录存储 =============
+
+class PaperCatalog:
+    """SQLite 论文目录"""
+
+    def __init__(self, db_path: Optional[str] = None):
+        """
+        Args:
+            db_path: SQLite 文件路径（默认读取 PROCESSING_RECORDS_DB）
+        """
+        self.db_path = Path(db_path or os.getenv("PROCESSING_RECORDS_DB", str(DEFAULT_CATALOG_DB)))
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def lookup(self, keys: Iterable[Tuple[str, str]]) -> Optional[Dict]:
+        """
+        按标识查找已处理的论文
+
+        Returns:
+            {"paper_id", "title", "notion_page_id", "notion_url", "digest_file", "matched_by"}
+            未找到返回 None
+        """
+        with self._lock:
+            for key_type, key_value in keys:
+                if not key_value:
+                    continue
+                row = self._conn.execute(
+                    """
+                    SELECT p.* FROM paper_keys k JOIN papers p ON p.id = k.paper_id
+                    WHERE k.key_type = ? AND k.key_value = ?
+                    """,
+                    (key_type, key_value),
+                ).fetchone()
+                if row:
+                    return {
+                        "paper_id": row["id"],
+                        "title": row["title"],
+                        "notion_page_id": row["notion_page_id"],
+                        "notion_url": row["notion_url"],
+                        "digest_file": row["digest_file"],
+                        "matched_by": key_type,
+                    }
+        return None
+
+    def lookup_url(self, url: str) -> Optional[Dict]:
+        """按用户提供的链接查找"""
+        return self.lookup(source_keys_from_url(url))
+
+    def record(
+        self,
+        keys: Iterable[Tuple[str, str]],
+        title: str = "",
+        notion_page_id: str = "",
+        notion_url: str = "",
+        digest_file: str = "",
+    ) -> int:
+        """
+        记录（或更新）一篇已处理的论文，并登记全部标识
+
+        如果任一标识已存在，则更新对应的论文记录，其余标识合并到该记录。
+
+        Returns:
+            论文记录 ID
+        """
+        keys = [(t, v) for t, v in keys if v]
+        now = time.time()
+
+        with self._lock:
+            paper_id = None
+            for key_type, key_value in keys:
+                row = self._conn.execute(
+                    "SELECT paper_id FROM paper_keys WHERE key_type = ? AND key_value = ?",
+                    (key_type, key_value),
+                ).fetchone()
+                if row:
+                    paper_id = row["paper_id"]
+                    break
+
+            if paper_id is None:
+                cursor = self._conn.execute(
+                    """
+                    INSERT INTO papers (title, notion_page_id, notion_url, digest_file, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    """,
+                    (title, notion_page_id or None, notion_url or None, digest_file or None, now, now),
+                )
+                paper_id = cursor.lastrowid
+            else:
+                self._conn.execute(
+                    """
+                    UPDATE papers SET
+                        title = COALESCE(NULLIF(?, ''), title),
+                        notion_page_id = COALESCE(NULLIF(?, ''), notion_page_id),
+                        notion_url = COALESCE(NULLIF(?, ''), notion_url),
+                        digest_file = COALESCE(NULLIF(?, ''), digest_file),
+                        updated_at = ?
+                    WHERE id = ?
+                    """,
+                    (title, notion_page_id, notion_url, digest_file, now, paper_id),
+                )
+
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO paper_keys (key_type, key_value, paper_id) VALUES (?, ?, ?)",
+                [(key_type, key_value, paper_id) for key_type, key_value in keys],
+            )
+            self._conn.commit()
+
+        logger.info("📒 已登记论文处理记录", paper_id=paper_id, title=title[:100], keys_count=len(keys))
+        return paper_id
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# 全局实例
+_catalog: Optional[PaperCatalog] = None
+
+
+def get_paper_catalog() -> PaperCatalog:
+    """获取进程级论文目录（首次调用时打开数据库）"""
+    global _catalog
+
+    if _catalog is None:
+        _catalog = PaperCatalog()
+
+    return _catalog
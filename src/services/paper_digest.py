@@ -12,18 +12,24 @@ Digest Agent Core - 论文整理核心 Agent（作为 sub-agent）
 """
 
 import asyncio
+import functools
+import hashlib
+import inspect
 import os
 import sys
+from contextvars import ContextVar
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Annotated
+from typing import Annotated, Any, Callable, Dict, Optional
 import json
 import httpx
-import fitz  # PyMuPDF
 import time
 
-from agents import Agent, function_tool, Runner
+from agents import Agent, function_tool, Runner, RunContextWrapper
 from openai import AsyncOpenAI
 from ..utils.logger import get_logger
+from ..utils.metrics import CACHE_HITS, LLM_CALL_SECONDS, STAGE_SECONDS, count_rate_limited
+from ..utils.singleflight import Singleflight
 
 # 导入模型
 import sys
@@ -47,9 +53,174 @@ PDF_DIR = PROJECT_ROOT / "paper_digest" / "pdfs"  # 保持PDF在原位置
 OUTPUT_DIR.mkdir(exist_ok=True)
 PDF_DIR.mkdir(exist_ok=True)
 
-# 全局变量
+# 全局变量（进程内共享、只读）
 _openai_client = None
-_current_paper = {}
+
+
+@dataclass
+class DigestRunContext:
+    """
+    单次整理运行的上下文
+
+    每个请求（一次 Runner.run）一份，经 RunContextWrapper 传给所有工具
+    （handoff 后的 digest_agent 共享同一份），多篇论文并发处理时互不干扰。
+    """
+    paper: Dict[str, Any] = field(default_factory=dict)
+    job_id: Optional[str] = None
+    # 阶段事件回调 on_event(stage, status, info)，用于任务进度
+    on_event: Optional[Callable[[str, str, Dict[str, Any]], None]] = None
+
+    def emit(self, stage: str, status: str, **info) -> None:
+        """上报阶段事件（start / done / error），未设置回调时忽略"""
+        if self.on_event is None:
+            return
+        try:
+            self.on_event(stage, status, info)
+        except Exception as e:
+            logger.warning("⚠️ 阶段事件上报失败", stage=stage, status=status, error=str(e))
+
+
+# 未经 RunContextWrapper 传入时的兜底：当前 asyncio 任务绑定的上下文
+_run_context: ContextVar[Optional[DigestRunContext]] = ContextVar("digest_run_context", default=None)
+# 最后兜底：调用方既没传 context 也没绑定 contextvar 时使用（只能串行）
+_fallback_context = DigestRunContext()
+
+
+def new_digest_context() -> DigestRunContext:
+    """
+    创建新的运行上下文并绑定到当前 asyncio 任务
+
+    用法:
+        result = await Runner.run(agent, input, context=new_digest_context())
+    """
+    run_context = DigestRunContext()
+    _run_context.set(run_context)
+    return run_context
+
+
+def _get_run_context(ctx: Optional[RunContextWrapper] = None) -> DigestRunContext:
+    """获取当前运行的上下文：RunContextWrapper → contextvar → 进程级兜底"""
+    if ctx is not None and isinstance(ctx.context, DigestRunContext):
+        return ctx.context
+
+    run_context = _run_context.get()
+    if run_context is not None:
+        return run_context
+
+    logger.debug("未传入 DigestRunContext，使用进程级共享上下文")
+    return _fallback_context
+
+
+def _tracked_stage(stage: str):
+    """
+    工具阶段装饰器：调用前后向运行上下文上报 start / done / error 事件
+
+    放在 @function_tool 之下；工具返回的 JSON 中 success 为 false 时上报 error。
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(ctx, *args, **kwargs):
+            run_context = _get_run_context(ctx)
+            run_context.emit(stage, "start")
+            try:
+                result = await func(ctx, *args, **kwargs)
+            except Exception as e:
+                run_context.emit(stage, "error", error=str(e))
+                raise
+
+            try:
+                data = json.loads(result)
+            except (TypeError, ValueError):
+                data = {}
+            if data.get("success"):
+                run_context.emit(
+                    stage,
+                    "done",
+                    already_processed=bool(data.get("already_processed")),
+                    page_url=data.get("page_url"),
+                )
+            else:
+                run_context.emit(stage, "error", error=data.get("error"))
+            return result
+        return wrapper
+    return decorator
+
+
+# 工具级请求合并：多个会话同时处理同一篇论文时，每个阶段只执行一次
+_tool_flight = Singleflight()
+
+
+def _args_digest(arguments: Dict[str, Any]) -> str:
+    """工具参数的内容哈希（参数完全相同才合并）"""
+    payload = json.dumps(arguments, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _coalesced(stage: str, key_func: Callable[[Dict[str, Any]], str]):
+    """
+    工具合并装饰器：并发的相同请求只执行一次，所有调用方拿到同一个结果
+
+    key_func 从工具参数（含默认值）计算合并键（返回空字符串则不合并），
+    键必须覆盖所有影响结果的参数。
+    跟随者的论文状态替换为领头调用结束时的论文状态，
+    后续阶段（生成整理、保存）照常可用。
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(ctx, *args, **kwargs):
+            bound = signature.bind(ctx, *args, **kwargs)
+            bound.apply_defaults()
+            arguments = dict(bound.arguments)
+            arguments.pop("ctx", None)
+            key = key_func(arguments)
+            if not key:
+                return await func(ctx, *args, **kwargs)
+
+            run_context = _get_run_context(ctx)
+
+            async def call():
+                result = await func(ctx, *args, **kwargs)
+                return result, dict(run_context.paper)
+
+            (result, paper_state), shared = await _tool_flight.do(f"{stage}:{key}", call)
+            if shared:
+                CACHE_HITS.inc(cache="tool_coalesced")
+                run_context.paper.clear()
+                run_context.paper.update(paper_state)
+                logger.info("🔗 已合并到进行中的相同请求", stage=stage, key=key[:80])
+            return result
+        return wrapper
+    return decorator
+
+
+def _normalized_key(field_name: str, normalize: Callable[[str], str]) -> Callable[[Dict[str, Any]], str]:
+    """field_name 按规范化后的值比较、其余参数完全相同时才合并"""
+    def key_func(arguments: Dict[str, Any]) -> str:
+        value = normalize(arguments.get(field_name) or "")
+        if not value:
+            return ""
+        others = {name: arg for name, arg in arguments.items() if name != field_name}
+        return f"{value}:{_args_digest(others)}"
+    return key_func
+
+
+def _source_key(field_name: str) -> Callable[[Dict[str, Any]], str]:
+    """按链接参数的规范化来源标识合并"""
+    from .paper_catalog import canonical_source_key
+    return _normalized_key(field_name, canonical_source_key)
+
+
+def _title_key(field_name: str = "paper_title") -> Callable[[Dict[str, Any]], str]:
+    """按规范化标题合并"""
+    from .paper_catalog import normalize_title
+    return _normalized_key(field_name, normalize_title)
+
+
+def _path_key(field_name: str) -> Callable[[Dict[str, Any]], str]:
+    """按本地文件的绝对路径合并"""
+    return _normalized_key(field_name, lambda path: str(Path(path).resolve()))
 
 
 def _init_digest_globals(openai_client):
@@ -58,39 +229,134 @@ def _init_digest_globals(openai_client):
     _openai_client = openai_client
 
 
+def _check_paper_catalog(keys: list) -> Optional[dict]:
+    """查询本地论文目录，命中则返回已处理记录（查询失败不影响主流程）"""
+    from .paper_catalog import get_paper_catalog
+
+    try:
+        known = get_paper_catalog().lookup(keys)
+    except Exception as e:
+        logger.warning("⚠️ 查询论文目录失败", error=str(e))
+        return None
+
+    if known:
+        CACHE_HITS.inc(cache="paper_catalog")
+        logger.info(
+            "📒 论文目录命中，该论文已处理过",
+            title=(known.get("title") or "")[:100],
+            matched_by=known.get("matched_by"),
+            notion_url=known.get("notion_url")
+        )
+    return known
+
+
+def _known_paper_response(known: dict, start_time: float) -> str:
+    """已处理论文的短路返回"""
+    elapsed = time.time() - start_time
+    notion_url = known.get("notion_url")
+    if notion_url:
+        message = f"✅ 这篇论文此前已整理过，无需重复处理（耗时 {elapsed:.2f}s）\n\n查看链接: {notion_url}"
+    else:
+        message = f"✅ 这篇论文此前已整理过，Notion 同步排队中（耗时 {elapsed:.2f}s）\n\n本地文件: {known.get('digest_file')}"
+
+    return json.dumps({
+        "success": True,
+        "already_processed": True,
+        "title": known.get("title"),
+        "page_url": notion_url,
+        "digest_file": known.get("digest_file"),
+        "matched_by": known.get("matched_by"),
+        "message": message
+    }, ensure_ascii=False, indent=2)
+
+
+def _catalog_keys(paper: dict, paper_title: str, source_url: str = "", pdf_url: str = "",
+                  arxiv_id: str = "", doi: str = "") -> list:
+    """汇总当前论文的全部查重标识"""
+    from .paper_catalog import paper_keys
+
+    return paper_keys(
+        post_id=paper.get("post_id") or "",
+        urls=[source_url, pdf_url, paper.get("post_url"), paper.get("pdf_url")],
+        arxiv_id=arxiv_id or paper.get("arxiv_id") or "",
+        doi=doi or paper.get("doi") or "",
+        pdf_sha256=paper.get("pdf_sha256") or "",
+        title=paper_title,
+    )
+
+
+def _record_processed_paper(paper: dict, keys: list, paper_title: str,
+                            page_id: str = "", page_url: str = "") -> None:
+    """保存成功后登记到论文目录（登记失败只记录警告）"""
+    from .paper_catalog import get_paper_catalog
+
+    try:
+        get_paper_catalog().record(
+            keys,
+            title=paper_title,
+            notion_page_id=page_id or "",
+            notion_url=page_url or "",
+            digest_file=paper.get("digest_file") or "",
+        )
+    except Exception as e:
+        logger.warning("⚠️ 登记论文目录失败", paper_title=paper_title[:100], error=str(e))
+
+
 @function_tool
+@_tracked_stage("fetch")
+@_coalesced("fetch", _source_key("post_url"))
 async def fetch_xiaohongshu_post(
-    post_url: Annotated[str, "小红书帖子的完整URL"]
+    ctx: RunContextWrapper[DigestRunContext],
+    post_url: Annotated[str, "小红书帖子的完整URL"],
+    force_refresh: Annotated[bool, "忽略本地论文目录，强制重新处理（用户明确要求重新整理时使用）"] = False
 ) -> str:
     """
     获取小红书帖子内容
 
     参数:
         post_url: 小红书帖子URL
+        force_refresh: 是否忽略本地论文目录
 
     返回:
-        JSON格式的帖子信息（包含 raw_content）
+        JSON格式的帖子信息（包含 raw_content）；已处理过的帖子返回 already_processed
     """
-    global _current_paper
+    paper = _get_run_context(ctx).paper
     start_time = time.time()
 
     # 导入 xiaohongshu 服务
-    from .xiaohongshu import XiaohongshuClient
+    from .xhs_cookie_pool import get_cookie_pool
+    from .xhs_links import resolve_post_url
+    from .paper_catalog import source_keys_from_url
+
+    # 短链（xhslink.com）与不同查询参数先规范为同一帖子链接，目录查重才能命中
+    try:
+        post_url = await resolve_post_url(post_url)
+    except Exception as e:
+        logger.error("❌ 小红书短链解析失败", url=post_url, error=str(e))
+        return json.dumps({
+            "success": False,
+            "error": f"获取帖子失败: 短链解析失败: {str(e)}"
+        }, ensure_ascii=False, indent=2)
+
+    if not force_refresh:
+        known = _check_paper_catalog(source_keys_from_url(post_url))
+        if known:
+            return _known_paper_response(known, start_time)
 
     try:
         logger.info("🔍 开始获取小红书帖子")
-        client = XiaohongshuClient(
-            cookies=os.getenv("XHS_COOKIES"),
-            openai_client=_openai_client  # ✨ 传递 OpenAI client 用于 LLM 解析
-        )
-        post = await client.fetch_post(post_url)
+        # Cookie 池：按负载挑选账号（每个账号独立限流），认证失败的账号被隔离并换下一个重试
+        pool = get_cookie_pool(openai_client=_openai_client)  # ✨ 传递 OpenAI client 用于 LLM 解析
+        with STAGE_SECONDS.time(stage="xhs_fetch"):
+            post = await pool.fetch_post(post_url, use_cache=not force_refresh)
 
-        _current_paper = {
+        paper.clear()
+        paper.update({
             "post_id": post.post_id,
             "post_url": str(post.post_url),
             "blogger_name": post.blogger_name,
             "raw_content": post.raw_content,
-        }
+        })
 
         elapsed = time.time() - start_time
         logger.info(
@@ -121,7 +387,10 @@ async def fetch_xiaohongshu_post(
 
 
 @function_tool
+@_tracked_stage("extract")
+@_coalesced("extract", _args_digest)
 async def extract_paper_metadata(
+    ctx: RunContextWrapper[DigestRunContext],
     xiaohongshu_content: Annotated[str, "小红书帖子内容（可选）"] = "",
     pdf_content: Annotated[str, "PDF的文本内容"] = "",
     pdf_metadata: Annotated[str, "PDF的元数据（JSON格式）"] = ""
@@ -148,7 +417,7 @@ async def extract_paper_metadata(
         - project_page: 项目主页
         - other_resources: 其他资源
     """
-    global _openai_client, _current_paper
+    paper = _get_run_context(ctx).paper
     start_time = time.time()
 
     try:
@@ -195,11 +464,15 @@ async def extract_paper_metadata(
             model=get_tool_model(),
         )
 
-        result = await Runner.run(
-            starting_agent=metadata_extraction_agent,
-            input=prompt,
-            max_turns=1
-        )
+        from .job_queue import stage_slot
+
+        async with stage_slot("llm"):
+            with LLM_CALL_SECONDS.time(call="extract_metadata"):
+                result = await Runner.run(
+                    starting_agent=metadata_extraction_agent,
+                    input=prompt,
+                    max_turns=1
+                )
 
         # 提取Agent返回的文本内容
         response_text = result.final_output if hasattr(result, 'final_output') else str(result)
@@ -214,12 +487,13 @@ async def extract_paper_metadata(
 
         # 验证必填字段
         if not extracted_info.get("title"):
-            extracted_info["title"] = "Unknown Paper"
+            from .paper_catalog import PLACEHOLDER_TITLE
+            extracted_info["title"] = PLACEHOLDER_TITLE
 
-        _current_paper.update(extracted_info)
+        paper.update(extracted_info)
 
         # 如果 PDF 已下载但标题不一致，重新整理文件
-        old_pdf_path = _current_paper.get("pdf_path")
+        old_pdf_path = paper.get("pdf_path")
         correct_title = extracted_info.get("title")
 
         if old_pdf_path and correct_title and Path(old_pdf_path).exists():
@@ -249,8 +523,8 @@ async def extract_paper_metadata(
                     except:
                         pass  # 目录不为空，忽略
 
-                    # 更新全局变量中的路径
-                    _current_paper["pdf_path"] = str(expected_path)
+                    # 更新运行上下文中的路径
+                    paper["pdf_path"] = str(expected_path)
 
                     logger.info("✅ PDF 文件已重新整理到正确路径")
 
@@ -266,10 +540,18 @@ async def extract_paper_metadata(
             elapsed_time=f"{elapsed:.2f}s"
         )
 
+        message = f"✅ 论文信息提取成功（标题 + 元数据）！（耗时 {elapsed:.2f}s）"
+
+        # 生成整理之前按 DOI / arXiv ID / 标题再查一次目录
+        known = _check_paper_catalog(_catalog_keys(paper, correct_title))
+        if known:
+            message += f"\n\n⚠️ 这篇论文此前已整理过: {known.get('notion_url') or known.get('digest_file')}"
+
         return json.dumps({
             "success": True,
             **extracted_info,
-            "message": f"✅ 论文信息提取成功（标题 + 元数据）！（耗时 {elapsed:.2f}s）"
+            "already_processed": known,
+            "message": message
         }, ensure_ascii=False, indent=2)
 
     except Exception as e:
@@ -286,78 +568,86 @@ async def extract_paper_metadata(
 
 
 @function_tool
+@_tracked_stage("search")
+@_coalesced("search", _title_key())
 async def search_arxiv_pdf(
-    paper_title: Annotated[str, "论文标题"]
+    ctx: RunContextWrapper[DigestRunContext],
+    paper_title: Annotated[str, "论文标题"],
+    force_refresh: Annotated[bool, "忽略本地论文目录，强制重新处理（用户明确要求重新整理时使用）"] = False
 ) -> str:
     """
     在 arXiv 搜索论文 PDF 链接
 
     参数:
         paper_title: 论文标题
+        force_refresh: 是否忽略本地论文目录
 
     返回:
         JSON格式的PDF链接信息
     """
     start_time = time.time()
     try:
-        import urllib.parse
+        from .arxiv_client import get_arxiv_client, min_title_similarity, rank_by_title
 
         logger.info("🔎 开始在 arXiv 搜索论文", paper_title=paper_title[:100])
 
-        # arXiv API 搜索
-        query = urllib.parse.quote(paper_title)
-        api_url = f"http://export.arxiv.org/api/query?search_query=ti:{query}&max_results=3"
-
-        proxy = os.getenv('http_proxy')
-        mounts = None
-        if proxy:
-            mounts = {
-                "http://": httpx.AsyncHTTPTransport(proxy=proxy),
-                "https://": httpx.AsyncHTTPTransport(proxy=proxy),
-            }
+        # 共享 arXiv 客户端：礼貌调度（请求间隔 ≥3 秒）+ 磁盘缓存
+        with STAGE_SECONDS.time(stage="arxiv_search"):
+            entries = await get_arxiv_client().search_title(paper_title, max_results=5)
+
+        if entries:
+            # 按标题相似度挑选候选，避免下载并整理一篇错误的论文
+            ranked = rank_by_title(paper_title, entries)
+            similarity, entry = ranked[0]
+            threshold = min_title_similarity()
+            if similarity < threshold:
+                elapsed = time.time() - start_time
+                logger.warning(
+                    "⚠️ arXiv 候选标题不匹配，已拒绝",
+                    paper_title=paper_title[:100],
+                    best_title=entry.title[:100],
+                    similarity=similarity,
+                    threshold=threshold,
+                    elapsed_time=f"{elapsed:.2f}s"
+                )
+                return json.dumps({
+                    "success": False,
+                    "similarity": similarity,
+                    "best_candidate": {"arxiv_id": entry.arxiv_id, "title": entry.title},
+                    "error": (
+                        f"arXiv 检索结果与《{paper_title}》不匹配（最相近的是《{entry.title}》，"
+                        f"相似度 {similarity:.2f} < {threshold:.2f}），未采用，避免整理错误的论文。"
+                    )
+                }, ensure_ascii=False, indent=2)
+
+            arxiv_id = entry.arxiv_id
+            pdf_url = entry.pdf_url
+            found_title = entry.title
+
+            elapsed = time.time() - start_time
+            logger.info(
+                "✅ arXiv 搜索成功",
+                arxiv_id=arxiv_id,
+                found_title=found_title[:100],
+                similarity=similarity,
+                elapsed_time=f"{elapsed:.2f}s"
+            )
 
-        async with httpx.AsyncClient(timeout=30.0, mounts=mounts) as client:
-            response = await client.get(api_url)
-            response.raise_for_status()
+            from .paper_catalog import paper_keys
 
-            # 解析 XML 响应
-            import xml.etree.ElementTree as ET
-            root = ET.fromstring(response.content)
-
-            # 查找第一个匹配的论文
-            ns = {'atom': 'http://www.w3.org/2005/Atom'}
-            entries = root.findall('atom:entry', ns)
-
-            if entries:
-                entry = entries[0]
-                # 获取 arXiv ID
-                arxiv_id_elem = entry.find('atom:id', ns)
-                if arxiv_id_elem is not None:
-                    arxiv_id_full = arxiv_id_elem.text
-                    # 提取 ID 部分（例如：http://arxiv.org/abs/2410.04618 -> 2410.04618）
-                    arxiv_id = arxiv_id_full.split('/abs/')[-1]
-                    pdf_url = f"https://arxiv.org/pdf/{arxiv_id}.pdf"
-
-                    # 获取标题确认
-                    title_elem = entry.find('atom:title', ns)
-                    found_title = title_elem.text.strip() if title_elem is not None else "Unknown"
-
-                    elapsed = time.time() - start_time
-                    logger.info(
-                        "✅ arXiv 搜索成功",
-                        arxiv_id=arxiv_id,
-                        found_title=found_title[:100],
-                        elapsed_time=f"{elapsed:.2f}s"
-                    )
+            known = None if force_refresh else _check_paper_catalog(paper_keys(arxiv_id=arxiv_id))
+            if known:
+                return _known_paper_response(known, start_time)
 
-                    return json.dumps({
-                        "success": True,
-                        "pdf_url": pdf_url,
-                        "arxiv_id": arxiv_id,
-                        "arxiv_abs_url": f"https://arxiv.org/abs/{arxiv_id}",
-                        "found_title": found_title,
-                        "message": f"✅ 在 arXiv 找到论文！（耗时 {elapsed:.2f}s）\nPDF: {pdf_url}\narXiv ID: {arxiv_id}"
-                    }, ensure_ascii=False, indent=2)
+            return json.dumps({
+                "success": True,
+                "pdf_url": pdf_url,
+                "arxiv_id": arxiv_id,
+                "arxiv_abs_url": entry.abs_url,
+                "found_title": found_title,
+                "similarity": similarity,
+                "message": f"✅ 在 arXiv 找到论文！（耗时 {elapsed:.2f}s，标题相似度 {similarity:.2f}）\nPDF: {pdf_url}\narXiv ID: {arxiv_id}"
+            }, ensure_ascii=False, indent=2)
 
         # 未找到
         elapsed = time.time() - start_time
@@ -385,9 +675,13 @@ async def search_arxiv_pdf(
 
 
 @function_tool
+@_tracked_stage("download")
+@_coalesced("download", _source_key("pdf_url"))
 async def download_pdf_from_url(
+    ctx: RunContextWrapper[DigestRunContext],
     pdf_url: Annotated[str, "PDF文件的URL"],
-    paper_title: Annotated[str, "论文标题（用于命名文件）"] = "paper"
+    paper_title: Annotated[str, "论文标题（用于命名文件）"] = "paper",
+    force_refresh: Annotated[bool, "忽略本地论文目录，强制重新处理（用户明确要求重新整理时使用）"] = False
 ) -> str:
     """
     下载 PDF 并读取全部内容
@@ -395,13 +689,21 @@ async def download_pdf_from_url(
     参数:
         pdf_url: PDF 文件的 URL
         paper_title: 论文标题
+        force_refresh: 是否忽略本地论文目录
 
     返回:
-        包含 PDF 内容和元数据的 JSON
+        包含 PDF 内容和元数据的 JSON；已处理过的论文返回 already_processed
     """
-    global _current_paper
+    paper = _get_run_context(ctx).paper
     start_time = time.time()
 
+    from .paper_catalog import file_sha256, paper_keys, source_keys_from_url
+
+    if not force_refresh:
+        known = _check_paper_catalog(source_keys_from_url(pdf_url))
+        if known:
+            return _known_paper_response(known, start_time)
+
     try:
         logger.info("📥 开始下载 PDF", pdf_url=pdf_url[:100], paper_title=paper_title[:50])
 
@@ -420,22 +722,33 @@ async def download_pdf_from_url(
         async with httpx.AsyncClient(
             timeout=60.0,
             follow_redirects=True,
-            mounts=mounts
+            mounts=mounts,
+            event_hooks={"response": [count_rate_limited("pdf_download")]}
         ) as client:
-            response = await client.get(pdf_url)
+            with STAGE_SECONDS.time(stage="pdf_download"):
+                response = await client.get(pdf_url)
             response.raise_for_status()
 
-            with open(local_path, 'wb') as f:
-                f.write(response.content)
+            # 文件写入、哈希与解析都在线程中进行，大 PDF 不阻塞事件循环（WebSocket / 其他任务）
+            await asyncio.to_thread(local_path.write_bytes, response.content)
+
+        # 不同链接可能指向同一个 PDF：按内容哈希再查一次
+        pdf_sha256 = await asyncio.to_thread(file_sha256, str(local_path))
+        paper["pdf_sha256"] = pdf_sha256
+        if not force_refresh:
+            known = _check_paper_catalog(paper_keys(pdf_sha256=pdf_sha256))
+            if known:
+                return _known_paper_response(known, start_time)
 
         # 读取 PDF 内容
         logger.info("📖 开始读取 PDF 内容")
-        pdf_content, pdf_metadata = _read_pdf_file(str(local_path))
+        with STAGE_SECONDS.time(stage="text_extraction"):
+            pdf_content, pdf_metadata = await asyncio.to_thread(_read_pdf_file, str(local_path))
 
-        _current_paper["pdf_path"] = str(local_path)
-        _current_paper["pdf_url"] = pdf_url
-        _current_paper["pdf_content"] = pdf_content
-        _current_paper["pdf_metadata"] = pdf_metadata
+        paper["pdf_path"] = str(local_path)
+        paper["pdf_url"] = pdf_url
+        paper["pdf_content"] = pdf_content
+        paper["pdf_metadata"] = pdf_metadata
 
         elapsed = time.time() - start_time
         logger.info(
@@ -469,29 +782,44 @@ async def download_pdf_from_url(
 
 
 @function_tool
+@_tracked_stage("download")
+@_coalesced("download", _path_key("pdf_path"))
 async def read_local_pdf(
-    pdf_path: Annotated[str, "PDF文件的本地路径"]
+    ctx: RunContextWrapper[DigestRunContext],
+    pdf_path: Annotated[str, "PDF文件的本地路径"],
+    force_refresh: Annotated[bool, "忽略本地论文目录，强制重新处理（用户明确要求重新整理时使用）"] = False
 ) -> str:
     """
     读取本地 PDF 文件内容
 
     参数:
         pdf_path: PDF 文件的本地路径
+        force_refresh: 是否忽略本地论文目录
 
     返回:
-        包含 PDF 内容和元数据的 JSON
+        包含 PDF 内容和元数据的 JSON；已处理过的论文返回 already_processed
     """
-    global _current_paper
+    paper = _get_run_context(ctx).paper
     start_time = time.time()
 
+    from .paper_catalog import file_sha256, paper_keys
+
     try:
         logger.info("📖 开始读取本地 PDF", pdf_path=pdf_path)
 
-        pdf_content, pdf_metadata = _read_pdf_file(pdf_path)
+        pdf_sha256 = await asyncio.to_thread(file_sha256, pdf_path)
+        paper["pdf_sha256"] = pdf_sha256
+        if not force_refresh:
+            known = _check_paper_catalog(paper_keys(pdf_sha256=pdf_sha256))
+            if known:
+                return _known_paper_response(known, start_time)
 
-        _current_paper["pdf_path"] = pdf_path
-        _current_paper["pdf_content"] = pdf_content
-        _current_paper["pdf_metadata"] = pdf_metadata
+        with STAGE_SECONDS.time(stage="text_extraction"):
+            pdf_content, pdf_metadata = await asyncio.to_thread(_read_pdf_file, pdf_path)
+
+        paper["pdf_path"] = pdf_path
+        paper["pdf_content"] = pdf_content
+        paper["pdf_metadata"] = pdf_metadata
 
         elapsed = time.time() - start_time
         file_size = os.path.getsize(pdf_path) / 1024 / 1024 if os.path.exists(pdf_path) else 0
@@ -579,6 +907,8 @@ def _get_paper_images_dir(paper_title: str) -> Path:
 
 def _read_pdf_file(pdf_path: str):
     """读取 PDF 文件内容和元数据（内部函数）"""
+    import fitz  # PyMuPDF，首次读取 PDF 时才导入
+
     doc = fitz.open(pdf_path)
     total_pages = doc.page_count
 
@@ -790,7 +1120,10 @@ def _auto_insert_images(
 
 
 @function_tool
+@_tracked_stage("digest")
+@_coalesced("digest", _args_digest)
 async def generate_paper_digest(
+    ctx: RunContextWrapper[DigestRunContext],
     xiaohongshu_content: Annotated[str, "小红书帖子内容"] = "",
     paper_title: Annotated[str, "论文标题"] = "",
     pdf_content: Annotated[str, "PDF全文内容"] = "",
@@ -823,7 +1156,7 @@ async def generate_paper_digest(
     返回:
         Markdown格式的论文整理
     """
-    global _openai_client, _current_paper
+    paper = _get_run_context(ctx).paper
     start_time = time.time()
 
     # 读取模板
@@ -834,23 +1167,26 @@ async def generate_paper_digest(
     # 提取 PDF 中的图片（如果提供了 PDF 路径）
     images_info = ""
 
-    # 优先使用传入的 pdf_path，如果为空则从全局变量获取
+    # 优先使用传入的 pdf_path，如果为空则从运行上下文获取
     effective_pdf_path = pdf_path
     if not effective_pdf_path or not Path(effective_pdf_path).exists():
-        effective_pdf_path = _current_paper.get("pdf_path", "")
+        effective_pdf_path = paper.get("pdf_path", "")
         if effective_pdf_path:
-            logger.info("📄 使用全局变量中的 PDF 路径", pdf_path=effective_pdf_path[:100])
+            logger.info("📄 使用运行上下文中的 PDF 路径", pdf_path=effective_pdf_path[:100])
 
     if effective_pdf_path and Path(effective_pdf_path).exists():
         try:
             logger.info("🖼️  开始提取 PDF 中的 Figures/Tables", pdf_path=effective_pdf_path[:100])
             from .pdf_figure_extractor_v2 import PDFFigureExtractorV2
+            from .job_queue import stage_slot
 
             # 将图片保存到论文特定目录：paper_digest/pdfs/{Paper_Title}/extracted_images/
             images_dir = _get_paper_images_dir(paper_title)
 
             extractor = PDFFigureExtractorV2(str(images_dir))
-            images, blocks = extractor.extract(effective_pdf_path)
+            # PDFFigures2 是阻塞的 JVM 子进程：限制并发并放到线程中执行，不阻塞事件循环
+            async with stage_slot("pdf"):
+                images, blocks = await asyncio.to_thread(extractor.extract, effective_pdf_path)
 
             if images:
                 # V2 提取器已经提供了完整的 Figures/Tables，不需要再选择
@@ -969,9 +1305,9 @@ async def generate_paper_digest(
                     python_fallback=python_count,
                     images_dir=str(images_dir)
                 )
-                # 保存图片信息到全局变量供后续使用
-                _current_paper["extracted_images"] = images
-                _current_paper["images_dir"] = str(images_dir)
+                # 保存图片信息到运行上下文供后续使用
+                paper["extracted_images"] = images
+                paper["images_dir"] = str(images_dir)
             else:
                 logger.info("ℹ️  PDF 中未找到可提取的 Figures/Tables")
 
@@ -1122,11 +1458,15 @@ async def generate_paper_digest(
             model=get_tool_model(),
         )
 
-        result = await Runner.run(
-            starting_agent=digest_generation_agent,
-            input=prompt,
-            max_turns=1
-        )
+        from .job_queue import stage_slot
+
+        async with stage_slot("llm"):
+            with LLM_CALL_SECONDS.time(call="generate_digest"):
+                result = await Runner.run(
+                    starting_agent=digest_generation_agent,
+                    input=prompt,
+                    max_turns=1
+                )
 
         # 提取Agent返回的文本内容
         digest_content = result.final_output if hasattr(result, 'final_output') else str(result)
@@ -1147,7 +1487,7 @@ async def generate_paper_digest(
 
         # 🔧 备用方案：仅在 LLM 完全没有插入图片时才自动插入核心图片
         # 注意：现在的策略是 LLM 只插入 2-3 张核心图片，所以不需要补充所有遗漏的图片
-        if images_info and _current_paper.get("extracted_images"):
+        if images_info and paper.get("extracted_images"):
             original_image_count = digest_content.count('<figure>')
 
             # 只有当 LLM 完全没有插入图片时，才使用备用方案
@@ -1155,7 +1495,7 @@ async def generate_paper_digest(
                 logger.warning("⚠️  LLM 完全没有插入图片，启用备用方案")
                 digest_content = _auto_insert_images(
                     digest_content,
-                    _current_paper["extracted_images"],
+                    paper["extracted_images"],
                     relative_image_path
                 )
                 final_image_count = digest_content.count('<figure>')
@@ -1171,8 +1511,8 @@ async def generate_paper_digest(
         with open(output_file, 'w', encoding='utf-8') as f:
             f.write(digest_content)
 
-        _current_paper["digest_content"] = digest_content
-        _current_paper["digest_file"] = str(output_file)
+        paper["digest_content"] = digest_content
+        paper["digest_file"] = str(output_file)
 
         elapsed = time.time() - start_time
         logger.info(
@@ -1204,7 +1544,10 @@ async def generate_paper_digest(
 
 
 @function_tool
+@_tracked_stage("save")
+@_coalesced("save", _title_key())
 async def save_digest_to_notion(
+    ctx: RunContextWrapper[DigestRunContext],
     paper_title: Annotated[str, "论文标题"],
     digest_content: Annotated[str, "论文整理内容（Markdown格式）"],
     source_url: Annotated[str, "来源URL"] = "",
@@ -1219,6 +1562,7 @@ async def save_digest_to_notion(
     arxiv_id: Annotated[str, "ArXiv ID"] = "",
     project_page: Annotated[str, "项目主页"] = "",
     other_resources: Annotated[str, "其他资源（代码仓库、数据集等）"] = "",
+    update_existing: Annotated[bool, "如果数据库中已有同一篇论文的页面，则增量更新该页面而不是新建"] = True,
 ) -> str:
     """
     将论文整理保存到 Notion
@@ -1238,16 +1582,20 @@ async def save_digest_to_notion(
         arxiv_id: ArXiv ID
         project_page: 项目主页
         other_resources: 其他资源
+        update_existing: 已有页面时是否增量更新（按 arXiv ID / DOI / 标题查找）
 
     返回:
         保存结果
     """
-    from notion_client import AsyncClient
+    from .notion_gateway import get_notion_gateway
+    run_context = _get_run_context(ctx)
+    paper = run_context.paper
     start_time = time.time()
 
     try:
         logger.info("💾 开始保存论文整理到 Notion", paper_title=paper_title[:100])
-        client = AsyncClient(auth=os.getenv('NOTION_TOKEN'))
+        # 使用进程级共享的 Notion 客户端（连接池常驻，不在每次保存时新建/关闭）
+        client = get_notion_gateway().client
 
         # 构建 properties
         properties = {
@@ -1309,29 +1657,99 @@ async def save_digest_to_notion(
         if source_url:
             properties["Source URL"] = {"url": source_url}
 
-        # 转换 Markdown 为 Notion blocks（包含图片处理）
-        blocks = await _markdown_to_notion_blocks_with_images(digest_content)
+        parent = {"database_id": os.getenv('NOTION_DATABASE_ID')}
+        catalog_keys = _catalog_keys(paper, paper_title, source_url, pdf_url, arxiv_id, doi)
 
-        # Notion API 限制：单次创建页面最多 100 个 children blocks
-        # 如果超过 100 个，进行切片处理
-        if len(blocks) > 100:
-            logger.warning(
-                f"⚠️  Blocks 超过 100 个限制 ({len(blocks)}，已截断到 100)",
-                original_count=len(blocks),
-                truncated_count=100
+        # outbox 模式：内容持久化后立即返回，由后台 worker 写入 Notion
+        if os.getenv("NOTION_WRITE_MODE", "direct").lower() == "outbox":
+            return await _enqueue_notion_write(
+                paper, paper_title, parent, properties, digest_content, start_time, catalog_keys
             )
-            blocks = blocks[:100]
 
-        response = await client.pages.create(
-            parent={"database_id": os.getenv('NOTION_DATABASE_ID')},
-            properties=properties,
-            children=blocks,
-        )
+        from .job_queue import stage_slot
+
+        # 更新模式：已有同一篇论文的页面时，只提交差异部分
+        if update_existing and parent["database_id"]:
+            from .notion_page_sync import find_existing_page
+
+            existing_page = None
+            try:
+                # 限制同时进行的 Notion 写入
+                async with stage_slot("notion"):
+                    existing_page = await find_existing_page(
+                        client,
+                        parent["database_id"],
+                        arxiv_id=arxiv_id,
+                        doi=doi,
+                        title=paper_title,
+                    )
+                    if existing_page:
+                        result = await _update_existing_notion_page(
+                            paper, client, existing_page, properties, digest_content, start_time
+                        )
+            except Exception as e:
+                # 查找失败时无法确认页面是否存在，更新失败时页面可能已被部分修改：
+                # 都不能退回到新建页面（会产生重复页面），直接报告错误，重新整理即可再次同步
+                elapsed = time.time() - start_time
+                page_id = (existing_page or {}).get("id")
+                logger.error(
+                    "❌ 更新 Notion 已有页面失败",
+                    page_id=page_id,
+                    error=str(e),
+                    elapsed_time=f"{elapsed:.2f}s"
+                )
+                return json.dumps({
+                    "success": False,
+                    "page_id": page_id,
+                    "error": (
+                        f"更新 Notion 已有页面失败: {str(e)}" if page_id
+                        else f"查找 Notion 已有页面失败: {str(e)}"
+                    )
+                }, ensure_ascii=False, indent=2)
+
+            if existing_page:
+                _record_processed_paper(
+                    paper,
+                    catalog_keys,
+                    paper_title,
+                    existing_page["id"],
+                    f"https://notion.so/{existing_page['id'].replace('-', '')}"
+                )
+                return result
+
+        try:
+            async with stage_slot("notion"):
+                # 转换 Markdown 为 Notion blocks（包含图片处理）
+                blocks = await _markdown_to_notion_blocks_with_images(digest_content, paper, run_context)
+
+                # Notion API 限制：单次创建页面最多 100 个 children blocks
+                # 如果超过 100 个，进行切片处理
+                if len(blocks) > 100:
+                    logger.warning(
+                        f"⚠️  Blocks 超过 100 个限制 ({len(blocks)}，已截断到 100)",
+                        original_count=len(blocks),
+                        truncated_count=100
+                    )
+                    blocks = blocks[:100]
+
+                with STAGE_SECONDS.time(stage="notion_page_create"):
+                    response = await client.pages.create(
+                        parent=parent,
+                        properties=properties,
+                        children=blocks,
+                    )
+        except Exception as e:
+            # Notion 不可用时不丢弃已生成的内容：写入 outbox，后台重试
+            # 超时 / 断连时页面可能已经建好，worker 刷写前先查找，避免重复建页
+            logger.warning("⚠️ 直接写入 Notion 失败，转入 outbox 稍后重试", error=str(e))
+            return await _enqueue_notion_write(
+                paper, paper_title, parent, properties, digest_content, start_time, catalog_keys,
+                maybe_created=True,
+            )
 
         page_id = response["id"]
         page_url = f"https://notion.so/{page_id.replace('-', '')}"
-
-        await client.aclose()
+        _record_processed_paper(paper, catalog_keys, paper_title, page_id, page_url)
 
         elapsed = time.time() - start_time
         logger.info(
@@ -1364,6 +1782,149 @@ async def save_digest_to_notion(
         }, ensure_ascii=False, indent=2)
 
 
+def _build_pending_blocks(digest_content: str, paper: dict) -> tuple:
+    """
+    将 Markdown 转为 Notion blocks，图片使用 outbox 占位符（不上传）
+
+    Args:
+        digest_content: Markdown 文本
+        paper: 运行上下文中的论文状态（提供 extracted_images / images_dir）
+
+    Returns:
+        (blocks, images)
+        - blocks: 最多 100 个 blocks，图片 file_upload id 为 `pending:{filename}`
+        - images: 正文中实际引用的图片 [{"filename": ..., "path": ...}]
+    """
+    from .notion_outbox import pending_image_map, pending_image_filenames
+    from .notion_markdown_converter import markdown_to_notion_blocks
+    from .notion_image_uploader_v2 import markdown_to_notion_blocks_with_images
+
+    extracted_images = paper.get("extracted_images", [])
+    images_dir = paper.get("images_dir", "")
+
+    if not extracted_images or not images_dir:
+        return markdown_to_notion_blocks(digest_content)[:100], []
+
+    filenames = [img["filename"] for img in extracted_images]
+    blocks = markdown_to_notion_blocks_with_images(
+        digest_content,
+        pending_image_map(filenames),
+        images_dir
+    )[:100]
+
+    # 只保留正文中实际引用的图片
+    referenced = set(pending_image_filenames(blocks))
+    images = [
+        {"filename": filename, "path": str(Path(images_dir) / filename)}
+        for filename in filenames
+        if filename in referenced
+    ]
+    return blocks, images
+
+
+async def _update_existing_notion_page(
+    paper: dict,
+    client,
+    page: dict,
+    properties: dict,
+    digest_content: str,
+    start_time: float
+) -> str:
+    """
+    增量更新已有的 Notion 页面
+
+    只对变化的 blocks 发出 update/delete/append 调用，
+    页面上已存在的图片不会重新上传。
+    """
+    from .notion_gateway import get_notion_gateway
+    from .notion_image_uploader import NotionImageUploader
+    from .notion_page_sync import sync_page_blocks
+
+    page_id = page["id"]
+    page_url = f"https://notion.so/{page_id.replace('-', '')}"
+    blocks, images = _build_pending_blocks(digest_content, paper)
+    image_paths = {img["filename"]: img["path"] for img in images}
+
+    async def upload_images(filenames: list) -> dict:
+        gateway = get_notion_gateway()
+        uploader = NotionImageUploader(gateway.notion_token, client=gateway.http)
+        upload_map, _failed = await uploader.upload_images_batch(
+            [image_paths[name] for name in filenames
+             if name in image_paths and Path(image_paths[name]).exists()]
+        )
+        return upload_map
+
+    await client.pages.update(page_id=page_id, properties=properties)
+    stats = await sync_page_blocks(client, page_id, blocks, upload_images=upload_images)
+
+    elapsed = time.time() - start_time
+    api_calls = sum(stats.values()) + 1
+    logger.info(
+        "✅ 已增量更新 Notion 中的已有页面",
+        page_id=page_id,
+        page_url=page_url,
+        api_calls=api_calls,
+        elapsed_time=f"{elapsed:.2f}s"
+    )
+
+    return json.dumps({
+        "success": True,
+        "updated": True,
+        "page_id": page_id,
+        "page_url": page_url,
+        "changes": stats,
+        "message": f"✅ 已增量更新 Notion 中的已有页面（{api_calls} 次写入调用，耗时 {elapsed:.2f}s）\n\n查看链接: {page_url}"
+    }, ensure_ascii=False, indent=2)
+
+
+async def _enqueue_notion_write(
+    paper: dict,
+    paper_title: str,
+    parent: dict,
+    properties: dict,
+    digest_content: str,
+    start_time: float,
+    catalog_keys: Optional[list] = None,
+    maybe_created: bool = False
+) -> str:
+    """
+    将页面写入请求持久化到 Notion outbox
+
+    图片 block 使用占位符，真正的上传由后台 worker 在刷写时完成。
+    maybe_created 表示直接写入失败时页面可能已经建好，worker 会先查找已有页面。
+    """
+    from .notion_outbox import get_notion_outbox
+
+    blocks, images = _build_pending_blocks(digest_content, paper)
+
+    entry = await get_notion_outbox().enqueue(
+        paper_title=paper_title,
+        parent=parent,
+        properties=properties,
+        blocks=blocks,
+        images=images,
+        catalog={"keys": catalog_keys or [], "digest_file": paper.get("digest_file") or ""},
+        maybe_created=maybe_created,
+    )
+    # 论文目录在页面建好后由 outbox worker 登记；幂等键命中已完成的记录时页面已存在，直接登记
+    if catalog_keys and entry["status"] == "done" and entry["page_url"]:
+        _record_processed_paper(paper, catalog_keys, paper_title, page_url=entry["page_url"])
+
+    elapsed = time.time() - start_time
+    if entry["status"] == "done" and entry["page_url"]:
+        message = f"✅ 该论文整理此前已保存到 Notion！（耗时 {elapsed:.2f}s）\n\n查看链接: {entry['page_url']}"
+    else:
+        message = f"📮 论文整理已写入本地 outbox（ID: {entry['id']}），将在后台同步到 Notion。（耗时 {elapsed:.2f}s）"
+
+    return json.dumps({
+        "success": True,
+        "queued": entry["status"] != "done",
+        "outbox_id": entry["id"],
+        "page_url": entry["page_url"],
+        "message": message
+    }, ensure_ascii=False, indent=2)
+
+
 def _extract_chinese_abstract(digest_content: str) -> str:
     """从生成的中文论文整理中提取摘要部分"""
     import re
@@ -1388,22 +1949,27 @@ def _extract_chinese_abstract(digest_content: str) -> str:
     return digest_content[:200].replace('#', '').strip()
 
 
-async def _markdown_to_notion_blocks_with_images(markdown_text: str) -> list:
+async def _markdown_to_notion_blocks_with_images(
+    markdown_text: str,
+    paper: dict,
+    run_context: Optional[DigestRunContext] = None
+) -> list:
     """
     将 Markdown 转换为 Notion API blocks（包含图片处理）
 
-    1. 从全局变量中获取已提取的图片信息
+    1. 从运行上下文中获取已提取的图片信息
     2. 从 Markdown 中提取图片引用和创建 image blocks
     3. 将文本 blocks 和图片 blocks 交错排列
     4. 保持原始 Markdown 的结构顺序
 
     Args:
         markdown_text: Markdown 文本（可能包含 HTML figure 标签）
+        paper: 运行上下文中的论文状态
+        run_context: 运行上下文（可选），图片上传前后上报 upload 阶段事件
 
     Returns:
         Notion API blocks 列表（包含文本和图片 blocks）
     """
-    global _current_paper
 
     try:
         from .notion_markdown_converter import markdown_to_notion_blocks
@@ -1412,10 +1978,11 @@ async def _markdown_to_notion_blocks_with_images(markdown_text: str) -> list:
             interleave_blocks_with_images,
             NotionImageUploader
         )
+        from .notion_gateway import get_notion_gateway
 
         # 第一步：获取已提取的图片信息（如果有）
-        extracted_images = _current_paper.get("extracted_images", [])
-        images_dir = _current_paper.get("images_dir", "")
+        extracted_images = paper.get("extracted_images", [])
+        images_dir = paper.get("images_dir", "")
 
         if not extracted_images or not images_dir:
             # 没有提取到图片，直接转换 Markdown
@@ -1432,7 +1999,7 @@ async def _markdown_to_notion_blocks_with_images(markdown_text: str) -> list:
             # 尝试多个备选路径
             alt_dirs = [
                 # 新的论文特定目录结构（优先）
-                _get_paper_images_dir(_current_paper.get("title", "unknown")),
+                _get_paper_images_dir(paper.get("title", "unknown")),
                 # 旧的通用提取图片目录（后向兼容）
                 PROJECT_ROOT / "paper_digest" / "pdfs" / "extracted_images",
             ]
@@ -1458,7 +2025,7 @@ async def _markdown_to_notion_blocks_with_images(markdown_text: str) -> list:
         if notion_token and images_dir:
             try:
                 logger.info("开始上传提取的图片到 Notion")
-                uploader = NotionImageUploader(notion_token)
+                uploader = NotionImageUploader(notion_token, client=get_notion_gateway().http)
 
                 # 准备图片文件列表
                 images_to_upload = [
@@ -1468,6 +2035,9 @@ async def _markdown_to_notion_blocks_with_images(markdown_text: str) -> list:
                 ]
 
                 if images_to_upload:
+                    if run_context:
+                        run_context.emit("upload", "start", total=len(images_to_upload))
+
                     # 批量上传图片
                     upload_map, failed = await uploader.upload_images_batch(images_to_upload)
                     image_upload_map = upload_map
@@ -1478,11 +2048,15 @@ async def _markdown_to_notion_blocks_with_images(markdown_text: str) -> list:
                         uploaded_count=len(upload_map),
                         failed_count=len(failed)
                     )
+                    if run_context:
+                        run_context.emit("upload", "done", uploaded=len(upload_map), failed=len(failed))
                 else:
                     logger.warning("未找到本地提取的图片文件")
 
             except Exception as e:
                 logger.warning(f"Notion 图片上传失败: {e}")
+                if run_context:
+                    run_context.emit("upload", "error", error=str(e))
                 # 降级处理：不使用图片（Notion 不支持 file:// URL）
                 pass
 
@@ -1543,9 +2117,7 @@ def _markdown_to_notion_blocks(markdown_text: str) -> list:
 
 
 # Digest Agent 定义
-digest_agent = Agent(
-    name="digest_agent",
-    instructions="""你是论文深度整理专家（Digest Agent）。⚡ 仅需 2 次 LLM 调用，大幅加速！
+DIGEST_AGENT_INSTRUCTIONS = """你是论文深度整理专家（Digest Agent）。⚡ 仅需 2 次 LLM 调用，大幅加速！
 
 你的职责是接收论文相关信息，完成以下任务：
 
@@ -1556,10 +2128,13 @@ digest_agent = Agent(
    - 如果提供了小红书 URL，使用 fetch_xiaohongshu_post 获取内容
    - 如果提供了 PDF URL，使用 download_pdf_from_url 下载
    - 如果提供了本地 PDF 路径，使用 read_local_pdf 读取
+   - ⚡ 这些工具会先查询本地论文目录：返回 already_processed=true 时说明论文已整理过，
+     直接把 page_url 告诉用户并停止（用户明确要求重新整理时，传 force_refresh=true）
 
 2. **搜索论文 PDF**（如果没有提供 PDF URL）
    - 优先使用 search_arxiv_pdf 在 arXiv 搜索论文
    - 从搜索结果中获取 PDF URL 和 arXiv ID
+   - 返回 success=false 且带 similarity 时说明候选标题不匹配：不要下载该 PDF，仅根据帖子内容整理
 
 3. **⚡ 一次 LLM 调用提取所有元数据**（替代旧的两个单独调用）
    - 使用 extract_paper_metadata **一次调用同时提取**：
@@ -1599,6 +2174,8 @@ digest_agent = Agent(
      * arxiv_id - ArXiv ID（如果有）
      * project_page - 项目主页（如果有）
      * other_resources - 其他资源（如果有）
+   - 如果 Notion 中已有同一篇论文的页面（按 arXiv ID / DOI / 标题匹配），会自动增量更新该页面，不会新建重复页面
+   - 保存成功后论文会登记到本地论文目录，下次提交同一篇论文时直接返回已有链接
 
 ⚠️ 关键要求：
 - ✅ **只进行 2 次 LLM 调用**（extract_paper_metadata 一次，generate_paper_digest 一次）
@@ -1606,19 +2183,45 @@ digest_agent = Agent(
 - ✅ 必须严格按照顺序执行
 - ✅ 每个步骤都要检查结果是否成功
 - ✅ 元信息必须准确且完整
+- ✅ extract_paper_metadata 返回的 already_processed 不为空时，除非用户要求重新整理，否则告知已有链接并停止
 - ✅ 调用 save_digest_to_notion 时传递所有字段（特别是 authors 和 keywords 要转为 JSON 数组字符串）
 - ❌ 如果某个步骤失败，报告错误并停止
 
 你专注于论文整理工作，不处理定时任务相关的事情。
-""",
-    model=get_reason_model(),
-    tools=[
-        fetch_xiaohongshu_post,
-        search_arxiv_pdf,
-        download_pdf_from_url,
-        read_local_pdf,
-        extract_paper_metadata,  # ✨ 新的合并函数（替代旧的两个）
-        generate_paper_digest,
-        save_digest_to_notion,
-    ]
-)
+"""
+
+_digest_agent: Optional[Agent] = None
+
+
+def get_digest_agent() -> Agent:
+    """
+    获取 Digest Agent
+
+    首次调用时才创建（此时才初始化模型和 HTTP 客户端），导入本模块不触发任何模型构建
+    """
+    global _digest_agent
+
+    if _digest_agent is None:
+        _digest_agent = Agent(
+            name="digest_agent",
+            instructions=DIGEST_AGENT_INSTRUCTIONS,
+            model=get_reason_model(),
+            tools=[
+                fetch_xiaohongshu_post,
+                search_arxiv_pdf,
+                download_pdf_from_url,
+                read_local_pdf,
+                extract_paper_metadata,  # ✨ 新的合并函数（替代旧的两个）
+                generate_paper_digest,
+                save_digest_to_notion,
+            ]
+        )
+
+    return _digest_agent
+
+
+def __getattr__(name: str):
+    # 兼容 `from src.services.paper_digest import digest_agent`：首次访问时才构建
+    if name == "digest_agent":
+        return get_digest_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -21,6 +21,8 @@ import os
 import logging
 import numpy as np
 
+from ..utils.metrics import STAGE_SECONDS
+
 logger = logging.getLogger(__name__)
 
 
@@ -79,7 +81,8 @@ class PDFFigureExtractorV2:
 
         # 步骤 1: 运行 PDFFigures2
         logger.info("🔧 运行 PDFFigures2 提取...")
-        pdffigures2_data = self._run_pdffigures2(pdf_path)
+        with STAGE_SECONDS.time(stage="pdffigures2"):
+            pdffigures2_data = self._run_pdffigures2(pdf_path)
 
         if pdffigures2_data:
             # 步骤 2: 处理标准提取的 figures
@@ -95,13 +98,15 @@ class PDFFigureExtractorV2:
             regionless_captions = pdffigures2_data.get("regionless-captions", [])
             if regionless_captions:
                 logger.info(f"🐍 Python Fallback 处理 {len(regionless_captions)} 个 regionless captions...")
-                fallback_figures = self._extract_regionless_figures(pdf_path, regionless_captions)
+                with STAGE_SECONDS.time(stage="figure_fallback"):
+                    fallback_figures = self._extract_regionless_figures(pdf_path, regionless_captions)
                 all_figures.extend(fallback_figures)
 
         else:
             # PDFFigures2 失败，完全使用 Python 方法
             logger.warning("⚠️  PDFFigures2 失败，使用纯 Python 方法提取")
-            all_figures = self._extract_all_figures_python(pdf_path)
+            with STAGE_SECONDS.time(stage="figure_fallback"):
+                all_figures = self._extract_all_figures_python(pdf_path)
 
         # 步骤 3.5: 过滤附录图片
         if references_page:
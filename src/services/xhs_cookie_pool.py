@@ -0,0 +1,305 @@
+"""Pool of Xiaohongshu cookie sets with load-aware selection and health tracking."""
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional, TypeVar
+
+from ..utils.logger import get_logger
+from .xiaohongshu import AuthenticationError, XiaohongshuClient, _cookie_identity, get_xiaohongshu_client
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+STRATEGY_ROUND_ROBIN = "round_robin"
+STRATEGY_LEAST_LOADED = "least_loaded"
+
+# Cookie strings contain ";" so pool entries are separated by "||" (or newlines)
+POOL_SEPARATOR = "||"
+
+
+@dataclass
+class PooledCookie:
+    """
+    One cookie set in the pool.
+
+    Attributes:
+        cookies: Browser session cookie string
+        identity: Hashed cookie identity (registry and rate limiter key)
+        in_flight: Requests currently using this cookie
+        leases: Total requests served
+        failures: Consecutive authentication failures
+        quarantined_until: Monotonic time until which the cookie is not used
+        last_error: Most recent failure reason
+    """
+
+    cookies: str
+    identity: str
+    in_flight: int = 0
+    leases: int = 0
+    failures: int = 0
+    quarantined_until: float = 0.0
+    last_error: Optional[str] = None
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.quarantined_until
+
+    @property
+    def anonymous(self) -> bool:
+        """No cookies: public posts are fetched as a guest."""
+        return not self.cookies
+
+    def status(self) -> dict:
+        return {
+            "identity": self.identity[:12],
+            "healthy": self.healthy,
+            "in_flight": self.in_flight,
+            "leases": self.leases,
+            "failures": self.failures,
+            "quarantined_for": max(0.0, round(self.quarantined_until - time.monotonic(), 1)),
+            "last_error": self.last_error,
+        }
+
+
+class CookiePool:
+    """
+    Spread Xiaohongshu traffic over several accounts.
+
+    Each cookie set has its own shared client and rate limiter (from the
+    client registry), so total throughput grows with the number of
+    accounts. A cookie that fails authentication is quarantined and the
+    request is retried on another one; a periodic health check re-validates
+    every cookie with validate_cookies() and releases or quarantines them
+    (inconclusive checks change nothing).
+
+    Exposes fetch_post() and fetch_user_notes() like XiaohongshuClient, so it
+    can be used wherever a client is expected. Without any cookies the pool
+    holds a single anonymous client, which is never quarantined or
+    health-checked.
+    """
+
+    def __init__(
+        self,
+        cookies: List[str],
+        strategy: str = STRATEGY_LEAST_LOADED,
+        quarantine_seconds: float = 1800.0,
+        health_interval: float = 600.0,
+        openai_client=None,
+    ):
+        """
+        Initialize cookie pool.
+
+        Args:
+            cookies: Cookie strings, one per account (empty: one anonymous client)
+            strategy: "least_loaded" or "round_robin"
+            quarantine_seconds: How long a failing cookie is kept out of rotation
+            health_interval: Seconds between background health checks
+            openai_client: OpenAI client for the LLM parsing fallback
+        """
+        unique = list(dict.fromkeys(c.strip() for c in cookies if c and c.strip()))
+        if not unique:
+            logger.warning("No Xiaohongshu cookies configured, fetching public posts anonymously")
+            unique = [""]
+        if strategy not in (STRATEGY_ROUND_ROBIN, STRATEGY_LEAST_LOADED):
+            raise ValueError(f"Unknown cookie selection strategy: {strategy}")
+
+        self.entries = [PooledCookie(cookies=c, identity=_cookie_identity(c)) for c in unique]
+        self.strategy = strategy
+        self.quarantine_seconds = quarantine_seconds
+        self.health_interval = health_interval
+        self.openai_client = openai_client
+        self._next = 0
+        self._health_task: Optional[asyncio.Task] = None
+
+    @property
+    def size(self) -> int:
+        return len(self.entries)
+
+    @property
+    def healthy_count(self) -> int:
+        return sum(1 for entry in self.entries if entry.healthy)
+
+    def status(self) -> List[dict]:
+        """Per-cookie state (identities are truncated hashes, never raw cookies)."""
+        return [entry.status() for entry in self.entries]
+
+    # ----- selection -----
+
+    def _select(self, exclude: set) -> Optional[PooledCookie]:
+        candidates = [e for e in self.entries if e.healthy and e.identity not in exclude]
+        if not candidates:
+            return None
+
+        if self.strategy == STRATEGY_ROUND_ROBIN:
+            for offset in range(len(self.entries)):
+                entry = self.entries[(self._next + offset) % len(self.entries)]
+                if entry in candidates:
+                    self._next = (self.entries.index(entry) + 1) % len(self.entries)
+                    return entry
+
+        return min(candidates, key=lambda e: (e.in_flight, e.leases))
+
+    def _client(self, entry: PooledCookie) -> XiaohongshuClient:
+        return get_xiaohongshu_client(entry.cookies, openai_client=self.openai_client)
+
+    @asynccontextmanager
+    async def _use(self, entry: PooledCookie) -> AsyncIterator[XiaohongshuClient]:
+        entry.in_flight += 1
+        entry.leases += 1
+        try:
+            yield self._client(entry)
+            entry.failures = 0
+        except AuthenticationError as e:
+            # Concurrent requests failing on the same cookie count as one failure;
+            # the anonymous client is the only one there is, so it stays in rotation
+            if entry.healthy and not entry.anonymous:
+                self.quarantine(entry, str(e))
+            raise
+        finally:
+            entry.in_flight -= 1
+
+    async def _with_failover(self, call: Callable[[XiaohongshuClient], Awaitable[T]]) -> T:
+        """Run call on a pooled client, moving to the next cookie after auth failures."""
+        tried: set = set()
+        while True:
+            entry = self._select(tried)
+            if entry is None:
+                raise AuthenticationError("No healthy Xiaohongshu cookies left in the pool")
+            tried.add(entry.identity)
+            try:
+                async with self._use(entry) as client:
+                    return await call(client)
+            except AuthenticationError:
+                continue
+
+    async def fetch_post(self, post_url: str, use_cache: bool = True) -> Any:
+        """Fetch a post with the next available cookie (see XiaohongshuClient.fetch_post)."""
+        return await self._with_failover(lambda client: client.fetch_post(post_url, use_cache=use_cache))
+
+    async def fetch_user_notes(self, user_id: str, cursor: str = "", num: int = 30) -> dict:
+        """Fetch one page of a blogger's notes (see XiaohongshuClient.fetch_user_notes)."""
+        return await self._with_failover(lambda client: client.fetch_user_notes(user_id, cursor=cursor, num=num))
+
+    # ----- health -----
+
+    def quarantine(self, entry: PooledCookie, reason: str) -> None:
+        """Take a cookie out of rotation; repeated failures extend the quarantine."""
+        entry.failures += 1
+        entry.last_error = reason
+        duration = self.quarantine_seconds * min(entry.failures, 4)
+        entry.quarantined_until = time.monotonic() + duration
+        logger.warning(
+            "Quarantined Xiaohongshu cookie",
+            identity=entry.identity[:12],
+            failures=entry.failures,
+            quarantine_seconds=duration,
+            healthy=self.healthy_count,
+            reason=reason,
+        )
+
+    async def check_health(self) -> List[dict]:
+        """
+        Validate every cookie; valid ones are released from quarantine.
+
+        Only a definite authentication failure quarantines a cookie; checks
+        that fail or are inconclusive (network errors, rate limiting) leave
+        its state unchanged.
+        """
+        async def check(entry: PooledCookie) -> None:
+            try:
+                valid = await self._client(entry).validate_cookies()
+            except Exception as e:
+                logger.warning("Cookie health check errored", identity=entry.identity[:12], error=str(e))
+                return
+
+            if valid is None:
+                return
+            if valid:
+                if not entry.healthy:
+                    logger.info("Xiaohongshu cookie recovered", identity=entry.identity[:12])
+                entry.failures = 0
+                entry.quarantined_until = 0.0
+                entry.last_error = None
+            elif entry.healthy:
+                self.quarantine(entry, "session is not logged in")
+
+        await asyncio.gather(*(check(entry) for entry in self.entries if not entry.anonymous))
+        logger.info("Cookie pool health check", size=self.size, healthy=self.healthy_count)
+        return self.status()
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_interval)
+            try:
+                await self.check_health()
+            except Exception as e:
+                logger.warning("Cookie pool health check failed", error=str(e))
+
+    def start_health_checks(self) -> None:
+        """Start periodic health checks (must be called inside an event loop)."""
+        if self._health_task is None or self._health_task.done():
+            self._health_task = asyncio.create_task(self._health_loop(), name="xhs-cookie-health")
+
+    async def stop(self) -> None:
+        """Stop periodic health checks."""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            await asyncio.gather(self._health_task, return_exceptions=True)
+            self._health_task = None
+
+
+# Global instance
+_pool: Optional[CookiePool] = None
+
+
+def load_pool_cookies() -> List[str]:
+    """Cookie sets from XHS_COOKIES_POOL ("||" or newline separated), else XHS_COOKIES."""
+    raw = os.getenv("XHS_COOKIES_POOL", "")
+    cookies = [c for line in raw.splitlines() for c in line.split(POOL_SEPARATOR)]
+    cookies = [c.strip() for c in cookies if c.strip()]
+    return cookies or [os.getenv("XHS_COOKIES", "")]
+
+
+def get_cookie_pool(openai_client=None) -> CookiePool:
+    """
+    Get the process-wide cookie pool (created on first use).
+
+    Configured by XHS_COOKIES_POOL, XHS_COOKIE_STRATEGY,
+    XHS_COOKIE_QUARANTINE_SECONDS and XHS_COOKIE_HEALTH_INTERVAL.
+    """
+    global _pool
+
+    if _pool is None:
+        _pool = CookiePool(
+            load_pool_cookies(),
+            strategy=os.getenv("XHS_COOKIE_STRATEGY", STRATEGY_LEAST_LOADED),
+            quarantine_seconds=float(os.getenv("XHS_COOKIE_QUARANTINE_SECONDS", "1800")),
+            health_interval=float(os.getenv("XHS_COOKIE_HEALTH_INTERVAL", "600")),
+            openai_client=openai_client,
+        )
+        logger.info("Cookie pool created", size=_pool.size, strategy=_pool.strategy)
+    elif openai_client is not None and _pool.openai_client is None:
+        _pool.openai_client = openai_client
+
+    return _pool
+
+
+def start_cookie_health_checks() -> None:
+    """Start periodic health checks of the process-wide pool, if any cookies are configured."""
+    if not any(load_pool_cookies()):
+        logger.info("No Xiaohongshu cookies configured, skipping cookie health checks")
+        return
+    get_cookie_pool().start_health_checks()
+
+
+async def close_cookie_pool() -> None:
+    """Stop health checks (clients are closed by close_xiaohongshu_clients)."""
+    global _pool
+
+    if _pool is not None:
+        await _pool.stop()
+        _pool = None
@@ -0,0 +1,273 @@
+"""
+小红书博主动态抓取 - 增量游标 + 并发获取帖子
+
+功能：
+1. 按游标分页读取博主的笔记列表（最新在前）
+2. 每个博主记录已见过的最新帖子 ID 与时间戳（SQLite），只处理更新的帖子
+3. 在共享限流器下并发获取帖子正文
+4. 启发式判断是否为论文分享帖，只有论文帖才交给整理流水线
+
+小红书帖子 ID 与 MongoDB ObjectId 格式相同，前 8 位十六进制是发布时间（Unix 秒），
+因此无需额外请求即可按时间比较。
+
+存储：SQLite（路径由 XHS_FEED_DB 配置）
+"""
+
+import asyncio
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+
+from ..models.post import Post
+from ..utils.logger import get_logger
+from .paper_catalog import KEY_XHS_POST, get_paper_catalog
+from .xhs_cookie_pool import CookiePool
+from .xiaohongshu import XiaohongshuClient
+
+logger = get_logger(__name__)
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+DEFAULT_FEED_DB = PROJECT_ROOT / "data" / "xhs_feed.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS feed_cursors (
+    blogger_id TEXT PRIMARY KEY,
+    last_post_id TEXT NOT NULL,
+    last_post_ts REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+# 明确的论文信号：arXiv / DOI 链接或编号
+_STRONG_PAPER_PATTERN = re.compile(
+    r"arxiv\.org/|arxiv\s*[:：]?\s*\d{4}\.\d{4,5}|doi\.org/10\.|\bdoi\s*[:：]\s*10\.",
+    re.IGNORECASE,
+)
+# 一般论文信号：出现两类及以上才认为是论文帖
+_PAPER_TERM_PATTERN = re.compile(
+    r"\b(paper|preprint|abstract|benchmark|cvpr|iccv|eccv|neurips|nips|iclr|icml|acl|emnlp|naacl|"
+    r"aaai|ijcai|kdd|sigir)\b|(论文|顶会|预印本|作者|机构|实验|消融|开源代码|代码仓库)",
+    re.IGNORECASE,
+)
+
+OnPaperPost = Callable[[Post], Awaitable[Any]]
+
+
+def post_timestamp(post_id: str) -> float:
+    """从帖子 ID（ObjectId 格式）解析发布时间戳；无法解析时返回 0"""
+    try:
+        return float(int(post_id[:8], 16))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def note_url(note: Dict[str, Any]) -> str:
+    """笔记列表项 -> 帖子链接（带 xsec_token 时才能免登录打开）"""
+    url = f"https://www.xiaohongshu.com/explore/{note['note_id']}"
+    if note.get("xsec_token"):
+        url += f"?xsec_token={note['xsec_token']}&xsec_source=pc_user"
+    return url
+
+
+def looks_like_paper_post(text: str) -> bool:
+    """启发式判断帖子是否在分享论文"""
+    if not text:
+        return False
+    if _STRONG_PAPER_PATTERN.search(text):
+        return True
+    terms = {(match.group(1) or match.group(2)).lower() for match in _PAPER_TERM_PATTERN.finditer(text)}
+    return len(terms) >= 2
+
+
+# ============= 游标存储 =============
+
+class FeedCursorStore:
+    """SQLite 博主游标：每个博主已处理到的最新帖子"""
+
+    def __init__(self, db_path: Optional[str] = None):
+        """
+        Args:
+            db_path: SQLite 文件路径（默认读取 XHS_FEED_DB）
+        """
+        self.db_path = Path(db_path or os.getenv("XHS_FEED_DB", str(DEFAULT_FEED_DB)))
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def get(self, blogger_id: str) -> Optional[Dict[str, Any]]:
+        """返回 {"last_post_id", "last_post_ts", "updated_at"}，从未抓取过返回 None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_post_id, last_post_ts, updated_at FROM feed_cursors WHERE blogger_id = ?",
+                (blogger_id,),
+            ).fetchone()
+        return dict(row) if row else None
+
+    def advance(self, blogger_id: str, post_id: str, post_ts: float) -> None:
+        """把游标推进到更新的帖子（不会回退）"""
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO feed_cursors (blogger_id, last_post_id, last_post_ts, updated_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(blogger_id) DO UPDATE SET
+                    last_post_id = excluded.last_post_id,
+                    last_post_ts = excluded.last_post_ts,
+                    updated_at = excluded.updated_at
+                WHERE excluded.last_post_ts > feed_cursors.last_post_ts
+                """,
+                (blogger_id, post_id, post_ts, time.time()),
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# 全局实例
+_cursor_store: Optional[FeedCursorStore] = None
+
+
+def get_feed_cursor_store() -> FeedCursorStore:
+    """获取进程级游标存储（首次调用时打开数据库）"""
+    global _cursor_store
+
+    if _cursor_store is None:
+        _cursor_store = FeedCursorStore()
+
+    return _cursor_store
+
+
+# ============= 抓取 =============
+
+class BloggerFeedCrawler:
+    """博主动态增量抓取"""
+
+    def __init__(
+        self,
+        client: Union[XiaohongshuClient, CookiePool],
+        store: Optional[FeedCursorStore] = None,
+        concurrency: Optional[int] = None,
+        max_pages: Optional[int] = None,
+    ):
+        """
+        Args:
+            client: 小红书客户端或 Cookie 池（请求经由各账号的限流器）
+            store: 游标存储（默认进程级实例）
+            concurrency: 同时获取的帖子数（默认 XHS_FEED_CONCURRENCY × Cookie 池账号数）
+            max_pages: 单次最多翻页数（默认读取 XHS_FEED_MAX_PAGES）
+        """
+        self.client = client
+        self.store = store or get_feed_cursor_store()
+        # 每个账号独立限流，并发随账号数线性增加
+        accounts = getattr(client, "healthy_count", 1) or 1
+        self.concurrency = max(1, concurrency or int(os.getenv("XHS_FEED_CONCURRENCY", "3")) * accounts)
+        self.max_pages = max(1, max_pages or int(os.getenv("XHS_FEED_MAX_PAGES", "5")))
+
+    async def list_new_notes(self, blogger_id: str) -> List[Dict[str, Any]]:
+        """
+        列出游标之后的新笔记（从新到旧）
+
+        遇到不晚于游标的非置顶笔记即停止翻页；置顶笔记不代表时间顺序，只做过滤。
+        """
+        cursor_row = self.store.get(blogger_id)
+        last_ts = cursor_row["last_post_ts"] if cursor_row else 0.0
+
+        new_notes: List[Dict[str, Any]] = []
+        seen = set()
+        page_cursor = ""
+        for _ in range(self.max_pages):
+            page = await self.client.fetch_user_notes(blogger_id, cursor=page_cursor)
+            reached_cursor = False
+            for note in page["notes"]:
+                note_id = note["note_id"]
+                ts = post_timestamp(note_id)
+                if ts <= last_ts:
+                    reached_cursor = reached_cursor or not note.get("sticky")
+                    continue
+                if note_id not in seen:
+                    seen.add(note_id)
+                    new_notes.append({**note, "timestamp": ts})
+
+            page_cursor = page.get("cursor") or ""
+            if reached_cursor or not page.get("has_more") or not page_cursor:
+                break
+
+        new_notes.sort(key=lambda note: note["timestamp"], reverse=True)
+        return new_notes
+
+    async def crawl(self, blogger_id: str, on_paper_post: Optional[OnPaperPost] = None) -> Dict[str, Any]:
+        """
+        抓取博主的新帖子，把论文帖交给 on_paper_post
+
+        游标只推进到"之前的帖子全部处理成功"的位置，失败的帖子下次会重试。
+
+        Returns:
+            {"blogger_id", "new_posts", "paper_posts", "skipped", "failed", "elapsed_time"}
+        """
+        start_time = time.time()
+        notes = await self.list_new_notes(blogger_id)
+        logger.info("📰 博主新帖子", blogger_id=blogger_id, new_posts=len(notes))
+
+        catalog = get_paper_catalog()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        outcomes: Dict[str, str] = {}
+        paper_posts: List[str] = []
+        failed: List[Dict[str, str]] = []
+
+        async def process(note: Dict[str, Any]) -> None:
+            note_id = note["note_id"]
+            if catalog.lookup([(KEY_XHS_POST, note_id)]):
+                outcomes[note_id] = "known"
+                return
+
+            url = note_url(note)
+            async with semaphore:
+                try:
+                    post = await self.client.fetch_post(url)
+                    if not looks_like_paper_post(f"{note.get('title', '')}\n{post.raw_content}"):
+                        outcomes[note_id] = "skipped"
+                        return
+                    if on_paper_post is not None:
+                        await on_paper_post(post)
+                    paper_posts.append(url)
+                    outcomes[note_id] = "paper"
+                except Exception as e:
+                    logger.warning("⚠️ 博主帖子处理失败", blogger_id=blogger_id, note_id=note_id, error=str(e))
+                    failed.append({"url": url, "error": str(e)})
+                    outcomes[note_id] = "failed"
+
+        await asyncio.gather(*(process(note) for note in notes))
+
+        # 从旧到新推进游标，遇到第一个失败的帖子停止
+        for note in sorted(notes, key=lambda note: note["timestamp"]):
+            if outcomes.get(note["note_id"]) == "failed":
+                break
+            self.store.advance(blogger_id, note["note_id"], note["timestamp"])
+
+        elapsed = time.time() - start_time
+        summary = {
+            "blogger_id": blogger_id,
+            "new_posts": len(notes),
+            "paper_posts": paper_posts,
+            "skipped": sum(1 for outcome in outcomes.values() if outcome in ("skipped", "known")),
+            "failed": failed,
+            "elapsed_time": f"{elapsed:.2f}s",
+        }
+        logger.info(
+            "✅ 博主动态抓取完成",
+            blogger_id=blogger_id,
+            new_posts=len(notes),
+            paper_posts=len(paper_posts),
+            failed=len(failed),
+            elapsed_time=f"{elapsed:.2f}s",
+        )
+        return summary
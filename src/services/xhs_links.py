@@ -0,0 +1,246 @@
+"""Xiaohongshu link normalisation and cached xhslink.com short-link resolution."""
+
+import asyncio
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urljoin, urlparse
+
+import httpx
+
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+CANONICAL_POST_URL = "https://www.xiaohongshu.com/explore/{post_id}"
+
+_SHORT_LINK_PATTERN = re.compile(r"^(?:https?://)?(?:www\.)?xhslink\.com/", re.IGNORECASE)
+
+# Post IDs are 24-char hex ObjectIds; these cover the web, share and search URL shapes
+_POST_ID_PATTERNS = [
+    re.compile(r"/explore/([a-f0-9]{24})"),
+    re.compile(r"/discovery/item/([a-f0-9]{24})"),
+    re.compile(r"/search_result/([a-f0-9]{24})"),
+    re.compile(r"/user/profile/[a-f0-9]{24}/([a-f0-9]{24})"),
+    re.compile(r"[?&]noteId=([a-f0-9]{24})"),
+]
+
+# Query parameters that change what the page serves; everything else is share tracking
+_KEPT_QUERY_PARAMS = ("xsec_token", "xsec_source")
+
+MAX_REDIRECTS = 5
+
+
+def is_short_link(url: str) -> bool:
+    """Whether url is an xhslink.com share link."""
+    return bool(url) and bool(_SHORT_LINK_PATTERN.match(url.strip()))
+
+
+def _post_id_from_url(url: str) -> str:
+    for pattern in _POST_ID_PATTERNS:
+        match = pattern.search(url)
+        if match:
+            return match.group(1)
+    return ""
+
+
+def extract_post_id(url: str) -> str:
+    """
+    Canonical post ID for any Xiaohongshu post URL.
+
+    Query-string variants of one post map to the same ID. Short links are
+    looked up in the resolver cache only (no network); unresolved short
+    links return "".
+
+    Args:
+        url: Post URL or xhslink.com short link
+
+    Returns:
+        24-character post ID, or "" if the URL does not identify a post
+    """
+    if not url:
+        return ""
+    url = url.strip()
+    if is_short_link(url):
+        resolved = get_short_link_resolver().cached(url)
+        return _post_id_from_url(resolved) if resolved else ""
+    return _post_id_from_url(url)
+
+
+def canonical_post_url(url: str) -> str:
+    """
+    Rewrite a post URL to https://www.xiaohongshu.com/explore/{id}.
+
+    Only xsec_token / xsec_source are kept (they are required to open the
+    note without the author's session); share and tracking parameters are
+    dropped. URLs that do not identify a post are returned unchanged.
+    """
+    post_id = _post_id_from_url(url)
+    if not post_id:
+        return url
+
+    query = parse_qs(urlparse(url).query)
+    kept = [(name, query[name][0]) for name in _KEPT_QUERY_PARAMS if query.get(name)]
+    canonical = CANONICAL_POST_URL.format(post_id=post_id)
+    if kept:
+        canonical += "?" + "&".join(f"{name}={value}" for name, value in kept)
+    return canonical
+
+
+class ShortLinkResolver:
+    """
+    Follow xhslink.com redirects once and cache short -> canonical URLs.
+
+    Mappings expire after ttl seconds; at most max_entries are kept (least
+    recently used evicted first). Concurrent resolutions of the same short
+    link share one request.
+    """
+
+    def __init__(self, ttl: float = 7 * 24 * 3600, max_entries: int = 10000, timeout: float = 15):
+        """
+        Initialize resolver.
+
+        Args:
+            ttl: Seconds a resolved mapping stays valid
+            max_entries: Cache size bound
+            timeout: Request timeout in seconds
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._cache: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @staticmethod
+    def _key(short_url: str) -> str:
+        parsed = urlparse(short_url.strip() if "://" in short_url else f"https://{short_url.strip()}")
+        return f"xhslink.com{parsed.path.rstrip('/')}"
+
+    def cached(self, short_url: str) -> Optional[str]:
+        """Canonical URL for a short link if it was resolved and has not expired."""
+        key = self._key(short_url)
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        canonical, expires_at = entry
+        if time.monotonic() >= expires_at:
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return canonical
+
+    def _store(self, short_url: str, canonical: str) -> None:
+        key = self._key(short_url)
+        self._cache[key] = (canonical, time.monotonic() + self.ttl)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                follow_redirects=False,
+                headers={
+                    "User-Agent": (
+                        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
+                        "AppleWebKit/537.36 (KHTML, like Gecko) "
+                        "Chrome/120.0.0.0 Safari/537.36"
+                    ),
+                },
+            )
+        return self._client
+
+    async def resolve(self, short_url: str) -> str:
+        """
+        Resolve a short link to the canonical post URL.
+
+        Raises:
+            ValueError: If the redirects do not lead to a post
+            httpx.HTTPError: If a request fails
+        """
+        canonical = self.cached(short_url)
+        if canonical is not None:
+            return canonical
+
+        key = self._key(short_url)
+        pending = self._pending.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            canonical = await self._follow(short_url)
+            self._store(short_url, canonical)
+            future.set_result(canonical)
+            return canonical
+        except Exception as e:
+            future.set_exception(e)
+            # Only waiters re-raise; avoid "exception was never retrieved"
+            future.exception()
+            raise
+        finally:
+            if not future.done():
+                future.cancel()
+            del self._pending[key]
+
+    async def _follow(self, short_url: str) -> str:
+        url = short_url.strip() if "://" in short_url else f"https://{short_url.strip()}"
+        client = self._get_client()
+
+        for _ in range(MAX_REDIRECTS):
+            if _post_id_from_url(url):
+                break
+            response = await client.get(url)
+            location = response.headers.get("location")
+            if not response.is_redirect or not location:
+                break
+            url = urljoin(url, location)
+
+        if not _post_id_from_url(url):
+            raise ValueError(f"Short link did not resolve to a post: {short_url}")
+
+        canonical = canonical_post_url(url)
+        logger.info("Resolved Xiaohongshu short link", short_url=short_url, post_id=_post_id_from_url(url))
+        return canonical
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# Global instance
+_resolver: Optional[ShortLinkResolver] = None
+
+
+def get_short_link_resolver() -> ShortLinkResolver:
+    """Get the process-wide resolver (TTL from XHS_SHORT_LINK_TTL, seconds)."""
+    global _resolver
+
+    if _resolver is None:
+        _resolver = ShortLinkResolver(ttl=float(os.getenv("XHS_SHORT_LINK_TTL", str(7 * 24 * 3600))))
+
+    return _resolver
+
+
+async def resolve_post_url(url: str) -> str:
+    """
+    Canonical post URL for a Xiaohongshu link, following short links if needed.
+
+    Non-post URLs are returned unchanged.
+    """
+    url = url.strip()
+    if is_short_link(url):
+        return await get_short_link_resolver().resolve(url)
+    return canonical_post_url(url)
+
+
+async def close_short_link_resolver() -> None:
+    """Close the resolver's HTTP client (the cache is kept)."""
+    if _resolver is not None:
+        await _resolver.close()
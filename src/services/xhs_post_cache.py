@@ -0,0 +1,161 @@
+"""Local TTL cache of parsed Xiaohongshu posts with HTTP validators."""
+
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+from ..models.post import Post
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+DEFAULT_POST_CACHE_DB = PROJECT_ROOT / "data" / "xhs_posts.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS xhs_posts (
+    post_id TEXT PRIMARY KEY,
+    post_json TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    fetched_at REAL NOT NULL,
+    checked_at REAL NOT NULL
+);
+"""
+
+
+@dataclass
+class CachedPost:
+    """
+    A cached post and the validators it was served with.
+
+    Attributes:
+        post: Parsed post
+        etag: ETag response header, if any
+        last_modified: Last-Modified response header, if any
+        fetched_at: When the page was last downloaded and parsed
+        checked_at: When the entry was last confirmed current (download or 304)
+    """
+
+    post: Post
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+    checked_at: float
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """If-None-Match / If-Modified-Since headers for revalidation."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class PostCache:
+    """
+    SQLite cache of parsed posts keyed by post ID.
+
+    Entries younger than ttl are served without any request. Older entries
+    are revalidated with a conditional GET when the page was served with an
+    ETag or Last-Modified header; a 304 refreshes the entry without
+    re-downloading or re-parsing the page.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, ttl: Optional[float] = None):
+        """
+        Initialize post cache.
+
+        Args:
+            db_path: SQLite file path (defaults to XHS_POST_CACHE_DB)
+            ttl: Seconds an entry is served without revalidation (defaults to XHS_POST_CACHE_TTL)
+        """
+        self.db_path = Path(db_path or os.getenv("XHS_POST_CACHE_DB", str(DEFAULT_POST_CACHE_DB)))
+        self.ttl = ttl if ttl is not None else float(os.getenv("XHS_POST_CACHE_TTL", "86400"))
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def get(self, post_id: str) -> Optional[CachedPost]:
+        """Cached entry for a post (fresh or stale), or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT post_json, etag, last_modified, fetched_at, checked_at FROM xhs_posts WHERE post_id = ?",
+                (post_id,),
+            ).fetchone()
+        if row is None:
+            return None
+
+        try:
+            post = Post.model_validate_json(row["post_json"])
+        except ValueError as e:
+            logger.warning("Dropping unreadable cached post", post_id=post_id, error=str(e))
+            self.invalidate(post_id)
+            return None
+
+        return CachedPost(
+            post=post,
+            etag=row["etag"],
+            last_modified=row["last_modified"],
+            fetched_at=row["fetched_at"],
+            checked_at=row["checked_at"],
+        )
+
+    def is_fresh(self, entry: CachedPost) -> bool:
+        return time.time() - entry.checked_at < self.ttl
+
+    def put(self, post: Post, etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        """Store a freshly downloaded post and its validators."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO xhs_posts
+                    (post_id, post_json, etag, last_modified, fetched_at, checked_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (post.post_id, post.model_dump_json(), etag, last_modified, now, now),
+            )
+            self._conn.commit()
+
+    def touch(self, post_id: str) -> None:
+        """Mark an entry current after a 304 Not Modified."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE xhs_posts SET checked_at = ? WHERE post_id = ?",
+                (time.time(), post_id),
+            )
+            self._conn.commit()
+
+    def invalidate(self, post_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM xhs_posts WHERE post_id = ?", (post_id,))
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# Global instance
+_post_cache: Optional[PostCache] = None
+
+
+def get_post_cache() -> Optional[PostCache]:
+    """Get the process-wide post cache, or None when XHS_POST_CACHE_TTL is 0."""
+    global _post_cache
+
+    if _post_cache is None:
+        if float(os.getenv("XHS_POST_CACHE_TTL", "86400")) <= 0:
+            return None
+        _post_cache = PostCache()
+
+    return _post_cache
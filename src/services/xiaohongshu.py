@@ -1,17 +1,25 @@
 """Xiaohongshu client for post fetching and parsing."""
 
 import asyncio
+import hashlib
+import json
+import os
 import re
+import sqlite3
+import threading
+import time
+from collections import deque
 from datetime import datetime
 from typing import Optional
-from urllib.parse import urlparse
 
 import httpx
-from bs4 import BeautifulSoup
 
 from ..models.post import Post
 from ..utils.logger import get_logger
+from ..utils.metrics import CACHE_HITS, LLM_CALL_SECONDS, count_rate_limited
 from ..utils.retry import exponential_backoff
+from .xhs_links import extract_post_id, resolve_post_url
+from .xhs_post_cache import PostCache, get_post_cache
 from agents import Agent, Runner
 
 # 导入模型
@@ -25,6 +33,20 @@ from init_model import get_tool_model
 
 logger = get_logger(__name__)
 
+USER_POSTED_API = "https://edith.xiaohongshu.com/api/sns/web/v1/user_posted"
+USER_ME_API = "https://edith.xiaohongshu.com/api/sns/web/v2/user/me"
+# API error code for an expired or missing login session
+_LOGIN_EXPIRED_CODE = -100
+
+# Note pages embed their data as `window.__INITIAL_STATE__={...}</script>`
+_INITIAL_STATE_MARKER = "window.__INITIAL_STATE__"
+# The blob is a JS object literal: bare `undefined` values are not valid JSON
+_UNDEFINED_VALUE_PATTERN = re.compile(r"([:\[,]\s*)undefined(?=\s*[,\]}])")
+# Hashtags are rendered as "#tag[话题]#" in the description
+_TOPIC_TAG_PATTERN = re.compile(r"#([^#\[\n]+)\[话题\]#")
+# Nodes whose text is not visible page content
+_NON_TEXT_TAGS = ("script", "style", "noscript")
+
 
 class XiaohongshuError(Exception):
     """Base exception for Xiaohongshu client errors."""
@@ -53,12 +75,15 @@ class FetchError(XiaohongshuError):
 
 class RateLimiter:
     """
-    Simple rate limiter for HTTP requests.
+    Sliding-window rate limiter for HTTP requests.
 
-    Implements token bucket algorithm with request tracking.
+    Keeps the grant times of the last max_requests requests in a deque
+    (monotonic clock). The lock only guards the bookkeeping; callers wait
+    outside it and re-check the window afterwards, so one sleeping caller
+    never blocks the others.
     """
 
-    def __init__(self, max_requests: int = 10, period: int = 60):
+    def __init__(self, max_requests: int = 10, period: float = 60):
         """
         Initialize rate limiter.
 
@@ -68,7 +93,7 @@ class RateLimiter:
         """
         self.max_requests = max_requests
         self.period = period
-        self.requests: list[float] = []
+        self._grants: deque[float] = deque()
         self._lock = asyncio.Lock()
 
     async def acquire(self) -> None:
@@ -77,30 +102,119 @@ class RateLimiter:
 
         Blocks if rate limit would be exceeded.
         """
+        while True:
+            wait_time = await self._try_acquire()
+            if wait_time <= 0:
+                return
+
+            logger.warning(
+                "Rate limit reached, waiting",
+                wait_seconds=round(wait_time, 2),
+                max_requests=self.max_requests,
+                period=self.period,
+            )
+            await asyncio.sleep(wait_time)
+
+    async def _try_acquire(self) -> float:
+        """Record a grant if the window has room; otherwise return seconds to wait."""
         async with self._lock:
-            now = datetime.now().timestamp()
+            now = time.monotonic()
+            while self._grants and now - self._grants[0] >= self.period:
+                self._grants.popleft()
 
-            # Remove requests outside the current window
-            self.requests = [req for req in self.requests if now - req < self.period]
+            if len(self._grants) < self.max_requests:
+                self._grants.append(now)
+                return 0.0
+            return self.period - (now - self._grants[0])
 
-            if len(self.requests) >= self.max_requests:
-                # Calculate wait time
-                oldest_request = min(self.requests)
-                wait_time = self.period - (now - oldest_request)
+    def close(self) -> None:
+        """Release resources held by the limiter."""
+        pass
 
-                if wait_time > 0:
-                    logger.warning(
-                        "Rate limit reached, waiting",
-                        wait_seconds=wait_time,
-                        requests_in_window=len(self.requests),
-                    )
-                    await asyncio.sleep(wait_time)
-                    # Recalculate after waiting
-                    now = datetime.now().timestamp()
-                    self.requests = [req for req in self.requests if now - req < self.period]
 
-            # Record this request
-            self.requests.append(now)
+class SqliteRateLimiter(RateLimiter):
+    """
+    Rate limiter whose window is stored in SQLite.
+
+    Every process that points at the same database file (web workers,
+    chat sessions, scheduled jobs) shares one budget per key. Grants use
+    wall-clock time because monotonic clocks are not comparable across
+    processes; each check runs in a BEGIN IMMEDIATE transaction so
+    concurrent processes cannot both take the last slot.
+    """
+
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS xhs_rate_limit (
+        key TEXT NOT NULL,
+        granted_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_xhs_rate_limit_key ON xhs_rate_limit (key, granted_at);
+    """
+
+    def __init__(self, db_path: str, key: str, max_requests: int = 10, period: float = 60):
+        """
+        Initialize shared rate limiter.
+
+        Args:
+            db_path: SQLite database path (created if missing)
+            key: Budget key, e.g. the cookie identity
+            max_requests: Maximum requests allowed per period
+            period: Time period in seconds
+        """
+        super().__init__(max_requests, period)
+        self.db_path = Path(db_path)
+        self.key = key
+        self._conn: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(
+                str(self.db_path), timeout=30, isolation_level=None, check_same_thread=False
+            )
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(self._SCHEMA)
+        return self._conn
+
+    async def _try_acquire(self) -> float:
+        return await asyncio.to_thread(self._reserve)
+
+    def _reserve(self) -> float:
+        with self._db_lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                conn.execute(
+                    "DELETE FROM xhs_rate_limit WHERE key = ? AND granted_at <= ?",
+                    (self.key, now - self.period),
+                )
+                count, oldest = conn.execute(
+                    "SELECT COUNT(*), MIN(granted_at) FROM xhs_rate_limit WHERE key = ?",
+                    (self.key,),
+                ).fetchone()
+
+                if count < self.max_requests:
+                    conn.execute(
+                        "INSERT INTO xhs_rate_limit (key, granted_at) VALUES (?, ?)",
+                        (self.key, now),
+                    )
+                    wait_time = 0.0
+                else:
+                    wait_time = oldest + self.period - now
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return wait_time
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
 
 
 class XiaohongshuClient:
@@ -117,6 +231,7 @@ class XiaohongshuClient:
         rate_limiter: Optional[RateLimiter] = None,
         timeout: int = 30,
         openai_client=None,  # 新增：用于 Agent 解析
+        post_cache: Optional[PostCache] = None,
     ):
         """
         Initialize Xiaohongshu client.
@@ -126,11 +241,13 @@ class XiaohongshuClient:
             rate_limiter: Optional rate limiter instance
             timeout: Request timeout in seconds
             openai_client: OpenAI client for LLM-based HTML parsing
+            post_cache: Optional cache of parsed posts (fresh hits skip the request)
         """
         self.cookies = self._parse_cookies(cookies)
         self.rate_limiter = rate_limiter or RateLimiter()
         self.timeout = timeout
         self.openai_client = openai_client
+        self.post_cache = post_cache
 
         # Initialize HTTP client
         self.client = httpx.AsyncClient(
@@ -147,6 +264,7 @@ class XiaohongshuClient:
                 "Referer": "https://www.xiaohongshu.com/",
             },
             cookies=self.cookies,
+            event_hooks={"response": [count_rate_limited("xiaohongshu")]},
         )
 
     def _parse_cookies(self, cookies_str: str) -> dict[str, str]:
@@ -167,36 +285,64 @@ class XiaohongshuClient:
                 cookies[name.strip()] = value.strip()
         return cookies
 
-    async def validate_cookies(self) -> bool:
+    async def validate_cookies(self) -> Optional[bool]:
         """
         Validate that cookies are still valid.
 
+        Asks the user-info API who the session belongs to instead of
+        scanning the homepage, whose markup mentions "login" for every
+        visitor.
+
         Returns:
-            True if cookies are valid, False otherwise
+            True if the session is logged in, False if it definitely is not
+            (login redirect, 401, guest session or login-expired error code),
+            None if it could not be determined (network error, rate limit,
+            unexpected response)
         """
         try:
-            response = await self.client.get("https://www.xiaohongshu.com/")
+            response = await self.client.get(
+                USER_ME_API,
+                headers={"Accept": "application/json", "Origin": "https://www.xiaohongshu.com"},
+            )
+        except httpx.HTTPError as e:
+            logger.warning("Cookie validation request failed", error=str(e))
+            return None
 
-            # Check if redirected to login page
-            if "login" in str(response.url):
-                return False
+        if "login" in str(response.url) or response.status_code == 401:
+            return False
+        if response.status_code != 200:
+            logger.warning("Cookie validation inconclusive", status_code=response.status_code)
+            return None
 
-            # Check response content for login indicators
-            if "登录" in response.text or "login" in response.text.lower():
+        try:
+            payload = response.json()
+        except ValueError:
+            logger.warning("Cookie validation returned non-JSON response")
+            return None
+
+        data = payload.get("data") if isinstance(payload, dict) else None
+        if payload.get("success") and isinstance(data, dict):
+            if data.get("guest"):
                 return False
-
-            return response.status_code == 200
-        except Exception as e:
-            logger.error("Cookie validation failed", error=str(e))
+            if data.get("user_id"):
+                return True
+        elif payload.get("code") == _LOGIN_EXPIRED_CODE:
             return False
 
+        logger.warning("Cookie validation inconclusive", code=payload.get("code"), msg=payload.get("msg"))
+        return None
+
     @exponential_backoff(max_tries=3, exceptions=(httpx.HTTPError,))
-    async def fetch_post(self, post_url: str) -> Post:
+    async def fetch_post(self, post_url: str, use_cache: bool = True) -> Post:
         """
         Fetch a Xiaohongshu post by URL.
 
+        With a post cache, fresh entries are returned without a request and
+        stale ones are revalidated with a conditional GET.
+
         Args:
-            post_url: Full URL to the post
+            post_url: Full URL to the post or an xhslink.com short link
+            use_cache: Whether to read the post cache (results are stored either way)
 
         Returns:
             Post object with fetched content
@@ -206,24 +352,40 @@ class XiaohongshuClient:
             PostNotFoundError: If post not found
             FetchError: If fetching fails
         """
-        # Rate limiting
-        await self.rate_limiter.acquire()
-
-        logger.info("Fetching Xiaohongshu post", url=post_url)
-
         try:
-            # Extract post ID from URL
+            # Short links and query-string variants -> canonical post URL (cached)
+            post_url = await resolve_post_url(post_url)
             post_id = self._extract_post_id(post_url)
 
-            # Fetch the page
-            response = await self.client.get(post_url)
+            cached = self.post_cache.get(post_id) if self.post_cache and use_cache else None
+            if cached and self.post_cache.is_fresh(cached):
+                CACHE_HITS.inc(cache="xhs_post")
+                logger.info("Post served from cache", post_id=post_id)
+                return cached.post
+
+            # Rate limiting
+            await self.rate_limiter.acquire()
+
+            logger.info("Fetching Xiaohongshu post", url=post_url)
+
+            # Fetch the page (conditionally when the cached copy has validators)
+            headers = cached.conditional_headers() if cached else {}
+            response = await self.client.get(post_url, headers=headers)
 
             # Check for authentication errors
             if "login" in str(response.url):
                 raise AuthenticationError("Cookies expired - redirected to login page")
 
+            if response.status_code == 304 and cached:
+                self.post_cache.touch(post_id)
+                CACHE_HITS.inc(cache="xhs_post_not_modified")
+                logger.info("Post not modified since last fetch", post_id=post_id)
+                return cached.post
+
             # Check for 404
             if response.status_code == 404:
+                if self.post_cache:
+                    self.post_cache.invalidate(post_id)
                 raise PostNotFoundError(f"Post not found: {post_url}")
 
             # Check for other errors
@@ -231,6 +393,14 @@ class XiaohongshuClient:
 
             # Parse the response
             post_data = await self._parse_response(response.text, post_url, post_id)
+            post = Post(**post_data)
+
+            if self.post_cache:
+                self.post_cache.put(
+                    post,
+                    etag=response.headers.get("etag"),
+                    last_modified=response.headers.get("last-modified"),
+                )
 
             logger.info(
                 "Post fetched successfully",
@@ -238,7 +408,7 @@ class XiaohongshuClient:
                 content_length=len(post_data.get("raw_content", "")),
             )
 
-            return Post(**post_data)
+            return post
 
         except (AuthenticationError, PostNotFoundError):
             raise
@@ -247,6 +417,91 @@ class XiaohongshuClient:
         except Exception as e:
             raise FetchError(f"Error fetching post: {e}")
 
+    async def fetch_user_notes(self, user_id: str, cursor: str = "", num: int = 30) -> dict:
+        """
+        Fetch one page of a blogger's notes, newest first.
+
+        Uses the web `user_posted` API with cursor pagination. If the API
+        rejects the request (it may require signed headers) on the first
+        page, falls back to the notes embedded in the profile page, which
+        cannot be paginated further.
+
+        Args:
+            user_id: Blogger user ID
+            cursor: Pagination cursor from the previous page ("" for the first page)
+            num: Page size
+
+        Returns:
+            {"notes": [{"note_id", "title", "xsec_token", "sticky"}], "cursor": str, "has_more": bool}
+
+        Raises:
+            AuthenticationError: If cookies are expired
+            FetchError: If no notes could be fetched
+        """
+        await self.rate_limiter.acquire()
+        logger.info("Fetching blogger notes", user_id=user_id, cursor=cursor)
+
+        try:
+            response = await self.client.get(
+                USER_POSTED_API,
+                params={"num": num, "cursor": cursor, "user_id": user_id, "image_formats": "jpg,webp"},
+                headers={"Accept": "application/json", "Origin": "https://www.xiaohongshu.com"},
+            )
+            payload = response.json() if response.status_code == 200 else {}
+        except (httpx.HTTPError, ValueError) as e:
+            logger.warning("user_posted request failed", user_id=user_id, error=str(e))
+            payload = {}
+
+        if payload.get("success") and isinstance(payload.get("data"), dict):
+            data = payload["data"]
+            notes = [
+                {
+                    "note_id": note.get("note_id"),
+                    "title": note.get("display_title") or "",
+                    "xsec_token": note.get("xsec_token") or "",
+                    "sticky": bool((note.get("interact_info") or {}).get("sticky")),
+                }
+                for note in data.get("notes") or []
+                if note.get("note_id")
+            ]
+            return {"notes": notes, "cursor": data.get("cursor") or "", "has_more": bool(data.get("has_more"))}
+
+        if cursor:
+            raise FetchError(f"user_posted API rejected page request: {payload.get('msg') or 'unknown error'}")
+
+        logger.info("Falling back to profile page notes", user_id=user_id)
+        return await self._fetch_profile_notes(user_id)
+
+    async def _fetch_profile_notes(self, user_id: str) -> dict:
+        """Read the first page of notes from the blogger's profile page state."""
+        try:
+            response = await self.client.get(f"https://www.xiaohongshu.com/user/profile/{user_id}")
+        except httpx.HTTPError as e:
+            raise FetchError(f"HTTP error fetching profile: {e}")
+
+        if "login" in str(response.url):
+            raise AuthenticationError("Cookies expired - redirected to login page")
+
+        state = _load_initial_state(response.text) or {}
+        pages = (state.get("user") or {}).get("notes") or []
+        first_page = pages[0] if pages and isinstance(pages[0], list) else []
+
+        notes = []
+        for item in first_page:
+            card = item.get("noteCard") or {}
+            note_id = card.get("noteId") or item.get("id")
+            if note_id:
+                notes.append({
+                    "note_id": note_id,
+                    "title": card.get("displayTitle") or "",
+                    "xsec_token": card.get("xsecToken") or item.get("xsecToken") or "",
+                    "sticky": bool((card.get("interactInfo") or {}).get("sticky")),
+                })
+
+        if not notes:
+            raise FetchError(f"No notes found on profile page: {user_id}")
+        return {"notes": notes, "cursor": "", "has_more": False}
+
     def _extract_post_id(self, url: str) -> str:
         """
         Extract post ID from Xiaohongshu URL.
@@ -260,17 +515,9 @@ class XiaohongshuClient:
         Raises:
             ValueError: If URL is invalid
         """
-        # Pattern for explore URLs: /explore/{post_id}
-        # Pattern for discovery URLs: /discovery/item/{post_id}
-        patterns = [
-            r"/explore/([a-f0-9]{24})",
-            r"/discovery/item/([a-f0-9]{24})",
-        ]
-
-        for pattern in patterns:
-            match = re.search(pattern, url)
-            if match:
-                return match.group(1)
+        post_id = extract_post_id(url)
+        if post_id:
+            return post_id
 
         raise ValueError(f"Could not extract post ID from URL: {url}")
 
@@ -278,7 +525,9 @@ class XiaohongshuClient:
         """
         Parse HTML response to extract post data.
 
-        Uses LLM-based extraction for robust parsing.
+        Reads the embedded `__INITIAL_STATE__` JSON first (no LLM call);
+        falls back to LLM-based extraction when the blob is missing or
+        cannot be parsed.
 
         Args:
             html: HTML content
@@ -288,14 +537,70 @@ class XiaohongshuClient:
         Returns:
             Dictionary with post data
         """
-        soup = BeautifulSoup(html, "lxml")
+        post_data = self._parse_initial_state(html, post_url, post_id)
+        if post_data:
+            logger.info("Parsed post from __INITIAL_STATE__", post_id=post_id)
+            return post_data
 
-        # Use LLM-based parsing directly
-        return await self._parse_html_fallback(soup, post_url, post_id)
+        return await self._parse_html_fallback(html, post_url, post_id)
+
+    def _parse_initial_state(self, html: str, post_url: str, post_id: str) -> Optional[dict]:
+        """
+        Parse post data from the page's `window.__INITIAL_STATE__` blob.
 
-    async def _parse_html_fallback(
-        self, soup: BeautifulSoup, post_url: str, post_id: str
-    ) -> dict:
+        Args:
+            html: HTML content
+            post_url: Original post URL
+            post_id: Post ID
+
+        Returns:
+            Dictionary with post data, or None if the blob is missing,
+            malformed or does not contain the note
+        """
+        state = _load_initial_state(html)
+        if state is None:
+            logger.debug("No parsable __INITIAL_STATE__ in page", post_id=post_id)
+            return None
+
+        try:
+            detail_map = (state.get("note") or {}).get("noteDetailMap") or {}
+            detail = detail_map.get(post_id) or next(iter(detail_map.values()), None) or {}
+            note = detail.get("note") or {}
+        except (ValueError, AttributeError) as e:
+            logger.warning("Failed to parse __INITIAL_STATE__", post_id=post_id, error=str(e))
+            return None
+
+        title = (note.get("title") or "").strip()
+        desc = _TOPIC_TAG_PATTERN.sub(r"#\1", note.get("desc") or "").strip()
+        raw_content = "\n\n".join(part for part in (title, desc) if part)
+        if not raw_content:
+            logger.debug("__INITIAL_STATE__ has no note content", post_id=post_id)
+            return None
+
+        user = note.get("user") or {}
+        images = []
+        for image in note.get("imageList") or []:
+            url = image.get("urlDefault") or image.get("url") or ""
+            if url.startswith("//"):
+                url = f"https:{url}"
+            if url.startswith("http"):
+                images.append(url)
+
+        published_date = None
+        if isinstance(note.get("time"), (int, float)):
+            published_date = datetime.fromtimestamp(note["time"] / 1000)
+
+        return {
+            "post_id": post_id,
+            "post_url": post_url,
+            "blogger_name": (user.get("nickname") or "未知博主")[:100],
+            "blogger_id": str(user.get("userId") or "unknown")[:50],
+            "raw_content": raw_content,
+            "published_date": published_date,
+            "images": images[:10],
+        }
+
+    async def _parse_html_fallback(self, html: str, post_url: str, post_id: str) -> dict:
         """
         Parse HTML content using LLM-based extraction.
 
@@ -303,7 +608,7 @@ class XiaohongshuClient:
         avoiding brittle regex patterns.
 
         Args:
-            soup: BeautifulSoup object
+            html: HTML content
             post_url: Original post URL
             post_id: Post ID
 
@@ -312,14 +617,8 @@ class XiaohongshuClient:
         """
         logger.info("Using LLM-based HTML parsing", post_id=post_id)
 
-        # Get clean text from HTML
-        for script in soup(["script", "style", "noscript"]):
-            script.decompose()
-        html_text = soup.get_text(separator="\n", strip=True)
-
-        # Extract images
-        img_elements = soup.select("img[src]")
-        images = [img["src"] for img in img_elements if img.get("src", "").startswith("http")]
+        # Get clean text and images from HTML
+        html_text, images = _extract_page_text(html)
 
         # If no OpenAI client, fall back to basic extraction
         if not self.openai_client:
@@ -336,8 +635,6 @@ class XiaohongshuClient:
 
         # Use LLM to extract structured content
         try:
-            import json
-
             # 使用 Agent 替代直接的 LLM 调用
             html_extraction_agent = Agent(
                 name="html_extraction_agent",
@@ -358,11 +655,12 @@ class XiaohongshuClient:
                 model=get_tool_model(),
             )
 
-            result = await Runner.run(
-                starting_agent=html_extraction_agent,
-                input=f"请从以下HTML文本中提取小红书帖子信息：\n\n{html_text[:4000]}",
-                max_turns=1
-            )
+            with LLM_CALL_SECONDS.time(call="xhs_parse"):
+                result = await Runner.run(
+                    starting_agent=html_extraction_agent,
+                    input=f"请从以下HTML文本中提取小红书帖子信息：\n\n{html_text[:4000]}",
+                    max_turns=1
+                )
 
             result_text = result.final_output if hasattr(result, 'final_output') else str(result)
             result_text = result_text.strip()
@@ -400,6 +698,152 @@ class XiaohongshuClient:
                 "images": images[:10],
             }
 
+    @property
+    def is_closed(self) -> bool:
+        """Whether the underlying HTTP client has been closed."""
+        return self.client.is_closed
+
     async def close(self) -> None:
         """Close the HTTP client."""
         await self.client.aclose()
+
+    async def __aenter__(self) -> "XiaohongshuClient":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+
+def _initial_state_blob(html: str) -> Optional[str]:
+    """
+    Slice the `window.__INITIAL_STATE__` object literal out of the page.
+
+    Plain substring searches from the marker to the closing script tag;
+    the rest of the (often multi-megabyte) page is never scanned or parsed.
+    """
+    start = html.find(_INITIAL_STATE_MARKER)
+    if start < 0:
+        return None
+    start = html.find("=", start + len(_INITIAL_STATE_MARKER))
+    end = html.find("</script>", start)
+    if start < 0 or end < 0:
+        return None
+    blob = html[start + 1:end].strip().rstrip(";").rstrip()
+    return blob if blob.startswith("{") else None
+
+
+def _load_initial_state(html: str) -> Optional[dict]:
+    """Extract and decode the page's `window.__INITIAL_STATE__` object."""
+    blob = _initial_state_blob(html)
+    if blob is None:
+        return None
+    try:
+        state = json.loads(_UNDEFINED_VALUE_PATTERN.sub(r"\1null", blob))
+    except ValueError as e:
+        logger.warning("Failed to decode __INITIAL_STATE__", error=str(e))
+        return None
+    return state if isinstance(state, dict) else None
+
+
+def _extract_page_text(html: str) -> tuple[str, list[str]]:
+    """
+    Visible text (one stripped string per line) and absolute image URLs of a page.
+
+    Parses with lxml directly and drops script/style/noscript subtrees and
+    comments in C instead of building and walking a BeautifulSoup tree.
+    """
+    if not html or not html.strip():
+        return "", []
+
+    from lxml import etree, html as lxml_html  # deferred: only needed for the LLM fallback
+
+    tree = lxml_html.document_fromstring(html)
+    images = [src for src in tree.xpath("//img/@src") if src.startswith("http")]
+    etree.strip_elements(tree, etree.Comment, *_NON_TEXT_TAGS, with_tail=False)
+    lines = (text.strip() for text in tree.itertext())
+    return "\n".join(line for line in lines if line), images
+
+
+# ============= Process-wide client registry =============
+
+# cookie identity (sha256 of the cookie string) -> client / rate limiter
+_clients: dict[str, XiaohongshuClient] = {}
+_rate_limiters: dict[str, RateLimiter] = {}
+
+
+def _cookie_identity(cookies: str) -> str:
+    """Registry key for a cookie string (hashed so the raw cookies never appear in logs or keys)."""
+    return hashlib.sha256(cookies.encode("utf-8")).hexdigest()
+
+
+def get_rate_limiter(cookie_identity: str) -> RateLimiter:
+    """
+    Get the rate limiter for a cookie identity.
+
+    Budget comes from XHS_RATE_LIMIT_REQUESTS / XHS_RATE_LIMIT_PERIOD.
+    When XHS_RATE_LIMIT_DB is set the window lives in that SQLite file and
+    is shared by every process using it; otherwise it is in-process.
+    """
+    limiter = _rate_limiters.get(cookie_identity)
+    if limiter is None:
+        max_requests = int(os.getenv("XHS_RATE_LIMIT_REQUESTS", "10"))
+        period = float(os.getenv("XHS_RATE_LIMIT_PERIOD", "60"))
+        db_path = os.getenv("XHS_RATE_LIMIT_DB")
+
+        if db_path:
+            limiter = SqliteRateLimiter(db_path, cookie_identity[:16], max_requests, period)
+        else:
+            limiter = RateLimiter(max_requests, period)
+        _rate_limiters[cookie_identity] = limiter
+
+    return limiter
+
+
+def get_xiaohongshu_client(cookies: Optional[str] = None, openai_client=None) -> XiaohongshuClient:
+    """
+    Get the shared client for a cookie identity (created on first use).
+
+    Clients keep their connection pool open across fetches and share the
+    rate limiter of their cookie identity. They are closed by close_xiaohongshu_clients() at shutdown,
+    so callers must not close them.
+
+    Args:
+        cookies: Browser session cookies (defaults to XHS_COOKIES)
+        openai_client: OpenAI client for the LLM parsing fallback
+
+    Returns:
+        Shared XiaohongshuClient
+    """
+    cookies = cookies if cookies is not None else os.getenv("XHS_COOKIES", "")
+    key = _cookie_identity(cookies)
+
+    client = _clients.get(key)
+    if client is None or client.is_closed:
+        client = XiaohongshuClient(
+            cookies=cookies,
+            rate_limiter=get_rate_limiter(key),
+            openai_client=openai_client,
+            post_cache=get_post_cache(),
+        )
+        _clients[key] = client
+        logger.info("Created shared Xiaohongshu client", clients=len(_clients))
+    elif openai_client is not None and client.openai_client is None:
+        client.openai_client = openai_client
+
+    return client
+
+
+async def close_xiaohongshu_clients() -> None:
+    """Close every shared client and rate limiter (call on shutdown)."""
+    clients = list(_clients.values())
+    _clients.clear()
+    for limiter in _rate_limiters.values():
+        limiter.close()
+    _rate_limiters.clear()
+    for client in clients:
+        try:
+            await client.close()
+        except Exception as e:
+            logger.warning("Failed to close Xiaohongshu client", error=str(e))
+    if clients:
+        logger.info("Closed shared Xiaohongshu clients", count=len(clients))
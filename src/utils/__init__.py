@@ -1,10 +1,15 @@
-"""Utility modules for logging and retry logic."""
+"""Utility modules for logging, retry logic and metrics."""
 
 from .logger import get_logger, setup_logging
+from .metrics import MetricsRegistry, render_metrics
 from .retry import exponential_backoff
+from .singleflight import Singleflight
 
 __all__ = [
     "get_logger",
     "setup_logging",
     "exponential_backoff",
+    "MetricsRegistry",
+    "render_metrics",
+    "Singleflight",
 ]
@@ -7,6 +7,7 @@ import backoff
 from backoff import on_exception
 
 from .logger import get_logger
+from .metrics import RETRIES
 
 logger = get_logger(__name__)
 
@@ -40,7 +41,9 @@ def exponential_backoff(
     """
 
     def on_backoff_handler(details: dict[str, Any]) -> None:
-        """Log backoff events."""
+        """Log and count backoff events."""
+        target = details.get("target")
+        RETRIES.inc(operation=getattr(target, "__qualname__", str(target)))
         logger.warning(
             "Retrying after exception",
             exception=str(details.get("exception")),
@@ -0,0 +1,84 @@
+"""Singleflight: coalesce concurrent async calls that share a key."""
+
+import asyncio
+from typing import Awaitable, Callable, Dict, Tuple, TypeVar
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+
+class _LeaderCancelled(Exception):
+    """Delivered to followers when the leader's call was cancelled."""
+
+
+class Singleflight:
+    """
+    Run at most one in-flight call per key.
+
+    Callers that arrive while a call for the same key is running wait for
+    that call and receive its result (or exception) instead of starting
+    their own. Once the call finishes the key is released, so later calls
+    run again.
+
+    Cancelling the leader only cancels the leader: its followers retry,
+    and one of them becomes the new leader.
+
+    Example:
+        flight = Singleflight()
+        result, shared = await flight.do("arxiv:2505.10831", lambda: run_pipeline(url))
+    """
+
+    def __init__(self) -> None:
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """
+        Execute fn once for all concurrent callers with the same key.
+
+        Args:
+            key: Coalescing key
+            fn: Zero-argument coroutine factory, only invoked by the leader
+
+        Returns:
+            (result, shared) where shared is True for callers that attached
+            to another caller's in-flight call
+        """
+        while True:
+            future = self._inflight.get(key)
+            if future is None:
+                break
+            logger.info("Attached to in-flight call", key=key)
+            try:
+                # shield: a cancelled follower must not cancel the leader's call
+                return await asyncio.shield(future), True
+            except _LeaderCancelled:
+                logger.info("In-flight call was cancelled, retrying", key=key)
+
+        future = asyncio.get_running_loop().create_future()
+        # Avoid "exception was never retrieved" when nobody else is waiting
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.set_exception(_LeaderCancelled())
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            self._inflight.pop(key, None)
+
+    def is_inflight(self, key: str) -> bool:
+        """Whether a call for key is currently running."""
+        return key in self._inflight
+
+    def __len__(self) -> int:
+        return len(self._inflight)
@@ -0,0 +1,51 @@
+"""
+测试 arxiv_client 的标题相似度
+
+验证：
+1. 只多/少一个关键词的标题（Attention Is Not All You Need）低于采用阈值
+2. 关键词不同的标题（DDPM / DDIM）低于采用阈值
+3. 大小写、连字符、单复数、副标题差异的同一篇论文高于采用阈值
+"""
+
+from src.services.arxiv_client import min_title_similarity, title_similarity
+
+REQUESTED = "Attention is all you need"
+
+
+def test_extra_word_is_rejected():
+    """多一个 Not 意思完全相反，不能当作同一篇论文"""
+    threshold = min_title_similarity()
+
+    assert title_similarity(REQUESTED, "Attention Is Not All You Need") < threshold
+    assert title_similarity("Attention Is Not All You Need", REQUESTED) < threshold
+    assert title_similarity(REQUESTED, "Attention Is All You Need In Speech Separation") < threshold
+
+
+def test_different_keyword_is_rejected():
+    """Probabilistic / Implicit 只差一个词，但是两篇论文"""
+    assert title_similarity(
+        "Denoising Diffusion Probabilistic Models", "Denoising Diffusion Implicit Models"
+    ) < min_title_similarity()
+
+
+def test_same_paper_variants_are_accepted():
+    """大小写、连字符、单复数、只写主标题或副标题都能匹配"""
+    threshold = min_title_similarity()
+
+    assert title_similarity(REQUESTED, "Attention Is All You Need") == 1.0
+    assert title_similarity(
+        "Scaling long-horizon LLM agents via context folding",
+        "Scaling Long-Horizon LLM Agent via Context-Folding",
+    ) >= threshold
+    assert title_similarity(
+        "Low-rank adaptation of large language models",
+        "LoRA: Low-Rank Adaptation of Large Language Models",
+    ) >= threshold
+    assert title_similarity("LoRA", "LoRA: Low-Rank Adaptation of Large Language Models") >= threshold
+
+
+if __name__ == "__main__":
+    test_extra_word_is_rejected()
+    test_different_keyword_is_rejected()
+    test_same_paper_variants_are_accepted()
+    print("✅ 所有测试通过")
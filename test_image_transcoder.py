@@ -0,0 +1,128 @@
+"""
+测试 image_transcoder 图片转码
+
+验证：
+1. 线稿 / 图表转为 PNG，照片按 IMAGE_PHOTO_FORMAT 转为 WebP 或 JPEG
+2. 输出不超过宽度上限和字节预算
+3. 原图本就在预算内时直接使用原图
+4. 转码结果按参数缓存：参数相同复用，修改格式 / 宽度 / 预算后重新转码
+"""
+
+import os
+import random
+import tempfile
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+from src.services.image_transcoder import TranscodeSettings, transcode_image
+
+
+def line_art(path: Path, width: int = 2400, height: int = 1600) -> Path:
+    """白底黑线的图表"""
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    for x in range(0, width, 40):
+        draw.line([(x, 0), (x, height)], fill="black", width=3)
+    draw.rectangle([200, 200, 900, 700], outline="blue", width=8)
+    image.save(path, "PNG")
+    return path
+
+
+def photo(path: Path, width: int = 1800, height: int = 1200) -> Path:
+    """渐变加噪点，颜色分布接近照片"""
+    rng = random.Random(0)
+    small = Image.new("RGB", (width // 8, height // 8))
+    small.putdata([
+        (
+            (x * 255 // small.width + rng.randint(-40, 40)) % 256,
+            (y * 255 // small.height + rng.randint(-40, 40)) % 256,
+            rng.randint(0, 255),
+        )
+        for y in range(small.height)
+        for x in range(small.width)
+    ])
+    small.resize((width, height), Image.Resampling.BICUBIC).save(path, "PNG")
+    return path
+
+
+def test_line_art_becomes_png():
+    """线稿转为 PNG，宽度和大小都在限制内"""
+    with tempfile.TemporaryDirectory() as tmp:
+        source = line_art(Path(tmp) / "fig1.png")
+        settings = TranscodeSettings(max_width=1200, max_bytes=200_000)
+
+        result = transcode_image(source, settings)
+        assert result != source and result.suffix == ".png"
+        with Image.open(result) as image:
+            assert image.width <= 1200
+        assert result.stat().st_size <= 200_000
+
+
+def test_photo_format_selection():
+    """照片按设置转为 WebP 或 JPEG"""
+    with tempfile.TemporaryDirectory() as tmp:
+        source = photo(Path(tmp) / "fig2.png")
+
+        webp = transcode_image(source, TranscodeSettings(photo_format="WEBP"))
+        jpeg = transcode_image(source, TranscodeSettings(photo_format="JPEG"))
+        assert webp.suffix == ".webp"
+        assert jpeg.suffix == ".jpg"
+        with Image.open(webp) as image:
+            assert image.format == "WEBP" and image.width <= 1600
+        with Image.open(jpeg) as image:
+            assert image.format == "JPEG"
+
+
+def test_byte_budget():
+    """预算很小时依次降低质量、缩小尺寸，直到满足预算"""
+    with tempfile.TemporaryDirectory() as tmp:
+        source = photo(Path(tmp) / "fig3.png")
+        for budget in (300_000, 150_000):
+            result = transcode_image(source, TranscodeSettings(max_bytes=budget, photo_format="JPEG"))
+            assert result.stat().st_size <= budget
+        with Image.open(result) as image:
+            # 只降低质量不够时会缩小尺寸
+            assert image.width < 1600
+
+
+def test_small_image_kept():
+    """原图在预算内且不超宽时不转码"""
+    with tempfile.TemporaryDirectory() as tmp:
+        source = line_art(Path(tmp) / "small.png", width=400, height=300)
+        assert transcode_image(source, TranscodeSettings()) == source
+
+
+def test_cache_follows_settings():
+    """参数相同复用缓存；修改格式、宽度或预算后重新转码"""
+    with tempfile.TemporaryDirectory() as tmp:
+        source = photo(Path(tmp) / "fig4.png")
+        settings = TranscodeSettings(max_width=1600, max_bytes=500_000, photo_format="JPEG")
+
+        first = transcode_image(source, settings)
+        mtime = first.stat().st_mtime
+        again = transcode_image(source, TranscodeSettings(max_width=1600, max_bytes=500_000, photo_format="JPEG"))
+        assert again == first and again.stat().st_mtime == mtime
+
+        assert transcode_image(source, TranscodeSettings(photo_format="WEBP")).suffix == ".webp"
+
+        narrower = transcode_image(source, TranscodeSettings(max_width=800, photo_format="JPEG"))
+        assert narrower != first
+        with Image.open(narrower) as image:
+            assert image.width <= 800
+
+        smaller = transcode_image(source, TranscodeSettings(max_bytes=150_000, photo_format="JPEG"))
+        assert smaller != first and smaller.stat().st_size <= 150_000
+
+        # 原图更新后同一参数的旧结果不再复用
+        os.utime(source, (mtime + 10, mtime + 10))
+        assert transcode_image(source, settings).stat().st_mtime > mtime
+
+
+if __name__ == "__main__":
+    test_line_art_becomes_png()
+    test_photo_format_selection()
+    test_byte_budget()
+    test_small_image_kept()
+    test_cache_follows_settings()
+    print("✅ 所有测试通过")
@@ -0,0 +1,168 @@
+"""
+测试 job_queue 任务队列
+
+验证：
+1. 队列满时拒绝提交（Web 层据此返回 429），有空位后恢复
+2. 相同 dedupe_key 的重复提交合并到进行中的任务，结束后重新执行
+3. stage_slot 限制同一阶段的并发数
+4. 处理函数内部被取消（而不是 worker 被取消）时，任务失败但 worker 继续工作
+"""
+
+import asyncio
+from unittest import mock
+
+from src.models.job import JobStatus
+from src.services import job_queue
+from src.services.job_queue import JobQueue, JobQueueFull, stage_slot
+
+
+async def _wait_finished(job, timeout: float = 2.0):
+    async def poll():
+        while not job.is_finished:
+            await asyncio.sleep(0.01)
+    await asyncio.wait_for(poll(), timeout)
+
+
+def test_full_queue_rejects_submissions():
+    """worker 忙、排队数达到上限时 submit 抛出 JobQueueFull"""
+    async def run():
+        queue = JobQueue(max_workers=1, max_queue=2)
+        queue.start()
+        release = asyncio.Event()
+
+        async def blocked(job):
+            await release.wait()
+            return {}
+
+        try:
+            running = queue.submit("digest", {}, blocked)
+            await asyncio.sleep(0.01)
+            assert running.status == JobStatus.RUNNING
+
+            queued = [queue.submit("digest", {}, blocked) for _ in range(2)]
+            assert queue.depth == 2
+            try:
+                queue.submit("digest", {}, blocked)
+            except JobQueueFull:
+                pass
+            else:
+                raise AssertionError("expected JobQueueFull")
+
+            release.set()
+            for job in [running, *queued]:
+                await _wait_finished(job)
+            accepted = queue.submit("digest", {}, blocked)
+            await _wait_finished(accepted)
+            assert accepted.status == JobStatus.SUCCEEDED
+        finally:
+            await queue.stop()
+
+    asyncio.run(run())
+
+
+def test_full_queue_returns_429():
+    """Web 层把 JobQueueFull 转成 429"""
+    from fastapi.testclient import TestClient
+
+    import web_server
+
+    full = mock.Mock()
+    full.submit.side_effect = JobQueueFull("任务队列已满（2），请稍后重试")
+    with mock.patch.object(web_server, "job_queue", full):
+        response = TestClient(web_server.app).post("/api/chat", json={"message": "hi", "session_id": "s"})
+
+    assert response.status_code == 429
+    assert "已满" in response.json()["detail"]
+
+
+def test_duplicate_submission_attaches():
+    """进行中的相同来源只执行一次；结束后再次提交会重新执行"""
+    async def run():
+        queue = JobQueue(max_workers=2, max_queue=4)
+        queue.start()
+        release = asyncio.Event()
+        calls = []
+
+        async def handler(job):
+            calls.append(job.job_id)
+            await release.wait()
+            return {"page_url": "https://notion.so/x"}
+
+        try:
+            first = queue.submit("digest", {}, handler, dedupe_key="arxiv:2505.10831")
+            await asyncio.sleep(0.01)
+            second = queue.submit("digest", {}, handler, dedupe_key="arxiv:2505.10831")
+            other = queue.submit("digest", {}, handler, dedupe_key="arxiv:1706.03762")
+            assert second is first and first.attached == 1
+            assert other is not first
+
+            release.set()
+            await _wait_finished(first)
+            await _wait_finished(other)
+            assert len(calls) == 2
+
+            again = queue.submit("digest", {}, handler, dedupe_key="arxiv:2505.10831")
+            assert again is not first
+            await _wait_finished(again)
+            assert len(calls) == 3
+        finally:
+            await queue.stop()
+
+    asyncio.run(run())
+
+
+def test_stage_slot_limits_concurrency():
+    """同一阶段同时持有槽位的数量不超过配置值，不同阶段互不影响"""
+    async def run():
+        active = {"llm": 0, "pdf": 0}
+        peak = {"llm": 0, "pdf": 0}
+
+        async def work(stage):
+            async with stage_slot(stage):
+                active[stage] += 1
+                peak[stage] = max(peak[stage], active[stage])
+                await asyncio.sleep(0.01)
+                active[stage] -= 1
+
+        await asyncio.gather(*(work("llm") for _ in range(6)), *(work("pdf") for _ in range(6)))
+        assert peak == {"llm": 2, "pdf": 1}
+        assert stage_slot("llm") is stage_slot("llm")
+
+    with mock.patch.dict(job_queue._stage_semaphores, clear=True), \
+            mock.patch.dict("os.environ", {"JOB_LLM_CONCURRENCY": "2", "JOB_PDF_CONCURRENCY": "1"}):
+        asyncio.run(run())
+
+
+def test_inner_cancel_keeps_worker_alive():
+    """处理函数抛出 CancelledError 不会让 worker 退出"""
+    async def run():
+        queue = JobQueue(max_workers=1, max_queue=4)
+        queue.start()
+        try:
+            async def cancelled(job):
+                raise asyncio.CancelledError()
+
+            async def ok(job):
+                return {"ok": True}
+
+            first = queue.submit("digest", {}, cancelled)
+            await _wait_finished(first)
+            assert first.status == JobStatus.FAILED
+
+            second = queue.submit("digest", {}, ok)
+            await _wait_finished(second)
+            assert second.status == JobStatus.SUCCEEDED
+            assert second.result == {"ok": True}
+        finally:
+            await queue.stop()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    test_full_queue_rejects_submissions()
+    test_full_queue_returns_429()
+    test_duplicate_submission_attaches()
+    test_stage_slot_limits_concurrency()
+    test_inner_cancel_keeps_worker_alive()
+    print("✅ 所有测试通过")
@@ -0,0 +1,94 @@
+"""
+测试 notion_outbox 的防重复建页
+
+验证：
+1. 直接写入失败转入的记录（maybe_created）刷写前先查找已有页面，找到则不再建页
+2. 普通新记录直接建页，不做查找
+3. 同一内容再次以 maybe_created 入队时补上标记
+"""
+
+import asyncio
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from src.services import notion_outbox
+from src.services.notion_outbox import NotionOutbox, NotionOutboxWorker
+
+PARENT = {"database_id": "db"}
+PROPERTIES = {"Name": {"title": [{"text": {"content": "Paper"}}]}}
+BLOCKS = [{"type": "paragraph", "paragraph": {"rich_text": []}}]
+
+
+async def _flush(outbox: NotionOutbox, found_page_id):
+    """刷写一次，返回 (查找次数, 建页次数)"""
+    worker = NotionOutboxWorker(outbox)
+    find = mock.AsyncMock(return_value=found_page_id)
+    create = mock.AsyncMock(return_value="new-page")
+    with mock.patch.object(notion_outbox, "_find_created_page", find), \
+            mock.patch.object(notion_outbox, "_record_catalog_page"), \
+            mock.patch.object(worker, "_create_page", create):
+        assert await worker.flush_once() == 1
+    return find.await_count, create.await_count
+
+
+def test_fallback_entry_reuses_created_page():
+    """pages.create 超时但页面已建好：转入 outbox 后复用该页面"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp:
+            outbox = NotionOutbox(str(Path(tmp) / "outbox.db"))
+            entry = await outbox.enqueue("Paper", PARENT, PROPERTIES, BLOCKS, [], maybe_created=True)
+
+            assert await _flush(outbox, "existing-page") == (1, 0)
+            row = await outbox.get(entry["id"])
+            assert row["status"] == "done"
+            assert row["page_id"] == "existing-page"
+
+    asyncio.run(run())
+
+
+def test_fallback_entry_creates_page_when_none_found():
+    """查找不到已有页面时照常建页"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp:
+            outbox = NotionOutbox(str(Path(tmp) / "outbox.db"))
+            entry = await outbox.enqueue("Paper", PARENT, PROPERTIES, BLOCKS, [], maybe_created=True)
+
+            assert await _flush(outbox, None) == (1, 1)
+            assert (await outbox.get(entry["id"]))["page_id"] == "new-page"
+
+    asyncio.run(run())
+
+
+def test_new_entry_skips_lookup():
+    """outbox 模式的新记录从未尝试建页，不需要查找"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp:
+            outbox = NotionOutbox(str(Path(tmp) / "outbox.db"))
+            await outbox.enqueue("Paper", PARENT, PROPERTIES, BLOCKS, [])
+
+            assert await _flush(outbox, "existing-page") == (0, 1)
+
+    asyncio.run(run())
+
+
+def test_duplicate_enqueue_marks_maybe_created():
+    """已在队列中的记录被直接写入失败再次入队时补上标记"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp:
+            outbox = NotionOutbox(str(Path(tmp) / "outbox.db"))
+            await outbox.enqueue("Paper", PARENT, PROPERTIES, BLOCKS, [])
+            entry = await outbox.enqueue("Paper", PARENT, PROPERTIES, BLOCKS, [], maybe_created=True)
+            assert entry["duplicate"]
+
+            assert await _flush(outbox, "existing-page") == (1, 0)
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    test_fallback_entry_reuses_created_page()
+    test_fallback_entry_creates_page_when_none_found()
+    test_new_entry_skips_lookup()
+    test_duplicate_enqueue_marks_maybe_created()
+    print("✅ 所有测试通过")
@@ -0,0 +1,171 @@
+"""
+测试 notion_page_sync 的增量 diff
+
+验证（plan_block_diff + apply_block_diff，在内存中的假页面上执行）：
+1. 内容不变时不产生任何操作
+2. 插入：页面开头、中间、末尾，只追加新 block
+3. 删除：只删除被移除的 block，保留的 block 不动
+4. 修改：同类型文本 block 原地更新
+5. 重排：移动的 block 删除后在新位置插入，最终顺序正确
+6. 图片按 caption 比较，file_upload id 不同不视为修改
+"""
+
+import asyncio
+import itertools
+
+from src.services.notion_page_sync import apply_block_diff, block_signature, plan_block_diff
+
+
+def para(text: str, block_id: str = "") -> dict:
+    block = {"type": "paragraph", "paragraph": {"rich_text": [{"type": "text", "text": {"content": text}}]}}
+    if block_id:
+        block["id"] = block_id
+    return block
+
+
+def heading(text: str) -> dict:
+    return {"type": "heading_2", "heading_2": {"rich_text": [{"type": "text", "text": {"content": text}}]}}
+
+
+def image(caption: str, upload_id: str, block_id: str = "") -> dict:
+    block = {
+        "type": "image",
+        "image": {
+            "type": "file_upload",
+            "file_upload": {"id": upload_id},
+            "caption": [{"type": "text", "text": {"content": caption}}],
+        },
+    }
+    if block_id:
+        block["id"] = block_id
+    return block
+
+
+def page(*texts: str) -> list:
+    """页面上已有的 block（带 id）"""
+    return [para(text, f"id-{text}") for text in texts]
+
+
+class FakeBlocks:
+    """按 Notion 语义在内存中维护页面 children"""
+
+    def __init__(self, blocks: list):
+        self.page = [dict(block) for block in blocks]
+        self._ids = itertools.count(1)
+        self.children = self
+
+    def _index(self, block_id: str) -> int:
+        return next(i for i, block in enumerate(self.page) if block["id"] == block_id)
+
+    async def update(self, block_id: str, **payload):
+        block = self.page[self._index(block_id)]
+        block.update(payload)
+
+    async def delete(self, block_id: str):
+        del self.page[self._index(block_id)]
+
+    async def append(self, block_id: str, children: list, after: str = None, position: dict = None):
+        created = [dict(child, id=f"new-{next(self._ids)}") for child in children]
+        if after:
+            index = self._index(after) + 1
+        else:
+            assert position == {"type": "start"}
+            index = 0
+        self.page[index:index] = created
+        return {"results": created}
+
+
+class FakeClient:
+    def __init__(self, blocks: list):
+        self.blocks = FakeBlocks(blocks)
+
+
+def sync(old: list, new: list):
+    """规划并执行 diff，返回 (操作列表, 执行后的页面)"""
+    ops = plan_block_diff(old, new)
+    client = FakeClient(old)
+    asyncio.run(apply_block_diff(client, "page", ops))
+    assert [block_signature(b) for b in client.blocks.page] == [block_signature(b) for b in new]
+    return ops, client.blocks.page
+
+
+def kinds(ops: list) -> list:
+    return [op["op"] for op in ops]
+
+
+def test_unchanged_page_has_no_ops():
+    """内容相同（包括页面返回的额外字段）不产生操作"""
+    old = page("a", "b", "c")
+    assert plan_block_diff(old, [para("a"), para("b"), para("c")]) == []
+
+
+def test_insert_at_start():
+    """在页面开头插入：after 为 None，Notion 请求使用 position=start"""
+    ops, result = sync(page("a", "b"), [heading("title"), para("a"), para("b")])
+    assert ops == [{"op": "append", "after": None, "blocks": [heading("title")]}]
+    assert [b["id"] for b in result[1:]] == ["id-a", "id-b"]
+
+
+def test_insert_in_middle_and_end():
+    """中间和末尾插入分别接在前一个保留下来的 block 之后"""
+    ops, result = sync(page("a", "b"), [para("a"), heading("x"), para("b"), heading("y")])
+    assert kinds(ops) == ["append", "append"]
+    assert [op["after"] for op in ops] == ["id-a", "id-b"]
+    assert [b["id"] for b in result if b["id"].startswith("id-")] == ["id-a", "id-b"]
+
+
+def test_delete_only_removed_blocks():
+    """删除只针对被移除的 block"""
+    ops, result = sync(page("a", "b", "c"), [para("a"), para("c")])
+    assert ops == [{"op": "delete", "block_id": "id-b"}]
+    assert [b["id"] for b in result] == ["id-a", "id-c"]
+
+
+def test_changed_text_updates_in_place():
+    """同类型文本 block 的内容变化原地更新，不删除重建"""
+    ops, result = sync(page("a", "b", "c"), [para("a"), para("B"), para("c")])
+    assert ops == [{"op": "update", "block_id": "id-b", "block": para("B")}]
+    assert [b["id"] for b in result] == ["id-a", "id-b", "id-c"]
+
+
+def test_type_change_replaces_block():
+    """类型不同不能原地更新：删除旧 block，在原位置插入新 block"""
+    ops, result = sync(page("a", "b"), [heading("b"), para("b")])
+    assert ops == [
+        {"op": "delete", "block_id": "id-a"},
+        {"op": "append", "after": None, "blocks": [heading("b")]},
+    ]
+    assert [b["id"] for b in result][1:] == ["id-b"]
+
+
+def test_reorder():
+    """移动的 block 删除后在新位置重新插入，其余 block 保持不动"""
+    ops, result = sync(page("a", "b", "c"), [para("c"), para("a"), para("b")])
+    assert sorted(kinds(ops)) == ["append", "delete"]
+    assert [b["id"] for b in result[1:]] == ["id-a", "id-b"]
+
+    # 完全倒序：保留最长的不变序列（a），其余在开头重新插入
+    ops, result = sync(page("a", "b", "c", "d"), [para("d"), para("c"), para("b"), para("a")])
+    assert kinds(ops) == ["append", "delete", "delete", "delete"]
+    assert result[-1]["id"] == "id-a"
+
+
+def test_image_compared_by_caption():
+    """新 block 的 file_upload id 与页面上的不同，caption 相同即视为未修改"""
+    old = [para("a", "id-a"), image("Figure 1", "upload-old", "id-img")]
+    assert plan_block_diff(old, [para("a"), image("Figure 1", "pending:fig1.png")]) == []
+
+    ops = plan_block_diff(old, [para("a"), image("Figure 2", "pending:fig2.png")])
+    assert kinds(ops) == ["delete", "append"]
+
+
+if __name__ == "__main__":
+    test_unchanged_page_has_no_ops()
+    test_insert_at_start()
+    test_insert_in_middle_and_end()
+    test_delete_only_removed_blocks()
+    test_changed_text_updates_in_place()
+    test_type_change_replaces_block()
+    test_reorder()
+    test_image_compared_by_caption()
+    print("✅ 所有测试通过")
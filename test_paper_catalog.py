@@ -0,0 +1,78 @@
+"""
+测试 paper_catalog 的链接查重标识
+
+验证：
+1. 靠查询参数区分论文的链接（openreview.net/pdf?id=...）得到不同的标识
+2. 跟踪参数、参数顺序、www、末尾斜杠不影响标识
+3. 小红书链接的查询参数不进入标识
+4. 标题提取失败的占位标题不作为查重标识
+"""
+
+import tempfile
+from pathlib import Path
+
+from src.services.paper_catalog import (
+    KEY_SOURCE_URL,
+    KEY_TITLE,
+    PLACEHOLDER_TITLE,
+    PaperCatalog,
+    canonical_source_key,
+    paper_keys,
+    source_keys_from_url,
+)
+
+
+def source_url_key(url: str) -> str:
+    return dict(source_keys_from_url(url))[KEY_SOURCE_URL]
+
+
+def test_query_addressed_urls_are_distinct():
+    """?id= 不同的 OpenReview 链接是不同的论文"""
+    abc = "https://openreview.net/pdf?id=abc"
+    xyz = "https://openreview.net/pdf?id=xyz"
+
+    assert source_url_key(abc) != source_url_key(xyz)
+    assert canonical_source_key(abc) != canonical_source_key(xyz)
+
+
+def test_tracking_params_are_ignored():
+    """跟踪参数、参数顺序等不影响标识"""
+    plain = "https://openreview.net/pdf?id=abc&name=v2"
+    noisy = "https://www.openreview.net/pdf/?utm_source=x&name=v2&id=abc&share_id=1#page=3"
+
+    assert source_url_key(plain) == source_url_key(noisy)
+    assert canonical_source_key(plain) == canonical_source_key(noisy)
+
+
+def test_xhs_query_is_dropped():
+    """小红书链接只按路径 / 帖子 ID 查重"""
+    post = "https://www.xiaohongshu.com/explore/" + "a" * 24
+    shared = post + "?xsec_token=t&xsec_source=pc_share&app_platform=ios"
+
+    assert source_url_key(post) == source_url_key(shared)
+    assert canonical_source_key(post) == canonical_source_key(shared)
+
+
+def test_untitled_papers_do_not_collide():
+    """两篇标题都没提取出来的论文不能因为占位标题被当作同一篇"""
+    first = paper_keys(post_id="a" * 24, title=PLACEHOLDER_TITLE)
+    second = paper_keys(post_id="b" * 24, title=PLACEHOLDER_TITLE)
+    assert all(key_type != KEY_TITLE for key_type, _ in first + second)
+    assert all(key_type != KEY_TITLE for key_type, _ in paper_keys(title="  untitled "))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        catalog = PaperCatalog(str(Path(tmp) / "catalog.db"))
+        try:
+            catalog.record(first, title=PLACEHOLDER_TITLE, notion_page_id="page-a")
+            assert catalog.lookup(first)["notion_page_id"] == "page-a"
+            assert catalog.lookup(second) is None
+        finally:
+            catalog.close()
+
+
+if __name__ == "__main__":
+    test_query_addressed_urls_are_distinct()
+    test_tracking_params_are_ignored()
+    test_xhs_query_is_dropped()
+    test_untitled_papers_do_not_collide()
+    print("✅ 所有测试通过")
@@ -0,0 +1,118 @@
+"""
+测试 Singleflight 请求合并与工具合并键
+
+验证：
+1. 领头调用出错时，跟随者收到同一个异常
+2. 领头调用被取消时，跟随者不被取消，而是重试并拿到结果
+3. 不同的键不合并
+4. 工具合并键覆盖所有影响结果的参数（force_refresh、文件名、整理内容等）
+"""
+
+import asyncio
+
+from src.services.paper_digest import _path_key, _source_key, _title_key
+from src.utils.singleflight import Singleflight
+
+
+def test_leader_error_reaches_followers():
+    """领头调用的异常原样交给所有跟随者"""
+    async def run():
+        flight = Singleflight()
+        started = asyncio.Event()
+
+        async def fail():
+            started.set()
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        leader = asyncio.create_task(flight.do("k", fail))
+        await started.wait()
+        follower = asyncio.create_task(flight.do("k", fail))
+        results = await asyncio.gather(leader, follower, return_exceptions=True)
+
+        assert all(isinstance(r, ValueError) for r in results)
+        assert not flight.is_inflight("k")
+
+    asyncio.run(run())
+
+
+def test_leader_cancel_does_not_cancel_followers():
+    """领头调用被取消后，跟随者之一成为新的领头调用"""
+    async def run():
+        flight = Singleflight()
+        calls = []
+        started = asyncio.Event()
+
+        async def work():
+            calls.append(1)
+            started.set()
+            await asyncio.sleep(0.05)
+            return "result"
+
+        leader = asyncio.create_task(flight.do("k", work))
+        await started.wait()
+        followers = [asyncio.create_task(flight.do("k", work)) for _ in range(2)]
+        await asyncio.sleep(0)
+        leader.cancel()
+
+        results = await asyncio.gather(*followers)
+        assert leader.cancelled()
+        assert sorted(shared for _, shared in results) == [False, True]
+        assert all(result == "result" for result, _ in results)
+        assert len(calls) == 2
+
+    asyncio.run(run())
+
+
+def test_different_keys_do_not_coalesce():
+    """不同键的调用各自执行"""
+    async def run():
+        flight = Singleflight()
+        calls = []
+
+        async def work(value):
+            calls.append(value)
+            await asyncio.sleep(0.01)
+            return value
+
+        results = await asyncio.gather(
+            flight.do("a", lambda: work("a")),
+            flight.do("b", lambda: work("b")),
+        )
+        assert results == [("a", False), ("b", False)]
+        assert sorted(calls) == ["a", "b"]
+
+    asyncio.run(run())
+
+
+def test_tool_keys_cover_all_arguments():
+    """合并键只在所有参数一致时相同；标识按规范化值比较"""
+    fetch = _source_key("post_url")
+    url = "https://openreview.net/pdf?id=abc"
+    assert fetch({"post_url": url, "force_refresh": False}) == fetch(
+        {"post_url": url + "&utm_source=x", "force_refresh": False}
+    )
+    assert fetch({"post_url": url, "force_refresh": False}) != fetch({"post_url": url, "force_refresh": True})
+
+    download = _source_key("pdf_url")
+    base = {"pdf_url": url, "paper_title": "A", "force_refresh": False}
+    assert download(base) != download({**base, "paper_title": "B"})
+    assert download(base) != download({**base, "force_refresh": True})
+
+    save = _title_key()
+    base = {"paper_title": "Attention Is All You Need", "digest_content": "v1", "update_existing": True}
+    assert save(base) == save({**base, "paper_title": "attention is all you need"})
+    assert save(base) != save({**base, "digest_content": "v2"})
+    assert save(base) != save({**base, "update_existing": False})
+
+    read = _path_key("pdf_path")
+    assert read({"pdf_path": "a.pdf", "force_refresh": False}) != read({"pdf_path": "a.pdf", "force_refresh": True})
+    assert fetch({"post_url": "", "force_refresh": False}) == ""
+
+
+if __name__ == "__main__":
+    test_leader_error_reaches_followers()
+    test_leader_cancel_does_not_cancel_followers()
+    test_different_keys_do_not_coalesce()
+    test_tool_keys_cover_all_arguments()
+    print("✅ 所有测试通过")
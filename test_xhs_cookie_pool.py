@@ -0,0 +1,151 @@
+"""
+测试 xhs_cookie_pool 的 Cookie 池
+
+验证：
+1. 选择策略：round_robin 依次轮换，least_loaded 选进行中请求最少的账号
+2. 每个账号有独立的限流额度
+3. 认证失败的账号被隔离并切换到下一个账号；健康检查恢复账号，结果不确定时不改变状态
+4. 未配置 Cookie 时退回匿名访问，匿名客户端不被隔离
+"""
+
+import asyncio
+from unittest import mock
+
+from src.services import xiaohongshu
+from src.services.xhs_cookie_pool import STRATEGY_LEAST_LOADED, STRATEGY_ROUND_ROBIN, CookiePool
+from src.services.xiaohongshu import AuthenticationError, get_rate_limiter
+
+
+class FakeClient:
+    """按 Cookie 返回固定结果的客户端"""
+
+    def __init__(self, cookies: str, auth_fails: bool = False, valid=True):
+        self.cookies = cookies
+        self.auth_fails = auth_fails
+        self.valid = valid
+        self.calls = 0
+
+    async def fetch_post(self, post_url: str, use_cache: bool = True):
+        self.calls += 1
+        if self.auth_fails:
+            raise AuthenticationError("login required")
+        return self.cookies
+
+    async def validate_cookies(self):
+        return self.valid
+
+
+def _pool(cookies, clients, **kwargs) -> CookiePool:
+    pool = CookiePool(cookies, **kwargs)
+    pool._client = lambda entry: clients[entry.cookies]
+    return pool
+
+
+def test_round_robin_rotates():
+    """round_robin 按顺序轮换账号"""
+    pool = CookiePool(["a=1", "b=2", "c=3"], strategy=STRATEGY_ROUND_ROBIN)
+    picks = [pool._select(set()).cookies for _ in range(4)]
+    assert picks == ["a=1", "b=2", "c=3", "a=1"]
+
+
+def test_least_loaded_picks_idle_cookie():
+    """least_loaded 选进行中请求最少、其次累计请求最少的账号"""
+    pool = CookiePool(["a=1", "b=2", "c=3"], strategy=STRATEGY_LEAST_LOADED)
+    a, b, c = pool.entries
+    a.in_flight, b.in_flight, c.in_flight = 2, 1, 1
+    b.leases, c.leases = 5, 3
+    assert pool._select(set()) is c
+    assert pool._select({c.identity}) is b
+
+
+def test_each_cookie_has_its_own_budget():
+    """不同账号的限流器互相独立，同一账号共享同一个"""
+    with mock.patch.dict(xiaohongshu._rate_limiters, clear=True):
+        pool = CookiePool(["a=1", "b=2"])
+        first, second = (get_rate_limiter(entry.identity) for entry in pool.entries)
+        assert first is not second
+        assert get_rate_limiter(pool.entries[0].identity) is first
+
+
+def test_auth_failure_quarantines_and_fails_over():
+    """认证失败的账号被隔离，请求改用下一个账号；连续失败隔离时间加倍"""
+    async def run():
+        clients = {"a=1": FakeClient("a=1", auth_fails=True), "b=2": FakeClient("b=2")}
+        pool = _pool(["a=1", "b=2"], clients, strategy=STRATEGY_ROUND_ROBIN, quarantine_seconds=100)
+
+        assert await pool.fetch_post("url") == "b=2"
+        bad = pool.entries[0]
+        assert not bad.healthy and bad.failures == 1
+        assert pool.healthy_count == 1
+        # 隔离期间不再使用该账号
+        assert await pool.fetch_post("url") == "b=2"
+        assert clients["a=1"].calls == 1
+
+        bad.quarantined_until = 0.0
+        await pool.fetch_post("url")
+        assert bad.failures == 2
+        assert bad.status()["quarantined_for"] > 150
+
+        clients["b=2"].auth_fails = True
+        try:
+            await pool.fetch_post("url")
+        except AuthenticationError:
+            pass
+        else:
+            raise AssertionError("expected AuthenticationError when every cookie is quarantined")
+
+    asyncio.run(run())
+
+
+def test_health_check_releases_and_quarantines():
+    """健康检查：有效则恢复，明确失效则隔离，不确定（None）保持不变"""
+    async def run():
+        clients = {
+            "a=1": FakeClient("a=1", valid=True),
+            "b=2": FakeClient("b=2", valid=False),
+            "c=3": FakeClient("c=3", valid=None),
+        }
+        pool = _pool(["a=1", "b=2", "c=3"], clients)
+        a, b, c = pool.entries
+        pool.quarantine(a, "expired")
+        pool.quarantine(c, "expired")
+
+        await pool.check_health()
+        assert a.healthy and a.failures == 0
+        assert not b.healthy
+        assert not c.healthy and c.failures == 1
+
+    asyncio.run(run())
+
+
+def test_no_cookies_falls_back_to_anonymous():
+    """未配置 Cookie 时使用匿名客户端，认证失败和健康检查都不隔离它"""
+    async def run():
+        anonymous = FakeClient("", valid=False)
+        pool = _pool(["", "  "], {"": anonymous})
+        assert pool.size == 1 and pool.entries[0].anonymous
+
+        assert await pool.fetch_post("url") == ""
+        await pool.check_health()
+        assert pool.entries[0].healthy
+
+        anonymous.auth_fails = True
+        try:
+            await pool.fetch_post("url")
+        except AuthenticationError:
+            pass
+        else:
+            raise AssertionError("expected AuthenticationError from the anonymous client")
+        assert pool.entries[0].healthy
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    test_round_robin_rotates()
+    test_least_loaded_picks_idle_cookie()
+    test_each_cookie_has_its_own_budget()
+    test_auth_failure_quarantines_and_fails_over()
+    test_health_check_releases_and_quarantines()
+    test_no_cookies_falls_back_to_anonymous()
+    print("✅ 所有测试通过")
@@ -0,0 +1,86 @@
+"""
+测试 xhs_feed_crawler 的增量游标
+
+验证：
+1. 游标从旧到新推进，停在第一个处理失败的帖子之前，下次运行重试该帖子及之后的帖子
+2. 游标之前的帖子不再列出
+"""
+
+import asyncio
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+from src.services import xhs_feed_crawler
+from src.services.xhs_feed_crawler import BloggerFeedCrawler, FeedCursorStore
+
+BLOGGER = "blogger"
+PAPER_TEXT = "新论文分享 arxiv.org/abs/2505.10831"
+
+
+def note_id(ts: int) -> str:
+    """ObjectId 格式的帖子 ID，前 8 位是发布时间"""
+    return f"{ts:08x}" + "0" * 16
+
+
+class FakeClient:
+    """单页笔记列表；fail_ids 中的帖子获取失败"""
+
+    def __init__(self, timestamps, fail_ids=()):
+        self.notes = [{"note_id": note_id(ts), "title": ""} for ts in sorted(timestamps, reverse=True)]
+        self.fail_ids = set(fail_ids)
+        self.fetched = []
+
+    async def fetch_user_notes(self, user_id, cursor="", num=30):
+        return {"notes": self.notes, "cursor": "", "has_more": False}
+
+    async def fetch_post(self, url):
+        post_id = url.rsplit("/", 1)[-1].split("?")[0]
+        self.fetched.append(post_id)
+        if post_id in self.fail_ids:
+            raise RuntimeError("fetch failed")
+        return SimpleNamespace(post_id=post_id, raw_content=PAPER_TEXT)
+
+
+def _crawl(store, client):
+    catalog = mock.Mock()
+    catalog.lookup.return_value = None
+    crawler = BloggerFeedCrawler(client, store=store, concurrency=2)
+    with mock.patch.object(xhs_feed_crawler, "get_paper_catalog", return_value=catalog):
+        return asyncio.run(crawler.crawl(BLOGGER))
+
+
+def test_cursor_stops_before_first_failure():
+    """中间一个帖子失败：游标停在它之前，下次从它开始重试"""
+    timestamps = [1_700_000_001, 1_700_000_002, 1_700_000_003, 1_700_000_004, 1_700_000_005]
+    failing = note_id(1_700_000_003)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = FeedCursorStore(str(Path(tmp) / "feed.db"))
+        try:
+            client = FakeClient(timestamps, fail_ids={failing})
+            summary = _crawl(store, client)
+
+            assert [f["url"].rsplit("/", 1)[-1] for f in summary["failed"]] == [failing]
+            # 失败帖子之后的帖子已处理，但游标不能越过失败的帖子
+            assert len(summary["paper_posts"]) == 4
+            assert store.get(BLOGGER)["last_post_id"] == note_id(1_700_000_002)
+
+            retry = FakeClient(timestamps)
+            summary = _crawl(store, retry)
+            assert sorted(retry.fetched) == [note_id(ts) for ts in timestamps[2:]]
+            assert summary["failed"] == []
+            assert store.get(BLOGGER)["last_post_id"] == note_id(1_700_000_005)
+
+            # 没有新帖子时不再获取任何帖子
+            idle = FakeClient(timestamps)
+            assert _crawl(store, idle)["new_posts"] == 0
+            assert idle.fetched == []
+        finally:
+            store.close()
+
+
+if __name__ == "__main__":
+    test_cursor_stops_before_first_failure()
+    print("✅ 所有测试通过")
@@ -0,0 +1,156 @@
+"""
+测试小红书帖子缓存
+
+验证（mock transport，不访问网络）：
+1. TTL 内直接返回缓存，不发请求
+2. 过期后带 If-None-Match / If-Modified-Since 条件请求；304 时复用缓存并刷新 TTL，不重新解析
+3. 过期后返回 200 时重新解析并更新缓存与校验头
+4. use_cache=False 时忽略缓存
+"""
+
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+
+import httpx
+
+from src.services.xhs_post_cache import PostCache
+from src.services.xiaohongshu import RateLimiter, XiaohongshuClient
+
+POST_ID = "5f9e4a2b000000000101a1b2"
+POST_URL = f"https://www.xiaohongshu.com/explore/{POST_ID}"
+
+
+class FakeSite:
+    """按顺序返回预设响应，并记录收到的请求"""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        status, headers = self.responses.pop(0)
+        return httpx.Response(status, headers=headers, text="<html></html>" if status == 200 else "")
+
+
+def _client(cache: PostCache, site: FakeSite) -> XiaohongshuClient:
+    client = XiaohongshuClient("a1=x", rate_limiter=RateLimiter(100, 1), post_cache=cache)
+    client.client = httpx.AsyncClient(transport=httpx.MockTransport(site), follow_redirects=True)
+    versions = iter(range(1, 100))
+    client._parse_response = mock.AsyncMock(side_effect=lambda text, url, post_id: {
+        "post_id": post_id,
+        "post_url": url,
+        "blogger_id": "467792329",
+        "raw_content": f"version {next(versions)}",
+    })
+    return client
+
+
+def _expire(cache: PostCache) -> None:
+    """把缓存记录的确认时间拨回到 TTL 之前"""
+    with cache._lock:
+        cache._conn.execute("UPDATE xhs_posts SET checked_at = ?", (time.time() - cache.ttl - 1,))
+        cache._conn.commit()
+
+
+def test_fresh_entry_skips_request():
+    """TTL 内第二次获取不发请求"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = PostCache(str(Path(tmp) / "posts.db"), ttl=3600)
+            site = FakeSite([(200, {"etag": '"v1"'})])
+            client = _client(cache, site)
+            try:
+                first = await client.fetch_post(POST_URL)
+                second = await client.fetch_post(POST_URL)
+                assert second.raw_content == first.raw_content == "version 1"
+                assert len(site.requests) == 1
+            finally:
+                await client.close()
+                cache.close()
+
+    asyncio.run(run())
+
+
+def test_stale_entry_revalidates_with_304():
+    """过期后条件请求；304 复用缓存并刷新 TTL"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = PostCache(str(Path(tmp) / "posts.db"), ttl=3600)
+            last_modified = "Mon, 19 Oct 2026 00:00:00 GMT"
+            site = FakeSite([(200, {"etag": '"v1"', "last-modified": last_modified}), (304, {})])
+            client = _client(cache, site)
+            try:
+                await client.fetch_post(POST_URL)
+                _expire(cache)
+
+                post = await client.fetch_post(POST_URL)
+                assert post.raw_content == "version 1"
+                assert client._parse_response.await_count == 1
+                conditional = site.requests[1].headers
+                assert conditional["if-none-match"] == '"v1"'
+                assert conditional["if-modified-since"] == last_modified
+
+                # 304 之后重新计算 TTL
+                assert cache.is_fresh(cache.get(POST_ID))
+                await client.fetch_post(POST_URL)
+                assert len(site.requests) == 2
+            finally:
+                await client.close()
+                cache.close()
+
+    asyncio.run(run())
+
+
+def test_stale_entry_refetched_on_200():
+    """过期后服务器返回 200：重新解析并保存新的校验头"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = PostCache(str(Path(tmp) / "posts.db"), ttl=3600)
+            site = FakeSite([(200, {"etag": '"v1"'}), (200, {"etag": '"v2"'})])
+            client = _client(cache, site)
+            try:
+                await client.fetch_post(POST_URL)
+                _expire(cache)
+
+                post = await client.fetch_post(POST_URL)
+                assert post.raw_content == "version 2"
+                assert site.requests[1].headers["if-none-match"] == '"v1"'
+                assert cache.get(POST_ID).etag == '"v2"'
+                assert cache.get(POST_ID).post.raw_content == "version 2"
+            finally:
+                await client.close()
+                cache.close()
+
+    asyncio.run(run())
+
+
+def test_use_cache_false_bypasses_cache():
+    """use_cache=False 时不读缓存、不发条件请求，结果仍写回缓存"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = PostCache(str(Path(tmp) / "posts.db"), ttl=3600)
+            site = FakeSite([(200, {"etag": '"v1"'}), (200, {"etag": '"v2"'})])
+            client = _client(cache, site)
+            try:
+                await client.fetch_post(POST_URL)
+                post = await client.fetch_post(POST_URL, use_cache=False)
+                assert post.raw_content == "version 2"
+                assert "if-none-match" not in site.requests[1].headers
+                assert cache.get(POST_ID).post.raw_content == "version 2"
+            finally:
+                await client.close()
+                cache.close()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    test_fresh_entry_skips_request()
+    test_stale_entry_revalidates_with_304()
+    test_stale_entry_refetched_on_200()
+    test_use_cache_false_bypasses_cache()
+    print("✅ 所有测试通过")
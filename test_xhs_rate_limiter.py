@@ -0,0 +1,102 @@
+"""
+测试小红书请求限流器
+
+验证：
+1. 滑动窗口：窗口内最多 max_requests 次，超出后等待到最早一次请求移出窗口
+2. SqliteRateLimiter：指向同一个数据库文件的多个实例共享同一额度，不同 key 互不影响
+"""
+
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from src.services.xiaohongshu import RateLimiter, SqliteRateLimiter
+
+
+def test_sliding_window_limit():
+    """窗口满时返回需要等待的时间，acquire 等待后放行"""
+    async def run():
+        limiter = RateLimiter(max_requests=3, period=0.3)
+        for _ in range(3):
+            assert await limiter._try_acquire() == 0.0
+
+        wait_time = await limiter._try_acquire()
+        assert 0 < wait_time <= 0.3
+
+        start = time.monotonic()
+        await limiter.acquire()
+        assert time.monotonic() - start >= wait_time - 0.05
+        # 最早的请求已移出窗口，放行的那次请求占用新窗口中的一个名额
+        assert await limiter._try_acquire() == 0.0
+        assert await limiter._try_acquire() == 0.0
+        assert await limiter._try_acquire() > 0
+
+    asyncio.run(run())
+
+
+def test_concurrent_callers_share_window():
+    """并发调用方不会同时拿到超出窗口的名额"""
+    async def run():
+        limiter = RateLimiter(max_requests=2, period=0.2)
+        start = time.monotonic()
+        await asyncio.gather(*(limiter.acquire() for _ in range(4)))
+        # 第 3、4 次请求必须等第一批移出窗口
+        assert time.monotonic() - start >= 0.15
+
+    asyncio.run(run())
+
+
+def test_sqlite_limiter_shared_across_instances():
+    """两个实例（相当于两个进程）共享同一 key 的额度"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = str(Path(tmp) / "rate_limit.db")
+            first = SqliteRateLimiter(db_path, "cookie-a", max_requests=3, period=60)
+            second = SqliteRateLimiter(db_path, "cookie-a", max_requests=3, period=60)
+            other = SqliteRateLimiter(db_path, "cookie-b", max_requests=3, period=60)
+            try:
+                assert await first._try_acquire() == 0.0
+                assert await second._try_acquire() == 0.0
+                assert await first._try_acquire() == 0.0
+                assert await second._try_acquire() > 0
+                assert await first._try_acquire() > 0
+
+                assert await other._try_acquire() == 0.0
+            finally:
+                for limiter in (first, second, other):
+                    limiter.close()
+
+            # 重新打开数据库，窗口仍然保留
+            reopened = SqliteRateLimiter(db_path, "cookie-a", max_requests=3, period=60)
+            try:
+                assert await reopened._try_acquire() > 0
+            finally:
+                reopened.close()
+
+    asyncio.run(run())
+
+
+def test_sqlite_limiter_window_expires():
+    """窗口过期后名额恢复"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp:
+            limiter = SqliteRateLimiter(str(Path(tmp) / "rate_limit.db"), "k", max_requests=1, period=0.2)
+            try:
+                assert await limiter._try_acquire() == 0.0
+                wait_time = await limiter._try_acquire()
+                assert 0 < wait_time <= 0.2
+                await asyncio.sleep(wait_time + 0.01)
+                assert await limiter._try_acquire() == 0.0
+            finally:
+                limiter.close()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    test_sliding_window_limit()
+    test_concurrent_callers_share_window()
+    test_sqlite_limiter_shared_across_instances()
+    test_sqlite_limiter_window_expires()
+    print("✅ 所有测试通过")
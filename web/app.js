@@ -1,7 +1,21 @@
+// 会话 ID：每个标签页独立，后端只把本会话的日志和消息推送到这里
+function getSessionId() {
+    let sessionId = sessionStorage.getItem('paper-agent-session-id');
+    if (!sessionId) {
+        sessionId = (window.crypto && crypto.randomUUID)
+            ? crypto.randomUUID()
+            : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+        sessionStorage.setItem('paper-agent-session-id', sessionId);
+    }
+    return sessionId;
+}
+
 // 应用状态
 const state = {
     processing: false,
     ws: null,
+    sessionId: getSessionId(),
+    lastLogSeq: 0,
     messages: []
 };
 
@@ -69,7 +83,7 @@ async function fetchModelInfo() {
 async function connectWebSocket() {
     return new Promise((resolve, reject) => {
         const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
-        const wsUrl = `${protocol}//${window.location.host}/ws`;
+        const wsUrl = `${protocol}//${window.location.host}/ws?session_id=${encodeURIComponent(state.sessionId)}&last_log_seq=${state.lastLogSeq}`;
 
         state.ws = new WebSocket(wsUrl);
 
@@ -110,6 +124,11 @@ function handleWebSocketMessage(data) {
             addLogMessage(message, level || 'info');
             break;
 
+        case 'log_batch':
+            // 批量日志（重连时的补发批次只显示尚未收到的部分）
+            addLogBatch(data.entries || [], data.replay);
+            break;
+
         case 'assistant_message':
             addMessage('assistant', message);
             break;
@@ -179,7 +198,7 @@ async function handleSend() {
             headers: {
                 'Content-Type': 'application/json'
             },
-            body: JSON.stringify({ message })
+            body: JSON.stringify({ message, session_id: state.sessionId })
         });
 
         if (!response.ok) {
@@ -200,7 +219,7 @@ async function handleSend() {
 }
 
 // 添加日志消息
-function addLogMessage(message, level = 'info') {
+function addLogMessage(message, level = 'info', scroll = true) {
     // 获取或创建最后一个 assistant 消息的日志容器
     let logContainer = document.getElementById('current-log-container');
 
@@ -228,7 +247,16 @@ function addLogMessage(message, level = 'info') {
         logEntry.className = `log-entry log-${level}`;
         logEntry.textContent = message;
         logContainer.appendChild(logEntry);
-        scrollToBottom();
+        if (scroll) scrollToBottom();
+    }
+}
+
+// 批量添加日志消息
+function addLogBatch(entries, replay = false) {
+    for (const entry of entries) {
+        if (replay && entry.seq <= state.lastLogSeq) continue;
+        state.lastLogSeq = entry.seq;
+        addLogMessage(entry.message, entry.level || 'info', false);
     }
 }
 
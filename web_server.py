@@ -5,19 +5,36 @@ Web 服务器 - 为论文整理 Agent 提供 Web 界面
 
 import asyncio
 import os
+import threading
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response
 from pydantic import BaseModel, HttpUrl
-from typing import Optional
+from typing import Optional, Sequence
 import logging
 from pathlib import Path
 
 # 导入现有的 Agent 系统
-from src.services.paper_digest import digest_agent, _init_digest_globals
-from paper_agents import paper_agent, init_paper_agents
+from src.services.paper_digest import get_digest_agent, _init_digest_globals, DigestRunContext
+from src.services.notion_gateway import warm_up_notion_gateway, close_notion_gateway
+from src.services.notion_outbox import start_notion_outbox_worker, stop_notion_outbox_worker
+from src.services.xiaohongshu import close_xiaohongshu_clients
+from src.services.xhs_cookie_pool import close_cookie_pool, get_cookie_pool, start_cookie_health_checks
+from src.services.xhs_feed_crawler import BloggerFeedCrawler
+from src.services.xhs_links import close_short_link_resolver, is_short_link, resolve_post_url
+from src.services.arxiv_client import close_arxiv_client
+from src.services.paper_catalog import canonical_source_key
+from src.services.digest_pipeline import classify_url, run_digest_pipeline
+from src.services.conversation_store import ConversationStore, create_conversation_store, summarize_history
+from src.services.job_queue import get_job_queue, JobQueueFull
+from src.models.job import Job, JobEvent
+from src.utils.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, render_metrics
+from paper_agents import get_paper_agent, init_paper_agents
 from agents import Runner
-from init_model import init_models
+from init_model import init_models, get_factory
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -25,36 +42,63 @@ logger = logging.getLogger(__name__)
 
 # URL 类型检测函数
 def check_url_type(url: str) -> str:
-    """检测 URL 类型"""
-    url_lower = url.lower()
-
-    if 'xiaohongshu.com' in url_lower or 'xhslink.com' in url_lower:
-        return "xiaohongshu"
-    elif 'arxiv.org' in url_lower:
-        return "arxiv"
-    elif url_lower.endswith('.pdf') or 'pdf' in url_lower:
-        return "pdf"
-    else:
-        return "unknown"
+    """检测 URL 类型（与整理流水线的 classify 阶段一致）"""
+    return classify_url(url)
+
+def init_agents():
+    """初始化模型与 Agents（在服务启动时执行，导入本模块不触发模型构建）"""
+    global conversation_store
+
+    logger.info("初始化模型...")
+    factory = init_models()
+    openai_client = factory.get_client()
+    logger.info(f"使用模型提供商: {factory.provider}")
+
+    logger.info("初始化 Paper Agents...")
+    init_paper_agents(openai_client)
+    _init_digest_globals(openai_client)
+    paper_agent = get_paper_agent()
+    digest_agent = get_digest_agent()
+    logger.info("✅ Agents 初始化完成")
+
+    # 对话上下文管理：有界 LRU，空闲会话落盘，历史中的大段工具输出自动截断
+    conversation_store = create_conversation_store(paper_agent, agents={digest_agent.name: digest_agent})
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动时初始化模型并预热共享连接，退出时统一关闭"""
+    init_agents()
+    await warm_up_notion_gateway()
+    start_notion_outbox_worker()
+    start_cookie_health_checks()
+    manager.start()
+    install_log_capture()
+    job_queue.start()
+    try:
+        yield
+    finally:
+        await job_queue.stop()
+        uninstall_log_capture()
+        await manager.stop()
+        conversation_store.persist_all()
+        await stop_notion_outbox_worker()
+        await close_cookie_pool()
+        await close_xiaohongshu_clients()
+        await close_short_link_resolver()
+        await close_arxiv_client()
+        await close_notion_gateway()
+        logger.info("✅ Notion 连接池已关闭")
 
 # 初始化 FastAPI
-app = FastAPI(title="Paper Notion Agent", description="自动整理论文和小红书笔记到 Notion")
+app = FastAPI(
+    title="Paper Notion Agent",
+    description="自动整理论文和小红书笔记到 Notion",
+    lifespan=lifespan,
+)
 
 # 挂载静态文件
 app.mount("/static", StaticFiles(directory="web"), name="static")
 
-# 初始化模型
-logger.info("初始化模型...")
-factory = init_models()
-openai_client = factory.get_client()
-logger.info(f"使用模型提供商: {factory.provider}")
-
-# 初始化 agents
-logger.info("初始化 Paper Agents...")
-init_paper_agents(openai_client)
-_init_digest_globals(openai_client)
-logger.info("✅ Agents 初始化完成")
-
 # 全局日志广播函数（用于 structlog processor）
 _global_log_broadcast_func = None
 
@@ -103,17 +147,8 @@ def websocket_broadcast_processor(logger, method_name, event_dict):
     else:
         log_type = 'info'
 
-    # Schedule broadcast in the event loop
-    try:
-        loop = asyncio.get_event_loop()
-        if loop.is_running():
-            loop.create_task(broadcast_func({
-                "type": "log",
-                "level": log_type,
-                "message": formatted_msg
-            }))
-    except RuntimeError:
-        pass
+    # Buffer for the session that owns the current request (sent in batches)
+    broadcast_func(log_type, formatted_msg)
 
     return event_dict
 
@@ -143,84 +178,329 @@ structlog.configure(
 
 logger.info("✅ Structlog WebSocket 广播配置完成")
 
-# 对话上下文管理
-class ConversationManager:
-    def __init__(self):
-        self.sessions = {}  # session_id -> {"agent": agent, "input_items": []}
+# 对话上下文管理（启动时由 init_agents 创建）
+conversation_store: Optional[ConversationStore] = None
 
-    def get_session(self, session_id: str = "default"):
-        if session_id not in self.sessions:
-            self.sessions[session_id] = {
-                "agent": paper_agent,
-                "input_items": []
-            }
-        return self.sessions[session_id]
+# WebSocket 连接管理
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "10"))
+# 日志批量推送：每 N 毫秒或攒满 M 条发送一次 log_batch；每个会话保留最近若干条供重连补发
+WS_LOG_FLUSH_INTERVAL_MS = int(os.getenv("WS_LOG_FLUSH_INTERVAL_MS", "100"))
+WS_LOG_BATCH_SIZE = int(os.getenv("WS_LOG_BATCH_SIZE", "50"))
+WS_LOG_REPLAY_SIZE = int(os.getenv("WS_LOG_REPLAY_SIZE", "200"))
+WS_LOG_MAX_SESSIONS = 256
 
-    def reset_session(self, session_id: str = "default"):
-        if session_id in self.sessions:
-            del self.sessions[session_id]
+# 当前请求所属的会话（由 process_chat / process_digest 设置，日志据此路由）；
+# 整理任务绑定的是任务的订阅者列表本身，之后合并进来的重复提交者也能收到日志
+current_session_ids: ContextVar[Sequence[str]] = ContextVar("current_session_ids", default=())
 
-conversation_manager = ConversationManager()
 
-# WebSocket 连接管理
-class ConnectionManager:
+class ClientConnection:
+    """
+    单个 WebSocket 连接：有界发送队列 + 独立写协程
+
+    生产者只做非阻塞入队，慢客户端不会拖慢其他连接：
+    - 同一任务的 job_progress 消息在队列中合并，只保留最新一条
+    - 队列满时优先丢弃最旧的日志消息
+    - 队列中全是关键消息仍然放不下，或单次发送超时，则断开该连接（客户端会自动重连）
+    """
+
+    def __init__(self, websocket: WebSocket, session_id: str, max_pending: int = WS_SEND_QUEUE_SIZE):
+        self.websocket = websocket
+        self.session_id = session_id
+        self.max_pending = max_pending
+        self.dropped = 0
+        self.closed = False
+        self._pending: deque = deque()
+        self._wakeup = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._writer = asyncio.create_task(self._write_loop(), name=f"ws-writer-{self.session_id}")
+
+    async def close(self):
+        self.closed = True
+        if self._writer is not None:
+            self._writer.cancel()
+            await asyncio.gather(self._writer, return_exceptions=True)
+
+    def enqueue(self, message) -> bool:
+        """非阻塞入队；返回 False 表示该连接已关闭或消费过慢"""
+        if self.closed:
+            return False
+
+        if isinstance(message, dict) and message.get("type") == "job_progress":
+            for i, pending in enumerate(self._pending):
+                if isinstance(pending, dict) and pending.get("type") == "job_progress" \
+                        and pending.get("job_id") == message.get("job_id"):
+                    self._pending[i] = message
+                    return True
+
+        if len(self._pending) >= self.max_pending:
+            oldest_log = next(
+                (i for i, pending in enumerate(self._pending)
+                 if isinstance(pending, dict) and pending.get("type") in ("log", "log_batch")),
+                None
+            )
+            if oldest_log is None:
+                return False
+            del self._pending[oldest_log]
+            self.dropped += 1
+
+        self._pending.append(message)
+        self._wakeup.set()
+        return True
+
+    async def _write_loop(self):
+        try:
+            while True:
+                while not self._pending:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                message = self._pending.popleft()
+                if isinstance(message, str):
+                    await asyncio.wait_for(self.websocket.send_text(message), WS_SEND_TIMEOUT)
+                else:
+                    await asyncio.wait_for(self.websocket.send_json(message), WS_SEND_TIMEOUT)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"WebSocket 发送失败，关闭连接 (session={self.session_id}): {e!r}")
+            self.closed = True
+            try:
+                await self.websocket.close()
+            except Exception:
+                pass
+
+
+class SessionLog:
+    """单个会话的日志缓冲：待发送批次 + 最近日志环形缓冲（带递增序号）"""
+
     def __init__(self):
-        self.active_connections: list[WebSocket] = []
+        self.seq = 0
+        self.pending: list[dict] = []
+        self.history: deque = deque(maxlen=WS_LOG_REPLAY_SIZE)
+
 
-    async def connect(self, websocket: WebSocket):
+class ConnectionManager:
+    """
+    按会话管理 WebSocket 连接，消息只发送给发起请求的会话
+
+    日志不逐条发送：send_log 只写入会话缓冲，由后台 flusher 每 WS_LOG_FLUSH_INTERVAL_MS
+    毫秒（或攒满 WS_LOG_BATCH_SIZE 条时立即）合并成一个 log_batch 消息发送。
+    其他消息发送前会先冲刷该会话的待发日志，保证前端看到的顺序不变。
+    """
+
+    def __init__(self):
+        self.sessions: dict[str, set[ClientConnection]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._logs: "OrderedDict[str, SessionLog]" = OrderedDict()
+        self._logs_lock = threading.Lock()
+        self._flusher: Optional[asyncio.Task] = None
+
+    @property
+    def connection_count(self) -> int:
+        return sum(len(connections) for connections in self.sessions.values())
+
+    # ----- 生命周期 -----
+
+    def start(self):
+        """启动日志 flusher（需在事件循环中调用）"""
+        self._loop = asyncio.get_running_loop()
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_loop(), name="ws-log-flusher")
+
+    async def stop(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        for connections in list(self.sessions.values()):
+            for connection in list(connections):
+                await self.disconnect(connection)
+
+    # ----- 连接 -----
+
+    async def connect(self, websocket: WebSocket, session_id: str, last_log_seq: int = 0) -> ClientConnection:
+        """
+        建立连接；重连时补发该会话 last_log_seq 之后的日志
+
+        Args:
+            websocket: WebSocket 连接
+            session_id: 会话 ID
+            last_log_seq: 客户端已收到的最后一条日志序号
+        """
         await websocket.accept()
-        self.active_connections.append(websocket)
-        logger.info(f"WebSocket 连接建立，当前连接数: {len(self.active_connections)}")
+        self._loop = asyncio.get_running_loop()
+        connection = ClientConnection(websocket, session_id)
+        connection.start()
+        self.sessions.setdefault(session_id, set()).add(connection)
+
+        missed = self.replay_logs(session_id, last_log_seq)
+        if missed:
+            connection.enqueue({"type": "log_batch", "entries": missed, "replay": True})
+
+        logger.info(f"WebSocket 连接建立 (session={session_id})，当前连接数: {self.connection_count}")
+        return connection
+
+    async def disconnect(self, connection: ClientConnection):
+        connections = self.sessions.get(connection.session_id)
+        if connections is not None:
+            connections.discard(connection)
+            if not connections:
+                del self.sessions[connection.session_id]
+        await connection.close()
+        logger.info(f"WebSocket 连接断开 (session={connection.session_id})，当前连接数: {self.connection_count}")
+
+    # ----- 消息 -----
+
+    def send_to_session(self, session_id: Optional[str], message):
+        """
+        发送消息到指定会话的所有连接（非阻塞，可在任意线程调用）
+
+        没有会话或会话无连接时直接丢弃。
+        """
+        if not session_id:
+            return
+        self._call_in_loop(self._send, session_id, message)
+
+    def send_to_sessions(self, session_ids, message):
+        for session_id in session_ids:
+            self.send_to_session(session_id, message)
+
+    def send_log(self, level: str, message: str, session_id: Optional[str] = None):
+        """
+        缓冲一条日志，稍后批量发送（非阻塞，可在任意线程调用）
+
+        Args:
+            level: 前端日志级别（info / warning / error）
+            message: 日志文本
+            session_id: 目标会话，默认为当前请求所属的全部会话；都没有时丢弃
+        """
+        session_ids = [session_id] if session_id else list(current_session_ids.get())
+        for target in session_ids:
+            self._buffer_log(target, level, message)
+
+    def _buffer_log(self, session_id: str, level: str, message: str):
+        with self._logs_lock:
+            log = self._logs.get(session_id)
+            if log is None:
+                log = self._logs[session_id] = SessionLog()
+                if len(self._logs) > WS_LOG_MAX_SESSIONS:
+                    self._logs.popitem(last=False)
+            else:
+                self._logs.move_to_end(session_id)
+
+            log.seq += 1
+            entry = {"seq": log.seq, "level": level, "message": message}
+            log.pending.append(entry)
+            log.history.append(entry)
+            batch_full = len(log.pending) >= WS_LOG_BATCH_SIZE
+
+        if batch_full:
+            self._call_in_loop(self.flush_logs, session_id)
+
+    def replay_logs(self, session_id: str, after_seq: int = 0) -> list[dict]:
+        """返回会话环形缓冲中序号大于 after_seq 的日志"""
+        with self._logs_lock:
+            log = self._logs.get(session_id)
+            if log is None:
+                return []
+            # 服务重启后序号从头开始，客户端记录的序号失效，补发全部
+            if after_seq > log.seq:
+                after_seq = 0
+            return [entry for entry in log.history if entry["seq"] > after_seq]
+
+    def flush_logs(self, session_id: str):
+        """将会话的待发日志合并为一个 log_batch 消息（在事件循环中调用）"""
+        with self._logs_lock:
+            log = self._logs.get(session_id)
+            if log is None or not log.pending:
+                return
+            entries, log.pending = log.pending, []
+        self._deliver(session_id, {"type": "log_batch", "entries": entries})
 
-    def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-        logger.info(f"WebSocket 连接断开，当前连接数: {len(self.active_connections)}")
+    def flush_all_logs(self):
+        with self._logs_lock:
+            session_ids = [session_id for session_id, log in self._logs.items() if log.pending]
+        for session_id in session_ids:
+            self.flush_logs(session_id)
 
-    async def send_message(self, message: dict, websocket: WebSocket):
-        """发送消息到指定连接"""
-        try:
-            await websocket.send_json(message)
-        except Exception as e:
-            logger.error(f"发送消息失败: {e}")
-            self.disconnect(websocket)
+    # ----- 内部 -----
+
+    async def _flush_loop(self):
+        interval = max(WS_LOG_FLUSH_INTERVAL_MS, 10) / 1000
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.flush_all_logs()
+            except Exception as e:
+                logger.warning(f"日志批量推送失败: {e!r}")
 
-    async def broadcast(self, message: dict):
-        """广播消息到所有连接"""
-        for connection in self.active_connections[:]:
-            await self.send_message(message, connection)
+    def _call_in_loop(self, func, *args):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # 工作线程（如 asyncio.to_thread 中的 PDF 提取）里的调用：切回事件循环执行
+            if self._loop is not None and not self._loop.is_closed():
+                self._loop.call_soon_threadsafe(func, *args)
+            return
+        func(*args)
+
+    def _send(self, session_id: str, message):
+        # 先发送此前缓冲的日志，保持与其他消息的相对顺序
+        self.flush_logs(session_id)
+        self._deliver(session_id, message)
+
+    def _deliver(self, session_id: str, message):
+        for connection in list(self.sessions.get(session_id, ())):
+            if not connection.enqueue(message):
+                logger.warning(
+                    f"WebSocket 客户端消费过慢，断开连接 (session={session_id}, dropped={connection.dropped})"
+                )
+                asyncio.get_running_loop().create_task(self.disconnect(connection))
 
 manager = ConnectionManager()
 
+def job_sessions(job: Job) -> list[str]:
+    """订阅该任务的会话（提交者 + 合并进来的重复提交者）"""
+    return job.payload.get("session_ids", [])
+
+# 任务队列：状态/阶段事件推送给提交任务的会话
+def broadcast_job_update(job: Job, event: Optional[JobEvent] = None) -> None:
+    """任务状态变化或阶段事件 -> WebSocket job_progress 消息"""
+    message = {
+        "type": "job_progress",
+        "job_id": job.job_id,
+        "kind": job.kind,
+        "status": job.status.value,
+        "stage": job.stage,
+        "progress": job.progress
+    }
+    if event is not None:
+        message["event"] = {"stage": event.stage, "status": event.status}
+    manager.send_to_sessions(job_sessions(job), message)
+
+job_queue = get_job_queue()
+job_queue.listener = broadcast_job_update
+
 # 请求模型
 class DigestRequest(BaseModel):
     url: str
+    session_id: str = "default"
 
 class ChatRequest(BaseModel):
     message: str
+    session_id: str = "default"
+
+class CrawlRequest(BaseModel):
+    session_id: str = "default"
 
 class DigestResponse(BaseModel):
     success: bool
     message: str
     task_id: Optional[str] = None
-
-# 自定义日志处理器，用于将日志发送到 WebSocket
-class WebSocketLogHandler(logging.Handler):
-    def __init__(self, websocket: WebSocket):
-        super().__init__()
-        self.websocket = websocket
-        self.manager = manager
-
-    def emit(self, record):
-        try:
-            log_entry = self.format(record)
-            # 异步发送日志
-            asyncio.create_task(self.manager.send_message({
-                "type": "log",
-                "message": log_entry
-            }, self.websocket))
-        except Exception:
-            pass
+    coalesced: bool = False
 
 @app.get("/")
 async def root():
@@ -238,18 +518,23 @@ async def get_js():
     return FileResponse("web/app.js", media_type="application/javascript")
 
 @app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    """WebSocket 连接端点"""
-    await manager.connect(websocket)
+async def websocket_endpoint(websocket: WebSocket, session_id: str = "default", last_log_seq: int = 0):
+    """
+    WebSocket 连接端点
+
+    /ws?session_id=...&last_log_seq=...：只接收该会话的消息，重连时补发 last_log_seq 之后的日志
+    """
+    connection = await manager.connect(websocket, session_id, last_log_seq)
     try:
         # 保持连接，接收心跳
         while True:
             data = await websocket.receive_text()
             if data == "ping":
-                await websocket.send_text("pong")
+                connection.enqueue("pong")
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
         logger.info("客户端断开连接")
+    finally:
+        await manager.disconnect(connection)
 
 @app.post("/api/chat")
 async def chat(request: ChatRequest):
@@ -263,10 +548,17 @@ async def chat(request: ChatRequest):
 
     logger.info(f"收到聊天消息: {message}")
 
-    # 在后台启动处理任务
-    asyncio.create_task(process_chat(message))
+    # 提交到任务队列（队列满时返回 429）
+    try:
+        job = job_queue.submit(
+            "chat",
+            {"message": message, "session_id": request.session_id, "session_ids": [request.session_id]},
+            lambda job: process_chat(job.payload["message"], job.payload["session_id"])
+        )
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
 
-    return {"success": True, "message": "消息已提交"}
+    return {"success": True, "message": "消息已提交", "job_id": job.job_id}
 
 @app.post("/api/digest")
 async def create_digest(request: DigestRequest):
@@ -290,15 +582,82 @@ async def create_digest(request: DigestRequest):
         logger.error(f"URL 验证失败: {e}")
         raise HTTPException(status_code=400, detail=f"无效的 URL: {str(e)}")
 
-    # 在后台启动处理任务
-    asyncio.create_task(process_digest(url))
+    if url_type == "unknown":
+        raise HTTPException(status_code=400, detail="无法识别的链接类型，请提供小红书、arXiv 或 PDF 链接")
 
+    # 小红书短链先解析为规范链接，使不同分享链接指向同一帖子时能合并任务
+    if is_short_link(url):
+        try:
+            url = await resolve_post_url(url)
+        except Exception as e:
+            logger.warning(f"短链解析失败，交由任务重试: {e}")
+
+    # 提交到任务队列（队列满时返回 429）；同一来源的并发请求合并到进行中的任务
+    try:
+        job = job_queue.submit(
+            "digest",
+            {"url": url, "url_type": url_type, "session_ids": [request.session_id]},
+            process_digest,
+            dedupe_key=canonical_source_key(url) or None
+        )
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+    coalesced = job.attached > 0
+    if request.session_id not in job_sessions(job):
+        # 合并到他人任务时也订阅其进度与结果
+        job_sessions(job).append(request.session_id)
     return DigestResponse(
         success=True,
-        message="任务已提交，正在处理...",
-        task_id=None  # 可以后续添加任务 ID 跟踪
+        message="相同论文正在处理中，已合并到进行中的任务" if coalesced else "任务已提交，正在处理...",
+        task_id=job.job_id,
+        coalesced=coalesced
     )
 
+@app.post("/api/bloggers/{blogger_id}/crawl")
+async def crawl_blogger(blogger_id: str, request: Optional[CrawlRequest] = None):
+    """
+    抓取博主新帖子
+
+    只处理上次抓取之后发布的帖子；其中的论文分享帖各自提交为整理任务
+    """
+    request = request or CrawlRequest()
+    blogger_id = blogger_id.strip()
+    if not blogger_id:
+        raise HTTPException(status_code=400, detail="博主 ID 不能为空")
+
+    try:
+        job = job_queue.submit(
+            "crawl",
+            {"blogger_id": blogger_id, "session_ids": [request.session_id]},
+            process_crawl,
+            dedupe_key=f"crawl:{blogger_id}"
+        )
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+    if request.session_id not in job_sessions(job):
+        job_sessions(job).append(request.session_id)
+    return {"success": True, "message": "抓取任务已提交", "job_id": job.job_id, "coalesced": job.attached > 0}
+
+@app.get("/api/jobs")
+async def list_jobs(status: Optional[str] = None, kind: Optional[str] = None, limit: int = 50):
+    """列出最近的任务（按提交时间倒序）"""
+    return {
+        "queue_depth": job_queue.depth,
+        "active": job_queue.active,
+        "jobs": [job.public_view() for job in job_queue.list(status=status, kind=kind, limit=limit)]
+    }
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """查询任务状态与阶段进度"""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    # 不返回 payload：其中包含各提交者的 session_id 与聊天内容
+    return job.public_view()
+
 class WebSocketLogCapture(logging.Handler):
     """捕获日志并发送到 WebSocket"""
 
@@ -325,82 +684,91 @@ class WebSocketLogCapture(logging.Handler):
             elif record.levelname == 'WARNING':
                 log_type = 'warning'
 
-            # 异步发送到前端 - 正确获取事件循环
-            try:
-                loop = asyncio.get_event_loop()
-                if loop.is_running():
-                    loop.create_task(self.broadcast_func({
-                        "type": "log",
-                        "level": log_type,
-                        "message": msg
-                    }))
-            except RuntimeError:
-                # 没有运行中的事件循环
-                pass
+            # 写入当前请求所属会话的日志缓冲，由 flusher 批量发送
+            self.broadcast_func(log_type, msg)
         except Exception as e:
             # 调试：打印错误
             print(f"日志发送失败: {e}")
 
-async def process_chat(message: str, session_id: str = "default"):
+# 需要推送到前端的 logger（只在 root 上挂处理器，子 logger 的记录会向上传播）
+CAPTURED_LOGGERS = [
+    'src.services.xiaohongshu',
+    'src.services.paper_digest',
+    'src.services.notion_image_uploader',
+    'src.services.pdf_figure_extractor_v2',
+    'src.utils.arxiv',
+    'src.utils.pdf',
+]
+
+_log_capture: Optional[WebSocketLogCapture] = None
+
+def install_log_capture():
     """
-    处理聊天消息的后台函数 - 使用 Runner.run() 维护对话上下文
+    启动时安装一次日志推送：structlog processor + 标准 logging 处理器
+
+    日志按 current_session_ids 路由，不属于任何请求的日志不会推送。
     """
-    # 设置全局广播函数，供 structlog processor 使用
-    set_log_broadcast_func(manager.broadcast)
-
-    # 创建日志捕获器（用于捕获标准 logging 模块的日志）
-    log_handler = WebSocketLogCapture(manager.broadcast)
-    log_handler.setLevel(logging.INFO)
-
-    # 添加到相关的 logger
-    loggers_to_capture = [
-        logging.getLogger('src.services.xiaohongshu'),
-        logging.getLogger('src.services.paper_digest'),
-        logging.getLogger('src.services.notion_image_uploader'),
-        logging.getLogger('src.services.pdf_figure_extractor_v2'),
-        logging.getLogger('src.utils.arxiv'),
-        logging.getLogger('src.utils.pdf'),
-        logging.getLogger(),  # root logger
-    ]
+    global _log_capture
 
-    for log in loggers_to_capture:
-        log.addHandler(log_handler)
+    if _log_capture is not None:
+        return
+
+    set_log_broadcast_func(manager.send_log)
+
+    _log_capture = WebSocketLogCapture(manager.send_log)
+    _log_capture.setLevel(logging.INFO)
+    logging.getLogger().addHandler(_log_capture)
+
+    for name in CAPTURED_LOGGERS:
+        log = logging.getLogger(name)
         # 确保日志级别足够低以捕获 INFO
         if log.level == logging.NOTSET or log.level > logging.INFO:
             log.setLevel(logging.INFO)
 
+def uninstall_log_capture():
+    global _log_capture
+
+    set_log_broadcast_func(None)
+    if _log_capture is not None:
+        logging.getLogger().removeHandler(_log_capture)
+        _log_capture = None
+
+async def process_chat(message: str, session_id: str = "default") -> dict:
+    """
+    处理聊天消息的后台函数 - 使用 Runner.run() 维护对话上下文
+    """
+    # 日志与消息只发送给发起请求的会话（日志捕获器在启动时统一安装）
+    session_token = current_session_ids.set((session_id,))
+
     try:
         # 获取会话上下文
-        session = conversation_manager.get_session(session_id)
-        current_agent = session["agent"]
-        input_items = session["input_items"]
+        session = conversation_store.get(session_id)
+        current_agent = session.agent
+        # 历史超出 token 预算时，较早的轮次滚动摘要为一条记忆
+        input_items = await summarize_history(session.input_items)
 
         # 添加用户消息到上下文
         input_items.append({"role": "user", "content": message})
 
         # 发送开始消息
-        await manager.broadcast({
-            "type": "log",
-            "level": "info",
-            "message": "🤖 开始处理您的请求..."
-        })
+        manager.send_log("info", "🤖 开始处理您的请求...", session_id)
 
         # 使用 Runner.run() 执行，传入完整上下文
         result = await Runner.run(
             starting_agent=current_agent,
             input=input_items,
+            context=session.digest_context,
             max_turns=20
         )
 
-        # 更新会话状态
-        session["agent"] = result.last_agent
-        session["input_items"] = result.to_input_list()
+        # 更新会话状态（压缩历史后写回）
+        conversation_store.save(session, result.last_agent, result.to_input_list())
 
         # 提取响应
         response_text = result.final_output if hasattr(result, 'final_output') else str(result)
 
         # 发送 assistant 消息
-        await manager.broadcast({
+        manager.send_to_session(session_id, {
             "type": "assistant_message",
             "message": response_text
         })
@@ -411,7 +779,7 @@ async def process_chat(message: str, session_id: str = "default"):
 
         if notion_url and title:
             # 发送 Notion 链接
-            await manager.broadcast({
+            manager.send_to_session(session_id, {
                 "type": "notion_link",
                 "result": {
                     "title": title,
@@ -420,130 +788,101 @@ async def process_chat(message: str, session_id: str = "default"):
             })
 
         # 发送完成信号
-        await manager.broadcast({
+        manager.send_to_session(session_id, {
             "type": "done"
         })
 
         logger.info(f"聊天处理完成: {message[:50]}...")
+        return {"response": response_text, "notion_url": notion_url}
 
     except Exception as e:
         logger.error(f"聊天处理失败: {e}", exc_info=True)
-        await manager.broadcast({
+        manager.send_to_session(session_id, {
             "type": "error",
             "error": str(e)
         })
-        await manager.broadcast({
+        manager.send_to_session(session_id, {
             "type": "done"
         })
+        raise
     finally:
-        # 移除日志捕获器
-        for log in loggers_to_capture:
-            log.removeHandler(log_handler)
-        # 清除全局广播函数
-        set_log_broadcast_func(None)
+        current_session_ids.reset(session_token)
 
-async def process_digest(url: str):
+async def process_digest(job: Job) -> dict:
     """
-    处理整理任务的后台函数
-    """
-    try:
-        # 步骤 1: 链接识别
-        await manager.broadcast({
-            "type": "step",
-            "step": 1,
-            "message": "正在识别链接类型..."
-        })
-
-        url_type = check_url_type(url)
+    处理整理任务（由任务队列 worker 调用）
 
-        await manager.broadcast({
-            "type": "step_complete",
-            "step": 1,
-            "message": f"链接类型识别完成: {url_type}"
-        })
-
-        # 步骤 2: 内容提取
-        await manager.broadcast({
-            "type": "step",
-            "step": 2,
-            "message": "正在提取内容..."
-        })
-
-        # 根据不同类型构建提示
-        if url_type == "xiaohongshu":
-            prompt = f"整理这篇小红书笔记并保存到 Notion：{url}"
-        else:
-            prompt = f"整理这篇论文并保存到 Notion：{url}"
-
-        await manager.broadcast({
-            "type": "step_complete",
-            "step": 2,
-            "message": "内容提取完成"
-        })
-
-        # 步骤 3: AI 整理
-        await manager.broadcast({
-            "type": "step",
-            "step": 3,
-            "message": "正在使用 AI 整理内容..."
-        })
-
-        # 调用 digest_agent（使用同步方式，因为 agents SDK 不是原生 async）
-        loop = asyncio.get_event_loop()
-        response = await loop.run_in_executor(
-            None,
-            lambda: digest_agent.run(prompt)
-        )
-
-        # 提取最终消息
-        final_message = response.messages[-1].content if response.messages else ""
-
-        await manager.broadcast({
-            "type": "step_complete",
-            "step": 3,
-            "message": "AI 整理完成"
-        })
-
-        # 步骤 4: 保存到 Notion
-        await manager.broadcast({
-            "type": "step",
-            "step": 4,
-            "message": "正在保存到 Notion..."
-        })
-
-        # 从响应中提取 Notion 链接和标题
-        # 假设 agent 返回的消息中包含这些信息
-        notion_url = extract_notion_url(final_message)
-        title = extract_title(final_message)
-
-        if not notion_url:
-            raise Exception("未能获取 Notion 链接")
+    直接在事件循环上运行整理流水线；进度来自各阶段
+    （classify / fetch / search / download / extract / digest / upload / save）
+    上报的真实事件，经 broadcast_job_update 推送给前端
+    """
+    url = job.payload["url"]
+    session_ids = job_sessions(job)
+    session_token = current_session_ids.set(session_ids)
 
-        await manager.broadcast({
-            "type": "step_complete",
-            "step": 4,
-            "message": "已保存到 Notion"
-        })
+    try:
+        run_context = DigestRunContext(job_id=job.job_id, on_event=job_queue.event_callback(job))
+        result = await run_digest_pipeline(url, run_context)
 
-        # 发送成功消息
-        await manager.broadcast({
+        manager.send_to_sessions(session_ids, {
             "type": "success",
-            "message": "处理完成！",
-            "result": {
-                "title": title or "未命名笔记",
-                "notion_url": notion_url
-            }
+            "job_id": job.job_id,
+            "message": "这篇论文此前已整理过" if result["already_processed"] else "处理完成！",
+            "result": result
         })
 
         logger.info(f"处理完成: {url}")
+        return result
 
     except Exception as e:
         logger.error(f"处理失败: {e}", exc_info=True)
-        await manager.broadcast({
+        manager.send_to_sessions(session_ids, {
             "type": "error",
+            "job_id": job.job_id,
             "message": "处理失败",
             "error": str(e)
         })
+        raise
+    finally:
+        current_session_ids.reset(session_token)
+
+async def process_crawl(job: Job) -> dict:
+    """处理博主抓取任务：论文帖提交为独立的整理任务（同一帖子的重复提交会被合并）"""
+    blogger_id = job.payload["blogger_id"]
+    session_ids = job_sessions(job)
+    digest_jobs = []
+
+    async def submit_digest(post):
+        url = str(post.post_url)
+        digest_job = job_queue.submit(
+            "digest",
+            {"url": url, "url_type": "xiaohongshu", "session_ids": list(session_ids)},
+            process_digest,
+            dedupe_key=canonical_source_key(url) or None
+        )
+        digest_jobs.append(digest_job.job_id)
+
+    try:
+        crawler = BloggerFeedCrawler(get_cookie_pool())
+        summary = await crawler.crawl(blogger_id, on_paper_post=submit_digest)
+    except Exception as e:
+        logger.error(f"博主抓取失败: {e}", exc_info=True)
+        manager.send_to_sessions(session_ids, {
+            "type": "error",
+            "job_id": job.job_id,
+            "message": "博主抓取失败",
+            "error": str(e)
+        })
+        raise
+
+    result = {**summary, "digest_jobs": digest_jobs}
+    manager.send_to_sessions(session_ids, {
+        "type": "success",
+        "job_id": job.job_id,
+        "message": f"博主动态抓取完成，提交了 {len(digest_jobs)} 个整理任务",
+        "result": result
+    })
+    return result
 
 def extract_notion_url(message: str) -> Optional[str]:
     """从 Agent 响应中提取 Notion URL"""
@@ -594,10 +933,17 @@ async def health_check():
     """健康检查端点"""
     return {
         "status": "healthy",
-        "model_provider": factory.provider,
-        "connections": len(manager.active_connections)
+        "model_provider": get_factory().provider,
+        "connections": manager.connection_count,
+        "queue_depth": job_queue.depth,
+        "active_jobs": job_queue.active
     }
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus 指标：各阶段耗时直方图、缓存命中 / 重试 / 429 计数、队列深度与执行中任务数"""
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
 if __name__ == "__main__":
     import uvicorn
 